@@ -0,0 +1,53 @@
+from core.Agent import VaultAgent
+from core.Credentials import Credentials
+from core.Database import Database
+from core.utils import get_settings_path
+import argparse
+import asyncio
+import getpass
+import json
+import os
+import sys
+
+def load_settings():
+    """
+    Loads the application settings without creating them, so the agent works before the app has ever run.
+
+    Returns:
+        dict: The settings, or an empty dict if there are none yet.
+    """
+    settings_path = get_settings_path()
+    if not os.path.exists(settings_path):
+        return {}
+    with open(settings_path, 'r') as file:
+        return json.load(file)
+
+def main():
+    """
+    Unlocks the vault once and serves it to local clients until the agent is locked.
+    """
+    parser = argparse.ArgumentParser(description="Serve the unlocked vault to local clients over a Unix socket.")
+    parser.add_argument("--socket", help="the socket path (defaults to agent.sock in the application directory)")
+    parser.add_argument("--username", help="the vault username (prompted for if omitted)")
+    arguments = parser.parse_args()
+
+    username = arguments.username or input("Username: ")
+    password = os.environ.get("CREDENTIALS_CACHER_PASSWORD") or getpass.getpass("Master password: ")
+    db = Database()
+    try:
+        encryption_key = Credentials.unlock(db, username, password)
+    except (ValueError, FileNotFoundError) as e:
+        db.close_connection()
+        sys.exit(f"Could not unlock the vault: {e}")
+
+    agent = VaultAgent(db, encryption_key, arguments.socket, VaultAgent.idle_timeout_from_settings(load_settings()))
+    print(f"Agent listening on {agent.socket_path}")
+    try:
+        asyncio.run(agent.serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.close_connection()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,494 @@
+from core.Agent import VaultAgent
+from core.Attachments import AttachmentStore
+from core.Audit import VaultAudit
+from core.Backup import VaultBackup, IncrementalBackup
+from core.Breach_Check import BreachDatabase
+from core.Credentials import Credentials
+from core.Database import Database
+from core.Domain_Index import DomainIndex
+from core.Importer import PasswordImporter
+from core.Password_Generator import PasswordGenerator
+import argparse
+import getpass
+import json
+import os
+import sqlite3
+import sys
+
+class CliSession:
+    """
+    An unlocked vault for the command-line interface.
+
+    Attributes:
+        db (Database): The open vault.
+        encryption_key (bytes): The vault's encryption key.
+    """
+
+    def __init__(self, db, encryption_key):
+        self.db = db
+        self.encryption_key = encryption_key
+        self._cache = None
+        self._domains = None
+
+    @property
+    def cache(self):
+        """An in-process agent, used to serve searches from memory after decrypting the vault once."""
+        if self._cache is None:
+            self._cache = VaultAgent(self.db, self.encryption_key)
+        return self._cache
+
+    def lookup(self, url):
+        """Returns summaries of the entries saved for a URL's site, decrypting only those."""
+        if self._domains is None:
+            self._domains = DomainIndex(self.db, self.encryption_key)
+        return [VaultAgent.summarize(VaultAgent.make_record(entry_uuid, entry)) for entry_uuid, entry in self._domains.find_entries(url)]
+
+    @staticmethod
+    def prepare_entry(request):
+        """
+        Checks the fields of an entry to add, generating its password if asked.
+
+        Returns:
+            dict: The entry, as accepted by Database.add_password_entries.
+
+        Raises:
+            ValueError: If a required field is missing or a field is not text.
+        """
+        entry = dict(request)
+        if entry.get('password') is None and wants_generated_password(entry):
+            entry['password'] = generate_password(entry['generate'])
+        for field in ('website_name', 'username', 'password'):
+            if entry.get(field) is None:
+                raise ValueError(f"'{field}' is required.")
+        for field in ('website_name', 'website_url', 'username', 'password', 'notes'):
+            if entry.get(field) is not None and not isinstance(entry[field], str):
+                raise ValueError(f"'{field}' must be a string.")
+        if entry.get('id') is not None and (not isinstance(entry['id'], int) or isinstance(entry['id'], bool)):
+            raise ValueError("'id' must be an integer.")
+        return entry
+
+    def add(self, entries):
+        """Adds entry dicts in one transaction, generating passwords where asked, and returns their ids."""
+        return self.db.add_password_entries([self.prepare_entry(entry) for entry in entries], self.encryption_key, return_ids=True)
+
+    def get(self, entry_id=None, entry_uuid=None):
+        """Returns an entry as a dict, by id or uuid."""
+        if entry_uuid is not None:
+            return self.cache.handle_request({'op': 'fetch', 'uuid': entry_uuid})
+        entries = self.db.fetch_entries_by_ids([entry_id], self.encryption_key)
+        if not entries:
+            return {'ok': False, 'error': "No such entry."}
+        return {'ok': True, 'result': VaultBackup.entry_to_record(entries[0])}
+
+    def update(self, request):
+        """Changes the given fields of an entry, keeping the others."""
+        entries = self.db.fetch_entries_by_ids([request.get('id')], self.encryption_key)
+        if not entries:
+            raise ValueError("No such entry.")
+        record = VaultBackup.entry_to_record(entries[0])
+        record.update({field: request[field] for field in ('website_name', 'website_url', 'username', 'password', 'notes') if field in request})
+        if wants_generated_password(request):
+            record['password'] = generate_password(request['generate'])
+        self.db.update_password_entry(record['id'], record['website_name'], record['website_url'] or '', record['username'],
+                                      record['password'], record['notes'] or '', self.encryption_key)
+        if 'favourite' in request:
+            self.db.toggle_favourite_status(record['id'], bool(request['favourite']))
+        return {'id': record['id'], 'password': record['password']} if wants_generated_password(request) else {'id': record['id']}
+
+    def handle(self, request):
+        """
+        Answers one batch request other than 'add'.
+
+        Returns:
+            dict: {'ok': True, 'result': ...} or {'ok': False, 'error': ...}.
+        """
+        op = request.get('op')
+        try:
+            if op == 'get':
+                return self.get(request.get('id'), request.get('uuid'))
+            if op == 'search':
+                return self.cache.handle_request(request)
+            if op == 'lookup':
+                return {'ok': True, 'result': self.lookup(request.get('url'))}
+            if op == 'update':
+                return {'ok': True, 'result': self.update(request)}
+            if op == 'delete':
+                self.db.delete_password_entry(request.get('id'))
+                return {'ok': True, 'result': None}
+            if op == 'generate':
+                return {'ok': True, 'result': generate_password(request)}
+            return {'ok': False, 'error': f"Unknown operation: {op}"}
+        except (ValueError, TypeError) as e:
+            return {'ok': False, 'error': str(e)}
+
+    def run_batch(self, input_file, output_file, batch_size=500):
+        """
+        Processes JSON-lines requests, writing one JSON-lines reply per request in the same order.
+
+        Consecutive 'add' requests are encrypted and written together in one transaction of up to batch_size
+        entries, so their replies are written when the batch is flushed: when it is full, when another kind
+        of request arrives, or at the end of the input. Each entry is checked first, so an invalid one fails
+        alone; if the database still refuses the batch, its entries are written one at a time.
+
+        Returns:
+            int: The number of requests that failed.
+        """
+        pending = []
+        failures = 0
+
+        def added(entry, entry_id):
+            result = {'id': entry_id}
+            if wants_generated_password(entry):
+                result['password'] = entry['password']
+            return {'ok': True, 'result': result}
+
+        def flush():
+            nonlocal failures
+            if not pending:
+                return
+            replies = [None] * len(pending)
+            entries = {}
+            for index, request in enumerate(pending):
+                try:
+                    entries[index] = self.prepare_entry(request)
+                except (ValueError, TypeError) as e:
+                    replies[index] = {'ok': False, 'error': str(e)}
+            try:
+                entry_ids = self.db.add_password_entries(list(entries.values()), self.encryption_key, return_ids=True) if entries else []
+                for (index, entry), entry_id in zip(entries.items(), entry_ids):
+                    replies[index] = added(entry, entry_id)
+            except (ValueError, sqlite3.Error):
+                for index, entry in entries.items():
+                    try:
+                        replies[index] = added(entry, self.db.add_password_entries([entry], self.encryption_key, return_ids=True)[0])
+                    except (ValueError, sqlite3.Error) as e:
+                        replies[index] = {'ok': False, 'error': str(e)}
+            for reply in replies:
+                failures += not reply['ok']
+                write_json_line(output_file, reply)
+            pending.clear()
+
+        for line in input_file:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError:
+                request = None
+            if not isinstance(request, dict):
+                flush()
+                write_json_line(output_file, {'ok': False, 'error': "Each line must be a JSON object."})
+                failures += 1
+                continue
+            if request.get('op') == 'add':
+                pending.append(request)
+                if len(pending) >= batch_size:
+                    flush()
+                continue
+            flush()
+            reply = self.handle(request)
+            failures += not reply['ok']
+            write_json_line(output_file, reply)
+        flush()
+        output_file.flush()
+        return failures
+
+def write_json_line(output_file, value):
+    output_file.write(json.dumps(value, ensure_ascii=False) + "\n")
+
+def wants_generated_password(request):
+    """Checks whether a request asks for a generated password, with 'generate' set to options or true."""
+    return request.get('generate') not in (None, False)
+
+def generate_password(options):
+    """
+    Generates a password from a dict of PasswordGenerator options, or with the default options for True.
+
+    Raises:
+        ValueError: If the options are neither a dict nor True, or are invalid.
+    """
+    if options is True:
+        options = {}
+    if not isinstance(options, dict):
+        raise ValueError("'generate' must be true or an object of generator options.")
+    return PasswordGenerator.generate_password(
+        length=int(options.get('length', 12)),
+        include_uppercase=bool(options.get('uppercase', True)),
+        num_digits=int(options.get('digits', 2)),
+        num_specials=int(options.get('specials', 2)),
+    )
+
+def read_credentials(arguments):
+    """
+    Reads the master credentials from the command line, the CREDENTIALS_CACHER_USERNAME and
+    CREDENTIALS_CACHER_PASSWORD environment variables or a prompt.
+
+    Returns:
+        tuple: The username and master password.
+    """
+    username = arguments.username or os.environ.get("CREDENTIALS_CACHER_USERNAME")
+    if not username:
+        sys.stderr.write("Username: ")
+        username = input()
+    return username, os.environ.get("CREDENTIALS_CACHER_PASSWORD") or getpass.getpass("Master password: ")
+
+def unlock(arguments):
+    """
+    Opens the vault and derives its key from the master credentials (see read_credentials).
+
+    Returns:
+        CliSession: The unlocked vault.
+    """
+    username, password = read_credentials(arguments)
+    db = Database(arguments.db)
+    try:
+        return CliSession(db, Credentials.unlock(db, username, password))
+    except (ValueError, FileNotFoundError) as e:
+        db.close_connection()
+        sys.exit(f"Could not unlock the vault: {e}")
+
+def build_parser():
+    """Builds the argument parser with one subcommand per operation."""
+    parser = argparse.ArgumentParser(prog="Cli.py", description="Work with the Credentials Cacher vault without the GUI.")
+    parser.add_argument("--db", help="the vault file (defaults to the application's vault)")
+    parser.add_argument("--username", help="the vault username")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="add an entry, reading its password from stdin unless --generate is given")
+    add.add_argument("website_name")
+    add.add_argument("entry_username", metavar="username")
+    add.add_argument("--url", default="")
+    add.add_argument("--notes", default="")
+    add.add_argument("--favourite", action="store_true")
+    add.add_argument("--generate", action="store_true", help="generate the password and print it")
+
+    get = commands.add_parser("get", help="print an entry as JSON")
+    get.add_argument("id", type=int)
+
+    search = commands.add_parser("search", help="print entries whose name, URL or username contains the query")
+    search.add_argument("query")
+
+    lookup = commands.add_parser("lookup", help="print the entries saved for a URL or domain")
+    lookup.add_argument("url")
+
+    delete = commands.add_parser("delete", help="delete an entry")
+    delete.add_argument("id", type=int)
+
+    import_command = commands.add_parser("import", help="import a CSV or Bitwarden JSON export")
+    import_command.add_argument("path")
+    import_command.add_argument("--format", choices=("csv", "json"))
+
+    export = commands.add_parser("export", help="print every entry as JSON lines, unencrypted")
+    export.add_argument("-o", "--output", help="write to a file instead of stdout")
+
+    backup = commands.add_parser("backup", help="write an encrypted backup, protected by CREDENTIALS_CACHER_BACKUP_PASSWORD or a prompted password")
+    backup.add_argument("path")
+    backup.add_argument("--incremental", action="store_true", help="add the next snapshot to the chain in the directory 'path'")
+
+    restore = commands.add_parser("restore", help="restore an encrypted backup")
+    restore.add_argument("path")
+    restore.add_argument("--wipe", action="store_true", help="replace the vault's entries instead of adding to them")
+    restore.add_argument("--incremental", action="store_true", help="replace the vault's entries with the snapshot chain in the directory 'path'")
+
+    compact = commands.add_parser("compact", help="fold the deltas of an incremental backup directory into a new base snapshot")
+    compact.add_argument("path")
+
+    generate = commands.add_parser("generate", help="print generated passwords")
+    generate.add_argument("--length", type=int, default=12)
+    generate.add_argument("--digits", type=int, default=2)
+    generate.add_argument("--specials", type=int, default=2)
+    generate.add_argument("--no-uppercase", action="store_true")
+    generate.add_argument("--count", type=int, default=1)
+    generate.add_argument("--passphrase", type=int, metavar="WORDS", help="generate passphrases of this many words instead")
+    generate.add_argument("--separator", default="-", help="the text between passphrase words")
+
+    breach_convert = commands.add_parser("breach-convert", help="convert a Have I Been Pwned SHA-1 dump into a breach database")
+    breach_convert.add_argument("input", help="the 'HASH:COUNT' text dump")
+    breach_convert.add_argument("output", nargs="?", help="the breach database to write (defaults to the application's)")
+    breach_convert.add_argument("--digest-size", type=int, default=20, help="hash bytes kept per record; fewer makes a smaller file with rare false matches")
+
+    commands.add_parser("breach-check", help="print the entries whose passwords appear in the breach database")
+
+    history = commands.add_parser("history", help="print an entry's previous values as JSON lines, newest first")
+    history.add_argument("id", type=int)
+
+    retention = commands.add_parser("history-retention", help="show or set how much password history is kept")
+    retention.add_argument("--versions", type=int, help="previous versions kept per entry (-1 for no limit)")
+    retention.add_argument("--days", type=int, help="days previous versions are kept (-1 for no limit)")
+
+    attach = commands.add_parser("attach", help="attach a file to an entry")
+    attach.add_argument("id", type=int)
+    attach.add_argument("path")
+    attach.add_argument("--name", help="the attachment's name (defaults to the file name)")
+
+    attachments = commands.add_parser("attachments", help="list an entry's attachments as JSON lines")
+    attachments.add_argument("id", type=int)
+
+    save_attachment = commands.add_parser("save-attachment", help="write an attachment to a file")
+    save_attachment.add_argument("attachment_id", type=int)
+    save_attachment.add_argument("path")
+
+    audit = commands.add_parser("audit", help="print a JSON report of reused, weak, stale and breached passwords")
+    audit.add_argument("--stale-days", type=int, default=VaultAudit.STALE_DAYS)
+
+    change_password = commands.add_parser("change-password", help="change the master password to CREDENTIALS_CACHER_NEW_PASSWORD or a prompted one")
+    change_password.add_argument("--rotate", action="store_true", help="also re-encrypt the vault under a new data key")
+
+    batch = commands.add_parser("batch", help="process JSON-lines requests from stdin, writing JSON-lines replies to stdout")
+    batch.add_argument("--batch-size", type=int, default=500, help="the most 'add' requests written per transaction")
+    return parser
+
+def main(argv=None):
+    """
+    Runs one command-line operation. Results are written to stdout as JSON, errors to stderr.
+    """
+    arguments = build_parser().parse_args(argv)
+    if arguments.command == "generate":
+        try:
+            if arguments.passphrase:
+                passwords = (PasswordGenerator.generate_passphrase(arguments.passphrase, arguments.separator) for _ in range(arguments.count))
+            else:
+                passwords = PasswordGenerator.iter_passwords(arguments.count, arguments.length, not arguments.no_uppercase, arguments.digits, arguments.specials)
+            sys.stdout.writelines(password + "\n" for password in passwords)
+        except ValueError as e:
+            sys.stderr.write(f"Error: {e}\n")
+            return 1
+        return 0
+
+    if arguments.command == "breach-convert":
+        output_path = arguments.output or BreachDatabase.get_default_path()
+        try:
+            write_json_line(sys.stdout, {'records': BreachDatabase.convert_hibp(arguments.input, output_path, arguments.digest_size), 'path': output_path})
+        except (ValueError, OSError) as e:
+            sys.stderr.write(f"Error: {e}\n")
+            return 1
+        return 0
+
+    if arguments.command == "change-password":
+        return change_master_password(arguments)
+
+    session = unlock(arguments)
+    try:
+        return run_command(session, arguments)
+    except (ValueError, OSError) as e:
+        sys.stderr.write(f"Error: {e}\n")
+        return 1
+    finally:
+        session.db.close_connection()
+
+def change_master_password(arguments):
+    """Changes the master password, printing progress of any re-encryption to stderr. Returns the exit status."""
+    username, password = read_credentials(arguments)
+    new_password = os.environ.get("CREDENTIALS_CACHER_NEW_PASSWORD")
+    if not new_password:
+        new_password = getpass.getpass("New master password: ")
+        if getpass.getpass("Confirm new master password: ") != new_password:
+            sys.stderr.write("Error: The passwords do not match.\n")
+            return 1
+
+    def on_progress(done, total):
+        sys.stderr.write(f"\rRe-encrypted {done} of {total}")
+        if done == total:
+            sys.stderr.write("\n")
+
+    db = Database(arguments.db)
+    try:
+        Credentials.change_password(db, username, password, new_password, arguments.rotate, progress_callback=on_progress)
+    except (ValueError, OSError) as e:
+        sys.stderr.write(f"Error: {e}\n")
+        return 1
+    finally:
+        db.close_connection()
+    write_json_line(sys.stdout, {'changed': True, 'rotated': arguments.rotate})
+    return 0
+
+def run_command(session, arguments):
+    """Runs a command that needs the unlocked vault and returns the exit status."""
+    out = sys.stdout
+    if arguments.command == "add":
+        password = generate_password({}) if arguments.generate else sys.stdin.readline().rstrip("\n")
+        if not password:
+            raise ValueError("No password given on stdin.")
+        entry = {'website_name': arguments.website_name, 'website_url': arguments.url, 'username': arguments.entry_username,
+                 'password': password, 'notes': arguments.notes, 'favourite': arguments.favourite}
+        result = {'id': session.add([entry])[0]}
+        if arguments.generate:
+            result['password'] = password
+        write_json_line(out, result)
+    elif arguments.command in ("get", "search", "lookup", "delete"):
+        request = {'op': arguments.command}
+        request.update({key: getattr(arguments, key) for key in ('id', 'query', 'url') if hasattr(arguments, key)})
+        reply = session.handle(request)
+        if not reply['ok']:
+            raise ValueError(reply['error'])
+        if isinstance(reply['result'], list):
+            for result in reply['result']:
+                write_json_line(out, result)
+        elif reply['result'] is not None:
+            write_json_line(out, reply['result'])
+    elif arguments.command == "import":
+        imported, skipped = PasswordImporter(session.db, session.encryption_key).import_file(arguments.path, arguments.format)
+        write_json_line(out, {'imported': imported, 'skipped': skipped})
+    elif arguments.command == "export":
+        output_file = open(arguments.output, 'w', encoding='utf-8') if arguments.output else out
+        try:
+            for entry in session.db.iter_entries(session.encryption_key):
+                write_json_line(output_file, VaultBackup.entry_to_record(entry))
+        finally:
+            if arguments.output:
+                output_file.close()
+    elif arguments.command in ("backup", "restore", "compact"):
+        password = os.environ.get("CREDENTIALS_CACHER_BACKUP_PASSWORD") or getpass.getpass("Backup password: ")
+        if arguments.command == "compact" or arguments.incremental:
+            if arguments.command != "backup" and not os.path.isdir(arguments.path):
+                raise ValueError(f"No backup directory at {arguments.path}.")
+            chain = IncrementalBackup(session.db, session.encryption_key, arguments.path, password)
+            if arguments.command == "backup":
+                write_json_line(out, {'snapshot': chain.backup()})
+            elif arguments.command == "compact":
+                write_json_line(out, {'base': chain.compact()})
+            else:
+                write_json_line(out, {'restored': chain.restore()})
+            return 0
+        backup = VaultBackup(session.db, session.encryption_key)
+        if arguments.command == "backup":
+            write_json_line(out, {'exported': backup.export_vault(arguments.path, password)})
+        else:
+            write_json_line(out, {'restored': backup.restore_vault(arguments.path, password, arguments.wipe)})
+    elif arguments.command == "breach-check":
+        breach_database = BreachDatabase.open_default()
+        if breach_database is None:
+            raise ValueError(f"No breach database at {BreachDatabase.get_default_path()}; create one with breach-convert.")
+        with breach_database:
+            entries = list(session.db.iter_entries(session.encryption_key))
+            counts = breach_database.check_many(entry[4] for entry in entries)
+        for entry, count in zip(entries, counts):
+            if count:
+                write_json_line(out, {'id': entry[0], 'website_name': entry[1], 'username': entry[3], 'breach_count': count})
+    elif arguments.command == "history":
+        for version in session.db.fetch_password_history(arguments.id, session.encryption_key):
+            write_json_line(out, version)
+    elif arguments.command == "history-retention":
+        max_versions, max_age_days = session.db.history_retention()
+        if arguments.versions is not None or arguments.days is not None:
+            if arguments.versions is not None:
+                max_versions = arguments.versions if arguments.versions >= 0 else None
+            if arguments.days is not None:
+                max_age_days = arguments.days if arguments.days >= 0 else None
+            session.db.set_history_retention(max_versions, max_age_days)
+        write_json_line(out, {'versions': max_versions, 'days': max_age_days})
+    elif arguments.command == "attach":
+        write_json_line(out, {'id': AttachmentStore(session.db, session.encryption_key).add(arguments.id, arguments.path, arguments.name)})
+    elif arguments.command == "attachments":
+        for attachment in AttachmentStore(session.db, session.encryption_key).list(arguments.id):
+            write_json_line(out, attachment)
+    elif arguments.command == "save-attachment":
+        write_json_line(out, {'written': AttachmentStore(session.db, session.encryption_key).save(arguments.attachment_id, arguments.path)})
+    elif arguments.command == "audit":
+        write_json_line(out, VaultAudit(session.db, session.encryption_key).run(arguments.stale_days))
+    elif arguments.command == "batch":
+        return 1 if session.run_batch(sys.stdin, out, arguments.batch_size) else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
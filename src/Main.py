@@ -1,12 +1,20 @@
+from core.Startup_Profiler import StartupProfiler
+import logging
+import sys
+import os
+
+# Profiling has to start before the heavy imports below so their cost shows up in the report.
+profiler = StartupProfiler.from_environment()
+profiler.install_import_hook()
+
 from PyQt5.QtWidgets import QApplication
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from ui.Window import MainWindow
 from core.Database import Database
 from ui.Thememanager import ThemeManager
 from ui.Options import OptionsDialog
-import logging
-import sys
-import os
+
+profiler.remove_import_hook()
 
 def get_settings_path():
     """
@@ -21,22 +29,44 @@ def get_settings_path():
         os.makedirs(settings_directory)
     return os.path.join(settings_directory, 'settings.json')
 
+def log_migration_progress(description, done, total):
+    """
+    Logs the progress of a vault upgrade, which only takes noticeable time for large vaults from earlier versions.
+    """
+    logging.info(f"Upgrading vault: {description} ({done}/{total})")
+
+def on_first_show():
+    """
+    Called from the first event loop iteration after the main window is shown. Records the
+    milestone and writes the startup profile if profiling is enabled.
+    """
+    profiler.mark("first_show")
+    profiler.write_report()
+
 def main():
     """
     The main function to initialize and run the PyQt application.
     """
-    db = Database()
+    with profiler.phase("db_init"):
+        db = Database(progress_callback=log_migration_progress)
     QApplication.setAttribute(Qt.AA_EnableHighDpiScaling)  # Enable scaling for high DPI displays.
     QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps)  # Use high resolution icons.
-    app = QApplication(sys.argv)
+    with profiler.phase("qapplication_init"):
+        app = QApplication(sys.argv)
 
-    settings = OptionsDialog.load_or_create_settings()  # Load application settings.
+    with profiler.phase("settings_load"):
+        settings = OptionsDialog.load_or_create_settings()  # Load application settings.
 
-    themeManager = ThemeManager(app)  # Manage application themes.
-    themeManager.applyCurrentTheme()  # Apply the current theme based on settings.
+    with profiler.phase("theme_apply"):
+        themeManager = ThemeManager(app)  # Manage application themes.
+        themeManager.applyCurrentTheme()  # Apply the current theme based on settings.
 
-    main_window = MainWindow(db, settings, themeManager)  # Initialize the main window.
-    main_window.show()  # Show the main window.
+    with profiler.phase("window_construction"):
+        main_window = MainWindow(db, settings, themeManager)  # Initialize the main window.
+    with profiler.phase("window_show"):
+        main_window.show()  # Show the main window.
+    if profiler.enabled:
+        QTimer.singleShot(0, on_first_show)  # Runs once the event loop has painted the window.
     app.exec_()  # Start the application's event loop.
 
 if __name__ == "__main__":
@@ -0,0 +1,330 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import struct
+from .Domain_Index import DomainIndex
+
+class VaultAgent:
+    """
+    Keeps an unlocked vault in memory and answers requests from local clients over a Unix domain socket,
+    so tools can look up credentials without running the application or deriving the key again.
+
+    Messages in both directions are a 4-byte big-endian length followed by a UTF-8 JSON object. A request
+    names an 'op' and its arguments, and the reply is {'ok': True, 'result': ...} or {'ok': False, 'error': ...}:
+
+        ping                      -> 'pong'
+        lookup  {'url': str}      -> summaries of the entries for that site (its registrable domain), those
+                                     saved for the host or a parent domain of it first
+        search  {'query': str}    -> summaries of entries whose name, URL or username contains the query
+        fetch   {'id': int} or {'uuid': str} -> the full entry, including the password
+        lock                      -> locks the agent, which then stops
+
+    Entries are decrypted once and served from memory. Before each request the vault's revision counter is
+    checked, and only entries changed since the last check are decrypted again. Lookups find the site's
+    entries through a DomainIndex. The agent locks itself, forgetting the key and removing the socket, once
+    it has been idle for the auto-lock timeout.
+
+    Attributes:
+        db (Database): The vault being served.
+        encryption_key (bytes): The vault's key, or None once locked.
+        socket_path (str): The path of the Unix socket.
+        idle_timeout (float): Seconds without requests before the agent locks, or None to never lock.
+    """
+
+    MAX_MESSAGE_SIZE = 1024 * 1024
+    SEARCH_LIMIT = 50
+    SUMMARY_FIELDS = ('id', 'uuid', 'website_name', 'website_url', 'username', 'favourite')
+
+    def __init__(self, db, encryption_key, socket_path=None, idle_timeout=None):
+        """
+        Initializes the agent.
+
+        Args:
+            db (Database): The vault to serve. It must be used from the thread that runs the agent.
+            encryption_key (bytes): The vault's encryption key.
+            socket_path (str, optional): The socket to listen on. Defaults to agent.sock in the application directory.
+            idle_timeout (float, optional): Seconds of inactivity before the agent locks. Defaults to never.
+        """
+        self.db = db
+        self.encryption_key = encryption_key
+        self.socket_path = socket_path or self.get_socket_path()
+        self.idle_timeout = idle_timeout
+        self._entries = {}
+        self.domains = DomainIndex(db, encryption_key)
+        self._uuids = {}
+        self._revision = None
+        self._locked = None
+        self._idle_handle = None
+
+    @staticmethod
+    def get_socket_path():
+        """Get the default socket path in the application's AppData directory."""
+        return os.path.join(os.getenv('APPDATA'), 'Credentials Cacher', 'agent.sock')
+
+    @staticmethod
+    def idle_timeout_from_settings(settings):
+        """
+        Returns the idle timeout in seconds matching the application's auto-lock settings, or None if auto-lock is off.
+        """
+        if not settings.get("auto_lock_enabled", True):
+            return None
+        return settings.get("auto_lock", 5) * 60
+
+    async def serve(self):
+        """
+        Listens for clients until the agent is locked, either by a 'lock' request, the idle timeout or lock().
+
+        Raises:
+            RuntimeError: If another agent is already listening on the socket.
+        """
+        if os.path.exists(self.socket_path):
+            try:
+                with AgentClient(self.socket_path, timeout=1) as client:
+                    client.request('ping')
+                raise RuntimeError(f"An agent is already listening on {self.socket_path}")
+            except OSError:
+                os.remove(self.socket_path)  # Left behind by an agent that did not shut down cleanly.
+
+        self.refresh()
+        self._locked = asyncio.Event()
+        previous_umask = os.umask(0o177)  # Only the owner may connect, from the moment the socket exists.
+        try:
+            server = await asyncio.start_unix_server(self._handle_connection, path=self.socket_path)
+        finally:
+            os.umask(previous_umask)
+        self._reset_idle_timer()
+        try:
+            async with server:
+                await self._locked.wait()
+        finally:
+            self.lock()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def lock(self):
+        """Forgets the key and every decrypted entry, and stops the agent."""
+        self.encryption_key = None
+        self._entries.clear()
+        self.domains.clear()
+        self._uuids.clear()
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+            self._idle_handle = None
+        if self._locked is not None:
+            self._locked.set()
+
+    def _reset_idle_timer(self):
+        if self.idle_timeout is None:
+            return
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+        self._idle_handle = asyncio.get_running_loop().call_later(self.idle_timeout, self.lock)
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while not self._locked.is_set():
+                try:
+                    header = await reader.readexactly(4)
+                except asyncio.IncompleteReadError:
+                    break
+                (length,) = struct.unpack('>I', header)
+                if length > self.MAX_MESSAGE_SIZE:
+                    writer.write(encode_message({'ok': False, 'error': "Message too large"}))
+                    break
+                try:
+                    request = json.loads(await reader.readexactly(length))
+                except (asyncio.IncompleteReadError, ValueError):
+                    break
+                self._reset_idle_timer()
+                writer.write(encode_message(self.handle_request(request)))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    def handle_request(self, request):
+        """
+        Answers one decoded request.
+
+        Args:
+            request (dict): The request, holding an 'op' and its arguments.
+
+        Returns:
+            dict: The reply. Errors are replied with rather than raised.
+        """
+        op = request.get('op') if isinstance(request, dict) else None
+        try:
+            if op == 'ping':
+                return {'ok': True, 'result': 'pong'}
+            if op == 'lock':
+                self.lock()
+                return {'ok': True, 'result': None}
+            if self.encryption_key is None:
+                return {'ok': False, 'error': "The agent is locked."}
+            self.refresh()
+            if op == 'lookup':
+                return {'ok': True, 'result': self.lookup(request.get('url'))}
+            if op == 'search':
+                return {'ok': True, 'result': self.search(request.get('query'), request.get('limit', self.SEARCH_LIMIT))}
+            if op == 'fetch':
+                return {'ok': True, 'result': self.fetch(request.get('id'), request.get('uuid'))}
+            return {'ok': False, 'error': f"Unknown operation: {op}"}
+        except ValueError as e:
+            return {'ok': False, 'error': str(e)}
+        except Exception:
+            # A malformed request or a vault error fails that request only; the client still gets a reply.
+            logging.exception("Agent request %r failed.", op)
+            return {'ok': False, 'error': "The request could not be answered."}
+
+    def refresh(self):
+        """
+        Brings the in-memory entries up to date with the vault, decrypting only entries changed since the last refresh.
+        """
+        revision = self.db.current_revision()
+        if revision == self._revision:
+            return
+        changed = self.db.fetch_entry_revisions(self._revision or 0)
+        for entry in self.db.fetch_entries_by_ids(list(changed), self.encryption_key):
+            self._remove(entry[0])
+            self._add(changed[entry[0]][0], entry)
+
+        cursor = self.db.connection.cursor()
+        cursor.execute("SELECT COUNT(*) FROM vault;")
+        if cursor.fetchone()[0] != len(self._entries):
+            cursor.execute("SELECT id FROM vault;")
+            existing = {row[0] for row in cursor.fetchall()}
+            for entry_id in set(self._entries) - existing:
+                self._remove(entry_id)
+        self._revision = revision
+
+    def _add(self, entry_uuid, entry):
+        record = self.make_record(entry_uuid, entry)
+        self._entries[record['id']] = record
+        self._uuids[entry_uuid] = record['id']
+
+    def _remove(self, entry_id):
+        record = self._entries.pop(entry_id, None)
+        if record is None:
+            return
+        self._uuids.pop(record['uuid'], None)
+
+    @staticmethod
+    def make_record(entry_uuid, entry):
+        """Returns a decrypted entry tuple and its uuid as the dict fetch replies with."""
+        record = dict(zip(('id', 'website_name', 'website_url', 'username', 'password', 'notes', 'favourite', 'created_at', 'updated_at'), entry))
+        record['uuid'] = entry_uuid
+        return record
+
+    @classmethod
+    def summarize(cls, record):
+        """Returns the fields of a record that lookups and searches reply with, leaving out the password and notes."""
+        return {field: record[field] for field in cls.SUMMARY_FIELDS}
+
+    def lookup(self, url):
+        """
+        Returns summaries of the entries saved for a URL's site, ordered by DomainIndex.match_rank.
+
+        Raises:
+            ValueError: If the URL has no host.
+        """
+        records = [self._entries[entry_id] for entry_id in self.domains.lookup(url) if entry_id in self._entries]
+        host = DomainIndex.normalize_url(url).host
+        return [self.summarize(record) for record in sorted(records, key=lambda record: DomainIndex.match_rank(host, record['website_url']))]
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        """
+        Returns summaries of up to 'limit' entries whose name, URL or username contains the query, ignoring case.
+        """
+        if not query:
+            raise ValueError("A search query is required.")
+        query = query.lower()
+        results = []
+        for record in self._entries.values():
+            if any(query in (record[field] or '').lower() for field in ('website_name', 'website_url', 'username')):
+                results.append(self.summarize(record))
+                if len(results) >= limit:
+                    break
+        return results
+
+    def fetch(self, entry_id=None, entry_uuid=None):
+        """
+        Returns a full entry, including its password and notes, by id or uuid.
+
+        Raises:
+            ValueError: If no such entry exists.
+        """
+        if entry_id is None and entry_uuid is not None:
+            entry_id = self._uuids.get(entry_uuid)
+        record = self._entries.get(entry_id)
+        if record is None:
+            raise ValueError("No such entry.")
+        return dict(record)
+
+
+class AgentClient:
+    """
+    A blocking client for VaultAgent.
+
+    Example:
+        with AgentClient() as client:
+            entries = client.request('lookup', url='https://example.com/login')
+    """
+
+    def __init__(self, socket_path=None, timeout=5):
+        """
+        Connects to a running agent.
+
+        Args:
+            socket_path (str, optional): The agent's socket. Defaults to the application's one.
+            timeout (float): Seconds to wait for a reply. Defaults to 5.
+        """
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        try:
+            self._socket.connect(socket_path or VaultAgent.get_socket_path())
+        except OSError:
+            self._socket.close()
+            raise
+
+    def request(self, op, **arguments):
+        """
+        Sends a request and waits for the reply.
+
+        Returns:
+            The reply's result.
+
+        Raises:
+            ValueError: If the agent reports an error.
+            ConnectionError: If the agent closes the connection.
+        """
+        self._socket.sendall(encode_message(dict(arguments, op=op)))
+        (length,) = struct.unpack('>I', self._receive(4))
+        reply = json.loads(self._receive(length))
+        if not reply.get('ok'):
+            raise ValueError(reply.get('error'))
+        return reply.get('result')
+
+    def _receive(self, size):
+        data = b''
+        while len(data) < size:
+            chunk = self._socket.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("The agent closed the connection.")
+            data += chunk
+        return data
+
+    def close(self):
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def encode_message(message):
+    """Frames a message for the agent protocol: a 4-byte big-endian length, then the JSON encoding."""
+    data = json.dumps(message, separators=(',', ':')).encode('utf-8')
+    return struct.pack('>I', len(data)) + data
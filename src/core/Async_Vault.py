@@ -0,0 +1,221 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from .Database import Database
+
+class AsyncVault:
+    """
+    An asyncio facade over Database for use inside async services.
+
+    SQLite connections may only be used from the thread that opened them, so the Database is created on, and
+    only ever used from, a single dedicated thread; this also serialises writes, so concurrent callers never
+    interleave transactions. Encryption and decryption run on a separate pool of worker threads, and a
+    semaphore bounds how many crypto jobs are queued at once so a burst of callers cannot pile up unbounded work.
+
+    Create one with the open() coroutine and close it when done, or use it as an async context manager:
+
+        async with await AsyncVault.open(encryption_key) as vault:
+            entry_id = await vault.add("Example", "https://example.com", "alice", "secret", "")
+            async for entry in vault:
+                ...
+
+    Attributes:
+        encryption_key (bytes): The vault's encryption key.
+        batch_size (int): The number of entries fetched and decrypted per crypto job.
+    """
+
+    ENTRY_COLUMNS = Database.ENTRY_COLUMNS
+
+    def __init__(self, encryption_key, crypto_workers=4, max_pending_jobs=16, batch_size=200):
+        """
+        Sets up the executors. Use open() to create an AsyncVault with its database.
+
+        Args:
+            encryption_key (bytes): The vault's encryption key.
+            crypto_workers (int): The number of threads encrypting and decrypting. Defaults to 4.
+            max_pending_jobs (int): The most crypto jobs submitted at once across all callers. Defaults to 16.
+            batch_size (int): The number of entries per crypto job. Defaults to 200.
+        """
+        self.encryption_key = encryption_key
+        self.batch_size = batch_size
+        self.db = None
+        self._db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vault-db")
+        self._crypto_executor = ThreadPoolExecutor(max_workers=crypto_workers, thread_name_prefix="vault-crypto")
+        self._crypto_slots = asyncio.Semaphore(max_pending_jobs)
+
+    @classmethod
+    async def open(cls, encryption_key, db_path=None, **options):
+        """
+        Opens a vault.
+
+        Args:
+            encryption_key (bytes): The vault's encryption key.
+            db_path (str, optional): The vault file. Defaults to the application's vault.
+            **options: Passed on to the constructor.
+
+        Returns:
+            AsyncVault: The opened vault.
+        """
+        vault = cls(encryption_key, **options)
+        vault.db = await vault._run_db(Database, db_path)
+        return vault
+
+    async def close(self):
+        """Closes the database and stops the worker threads."""
+        if self.db is not None:
+            await self._run_db(self.db.close_connection)
+            self.db = None
+        self._db_executor.shutdown(wait=True)
+        self._crypto_executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _run_db(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._db_executor, function, *args)
+
+    async def _run_crypto(self, function, *args):
+        async with self._crypto_slots:
+            return await asyncio.get_running_loop().run_in_executor(self._crypto_executor, function, *args)
+
+    async def _decrypt(self, encrypted_entries):
+        """Decrypts rows in batch_size jobs spread over the crypto threads, keeping their order."""
+        batches = [encrypted_entries[start:start + self.batch_size] for start in range(0, len(encrypted_entries), self.batch_size)]
+        results = await asyncio.gather(*(self._run_crypto(self.db.decrypt_entries, batch, self.encryption_key) for batch in batches))
+        return [entry for batch in results for entry in batch]
+
+    def _select(self, where="", parameters=()):
+        cursor = self.db.connection.cursor()
+        cursor.execute(f"SELECT {self.ENTRY_COLUMNS} FROM vault {where};", parameters)
+        return cursor.fetchall()
+
+    async def add(self, website_name, website_url, username, password, notes, favourite=False):
+        """
+        Adds an entry.
+
+        Returns:
+            int: The new entry's id.
+
+        Raises:
+            ValueError: If the website name, username or password is None.
+        """
+        entry = {'website_name': website_name, 'website_url': website_url, 'username': username,
+                 'password': password, 'notes': notes, 'favourite': favourite}
+        return (await self.add_many([entry]))[0]
+
+    async def add_many(self, entries):
+        """
+        Adds entries in one transaction, encrypting them in parallel batches first.
+
+        Args:
+            entries (list of dict): The entries, as accepted by Database.add_password_entries.
+
+        Returns:
+            list of int: The new entries' ids, in order.
+
+        Raises:
+            ValueError: If an entry is missing its website name, username or password. No entries are added.
+        """
+        entries = list(entries)
+        batches = [entries[start:start + self.batch_size] for start in range(0, len(entries), self.batch_size)]
+        encrypted = await asyncio.gather(*(self._run_crypto(Database.encrypt_entries, batch, self.encryption_key) for batch in batches))
+        rows = [row for batch in encrypted for row in batch]
+        return await self._run_db(lambda: self.db.insert_encrypted_entries(rows, return_ids=True))
+
+    async def update(self, entry_id, website_name, website_url, username, password, notes):
+        """Replaces an entry's content, re-encrypting it."""
+        await self._run_db(self.db.update_password_entry, entry_id, website_name, website_url, username, password, notes, self.encryption_key)
+
+    async def set_favourite(self, entry_id, favourite):
+        """Marks or unmarks an entry as a favourite."""
+        await self._run_db(self.db.toggle_favourite_status, entry_id, favourite)
+
+    async def delete(self, entry_id):
+        """Deletes an entry."""
+        await self._run_db(self.db.delete_password_entry, entry_id)
+
+    async def delete_many(self, entry_ids):
+        """Deletes several entries in one transaction."""
+        def delete():
+            with self.db.connection:
+                self.db.connection.executemany("DELETE FROM vault WHERE id = ?;", [(entry_id,) for entry_id in entry_ids])
+        await self._run_db(delete)
+
+    async def fetch(self, entry_id):
+        """
+        Fetches one entry.
+
+        Returns:
+            tuple: The decrypted entry, or None if there is no entry with that id.
+        """
+        entries = await self._decrypt(await self._run_db(self._select, "WHERE id = ?", (entry_id,)))
+        return entries[0] if entries else None
+
+    async def fetch_many(self, entry_ids):
+        """Fetches the entries with the given ids. Ids with no entry are left out."""
+        entry_ids = list(entry_ids)
+        def select():
+            encrypted_entries = []
+            for start in range(0, len(entry_ids), 500):  # Stay below SQLite's limit on query parameters.
+                batch = entry_ids[start:start + 500]
+                encrypted_entries.extend(self._select(f"WHERE id IN ({', '.join('?' for _ in batch)})", batch))
+            return encrypted_entries
+        return await self._decrypt(await self._run_db(select))
+
+    async def fetch_all(self):
+        """Fetches every entry."""
+        return await self._decrypt(await self._run_db(self._select))
+
+    async def fetch_favourites(self):
+        """Fetches the entries marked as favourites."""
+        return await self._decrypt(await self._run_db(self._select, "WHERE favourite = 1"))
+
+    async def search(self, query, limit=None):
+        """
+        Finds entries whose website name, URL or username contains the query, ignoring case.
+
+        Args:
+            query (str): The text to look for.
+            limit (int, optional): The most entries to return. Defaults to all matches.
+
+        Returns:
+            list of tuple: The matching entries, in id order.
+        """
+        query = query.lower()
+        matches = []
+        async for entry in self:
+            if any(query in (value or '').lower() for value in entry[1:4]):
+                matches.append(entry)
+                if limit is not None and len(matches) >= limit:
+                    break
+        return matches
+
+    def __aiter__(self):
+        return self.iter_entries()
+
+    async def iter_entries(self):
+        """
+        Yields every entry in id order. Rows are read one batch at a time, and the next batch is read
+        and decrypted while the caller works through the current one.
+        """
+        last_id = -1
+        next_batch = asyncio.ensure_future(self._read_batch(last_id))
+        try:
+            while True:
+                entries = await next_batch
+                if not entries:
+                    return
+                last_id = entries[-1][0]
+                next_batch = asyncio.ensure_future(self._read_batch(last_id))
+                for entry in entries:
+                    yield entry
+        finally:
+            if not next_batch.done():
+                next_batch.cancel()
+
+    async def _read_batch(self, after_id):
+        # Keyset pagination, so no cursor is held open on the database thread between batches.
+        encrypted_entries = await self._run_db(self._select, "WHERE id > ? ORDER BY id LIMIT ?", (after_id, self.batch_size))
+        return await self._decrypt(encrypted_entries)
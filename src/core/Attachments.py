@@ -0,0 +1,226 @@
+import hashlib
+import hmac
+import os
+import struct
+from .Encryption import Encryption
+
+class AttachmentStore:
+    """
+    Stores files attached to vault entries, encrypted, inside the vault database.
+
+    Files are split into fixed-size chunks. Each chunk is addressed by a keyed hash (HMAC-SHA256) of its
+    contents and stored once, encrypted with AES-256 GCM under its own random nonce, with its address as
+    associated data so a chunk cannot be passed off under another address. Attachments are ordered lists of
+    chunk addresses, so a file attached to several entries, or a chunk shared between files, costs its
+    storage once and is not encrypted again. A keyed hash of the whole file, checked once the last chunk
+    is read, detects chunks that were dropped, reordered or swapped between attachments.
+
+    Reading and writing go a chunk at a time, so an attachment never has to fit in memory.
+
+    The encryption and addressing keys are derived from the vault key with Encryption.derive_subkey.
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, db, encryption_key, chunk_size=CHUNK_SIZE):
+        """
+        Args:
+            db (Database): The vault holding the attachments.
+            encryption_key (bytes): The vault's encryption key.
+            chunk_size (int): The plaintext size of each chunk for new attachments. Defaults to 1 MiB.
+        """
+        self.db = db
+        self.encryption_key = encryption_key
+        self.chunk_size = chunk_size
+        self._chunk_key, self._address_key = self.derive_keys(encryption_key)
+
+    @staticmethod
+    def derive_keys(encryption_key):
+        """
+        Returns:
+            tuple of bytes: The chunk encryption key and the chunk addressing key for a vault key.
+        """
+        return (Encryption.derive_subkey(encryption_key, b"credentials-cacher attachment chunks"),
+                Encryption.derive_subkey(encryption_key, b"credentials-cacher attachment addresses"))
+
+    @staticmethod
+    def rekey_chunk(address, data, old_keys, new_keys):
+        """
+        Re-encrypts a stored chunk for another vault key, as key rotation does.
+
+        Args:
+            address (bytes): The chunk's current address.
+            data (bytes): The chunk as stored.
+            old_keys (tuple): derive_keys of the key the chunk is stored under.
+            new_keys (tuple): derive_keys of the key to store it under.
+
+        Returns:
+            tuple of bytes: The chunk's new address and its data encrypted for it.
+
+        Raises:
+            ValueError: If the chunk fails authentication under the old keys.
+        """
+        chunk = Encryption.decrypt_bytes(data, old_keys[0], address)
+        new_address = hmac.new(new_keys[1], chunk, hashlib.sha256).digest()
+        return new_address, Encryption.encrypt_bytes(chunk, new_keys[0], new_address)
+
+    def rekey_attachments(self, old_encryption_key):
+        """
+        Brings attachment names and whole-file hashes over from another vault key, once every chunk has been
+        moved to this store's key with rekey_chunk. Runs in the caller's transaction.
+        """
+        connection = self.db.connection
+        rows = connection.execute("SELECT id, name, size FROM attachments;").fetchall()
+        for attachment_id, name, size in rows:
+            content_hash = hmac.new(self._address_key, b"file", hashlib.sha256)
+            for address, in connection.execute(
+                    "SELECT chunk_hash FROM attachment_chunks WHERE attachment_id = ? ORDER BY position;", (attachment_id,)):
+                content_hash.update(address)
+            content_hash.update(struct.pack('>Q', size))
+            connection.execute("UPDATE attachments SET name = ?, content_hash = ? WHERE id = ?;", (
+                Encryption.encrypt_data(Encryption.decrypt_data(name, old_encryption_key), self.encryption_key),
+                content_hash.digest(), attachment_id))
+
+    def add(self, entry_id, source, name=None):
+        """
+        Attaches a file to an entry, in one transaction.
+
+        Args:
+            entry_id (int): The entry to attach the file to.
+            source (str or file object): The path of the file, or a binary file object to read it from.
+            name (str, optional): The attachment's name. Defaults to the file name of the path.
+
+        Returns:
+            int: The new attachment's id.
+
+        Raises:
+            ValueError: If there is no entry with that id, or no name is given for a file object.
+        """
+        if isinstance(source, (str, os.PathLike)):
+            name = name if name is not None else os.path.basename(source)
+            with open(source, 'rb') as file:
+                return self.add(entry_id, file, name)
+        if name is None:
+            raise ValueError("An attachment name is required when attaching from a file object.")
+        return self.add_chunks(entry_id, name, iter(lambda: source.read(self.chunk_size), b''))
+
+    def add_chunks(self, entry_id, name, chunks, created_at=None, commit=True):
+        """
+        Attaches a file given as its chunks, as restores do, keeping the chunks as they are cut.
+
+        Args:
+            entry_id (int): The entry to attach the file to.
+            name (str): The attachment's name.
+            chunks (iterable of bytes): The file's contents, a chunk at a time.
+            created_at (str, optional): When the file was first attached. Defaults to now.
+            commit (bool): Whether to commit once the attachment is written. Callers that group several
+                writes into one transaction pass False and commit or roll back themselves. Defaults to True.
+
+        Returns:
+            int: The new attachment's id.
+
+        Raises:
+            ValueError: If there is no entry with that id.
+        """
+        connection = self.db.connection
+        if connection.execute("SELECT 1 FROM vault WHERE id = ?;", (entry_id,)).fetchone() is None:
+            raise ValueError(f"There is no entry with id {entry_id}.")
+        content_hash = hmac.new(self._address_key, b"file", hashlib.sha256)
+        size = 0
+        cursor = connection.cursor()
+        try:
+            cursor.execute("""INSERT INTO attachments (entry_id, name, size, content_hash, created_at)
+                              VALUES (?, ?, 0, x'', COALESCE(?, CURRENT_TIMESTAMP));""",
+                           (entry_id, Encryption.encrypt_data(name, self.encryption_key), created_at))
+            attachment_id = cursor.lastrowid
+            for position, chunk in enumerate(chunks):
+                address = hmac.new(self._address_key, chunk, hashlib.sha256).digest()
+                if cursor.execute("SELECT 1 FROM chunks WHERE hash = ?;", (address,)).fetchone() is None:
+                    cursor.execute("INSERT INTO chunks (hash, data) VALUES (?, ?);",
+                                   (address, Encryption.encrypt_bytes(chunk, self._chunk_key, address)))
+                cursor.execute("INSERT INTO attachment_chunks (attachment_id, position, chunk_hash) VALUES (?, ?, ?);",
+                               (attachment_id, position, address))
+                content_hash.update(address)
+                size += len(chunk)
+            content_hash.update(struct.pack('>Q', size))
+            cursor.execute("UPDATE attachments SET size = ?, content_hash = ? WHERE id = ?;", (size, content_hash.digest(), attachment_id))
+            if commit:
+                connection.commit()
+        except BaseException:
+            if commit:
+                connection.rollback()
+            raise
+        return attachment_id
+
+    def list(self, entry_id):
+        """
+        Lists an entry's attachments.
+
+        Returns:
+            list of dict: 'id', 'name', 'size' (bytes) and 'created_at' of each attachment, oldest first.
+        """
+        cursor = self.db.connection.execute(
+            "SELECT id, name, size, created_at FROM attachments WHERE entry_id = ? ORDER BY id;", (entry_id,))
+        return [{'id': attachment_id, 'name': Encryption.decrypt_data(name, self.encryption_key), 'size': size, 'created_at': created_at}
+                for attachment_id, name, size, created_at in cursor.fetchall()]
+
+    def iter_chunks(self, attachment_id):
+        """
+        Yields an attachment's contents a chunk at a time, decrypting and verifying each one.
+
+        Raises:
+            ValueError: If there is no such attachment, a chunk fails authentication, or the chunks read do not
+                make up the file that was attached. The error is raised after the chunks read so far were
+                yielded, so callers writing the data out should discard it on error.
+        """
+        connection = self.db.connection
+        row = connection.execute("SELECT size, content_hash FROM attachments WHERE id = ?;", (attachment_id,)).fetchone()
+        if row is None:
+            raise ValueError(f"There is no attachment with id {attachment_id}.")
+        size, expected_hash = row
+        content_hash = hmac.new(self._address_key, b"file", hashlib.sha256)
+        read = 0
+        addresses = [address for address, in connection.execute(
+            "SELECT chunk_hash FROM attachment_chunks WHERE attachment_id = ? ORDER BY position;", (attachment_id,))]
+        for address in addresses:
+            # One chunk row at a time, so only the current chunk is held in memory.
+            stored = connection.execute("SELECT data FROM chunks WHERE hash = ?;", (address,)).fetchone()
+            if stored is None:
+                raise ValueError(f"Attachment {attachment_id} is missing a chunk.")
+            chunk = Encryption.decrypt_bytes(stored[0], self._chunk_key, address)
+            content_hash.update(address)
+            read += len(chunk)
+            yield chunk
+        content_hash.update(struct.pack('>Q', read))
+        if read != size or not hmac.compare_digest(content_hash.digest(), expected_hash):
+            raise ValueError(f"Attachment {attachment_id} is corrupt: its chunks do not match the attached file.")
+
+    def save(self, attachment_id, output_path):
+        """
+        Writes an attachment to a file. The file only appears once the whole attachment has been verified.
+
+        Returns:
+            int: The number of bytes written.
+        """
+        temporary_path = output_path + '.tmp'
+        written = 0
+        try:
+            with open(temporary_path, 'wb') as output:
+                for chunk in self.iter_chunks(attachment_id):
+                    output.write(chunk)
+                    written += len(chunk)
+            os.replace(temporary_path, output_path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        return written
+
+    def read(self, attachment_id):
+        """Returns an attachment's whole contents. Prefer iter_chunks or save for large files."""
+        return b''.join(self.iter_chunks(attachment_id))
+
+    def delete(self, attachment_id):
+        """Deletes an attachment. Chunks no other attachment uses are deleted with it."""
+        with self.db.connection:
+            self.db.connection.execute("DELETE FROM attachments WHERE id = ?;", (attachment_id,))
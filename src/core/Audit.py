@@ -0,0 +1,155 @@
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import hmac
+import json
+import os
+from .Breach_Check import BreachDatabase
+from .Database import Database
+from .Encryption import Encryption
+from .Password_Strength import PasswordStrength
+
+class VaultAudit:
+    """
+    Reports reused, weak, stale and breached passwords across the whole vault.
+
+    Only the password column is decrypted, in worker processes, and each worker hands back a keyed hash of
+    the password (HMAC-SHA256 under a key derived from the vault key) alongside its strength and breach count,
+    so no plaintext reaches the calling process or the cache. Identical passwords share a hash, which is how
+    reuse is found without comparing plaintexts.
+
+    Results are cached in the audit_cache table with the revision of the entry they describe, so a re-audit
+    only decrypts entries added or changed since the last one. The cache is dropped when the vault key, the
+    breach database or the scoring rules change. Staleness needs no decryption and is read from updated_at
+    at report time.
+
+    Attributes:
+        db (Database): The vault to audit.
+        breach_path (str): The breach database to check passwords against, or None to skip the check.
+        workers (int): The number of worker processes.
+        batch_size (int): The number of entries handed to a worker at a time.
+    """
+
+    ALGORITHM_VERSION = 2  # Bump when scoring changes so cached results are recomputed.
+    WEAK_SCORE = 2  # Passwords scoring below this are reported as weak.
+    STALE_DAYS = 365
+
+    def __init__(self, db, encryption_key, breach_path=None, workers=None, batch_size=1000):
+        """
+        Args:
+            db (Database): The vault to audit.
+            encryption_key (bytes): The vault's encryption key.
+            breach_path (str, optional): The breach database. Defaults to the application's, if there is one.
+            workers (int, optional): The number of worker processes. Defaults to the number of CPUs.
+            batch_size (int): The number of entries handed to a worker at a time. Defaults to 1000.
+        """
+        self.db = db
+        self.encryption_key = encryption_key
+        if breach_path is None and os.path.exists(BreachDatabase.get_default_path()):
+            breach_path = BreachDatabase.get_default_path()
+        self.breach_path = breach_path
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self._hash_key = hmac.new(encryption_key, b"credentials-cacher audit", hashlib.sha256).digest()
+
+    def _fingerprint(self):
+        """Identifies everything cached results depend on besides the entries themselves."""
+        corpus = None
+        if self.breach_path is not None:
+            status = os.stat(self.breach_path)
+            corpus = f"{status.st_size}:{status.st_mtime_ns}"
+        key_check = hmac.new(self._hash_key, b"key check", hashlib.sha256).hexdigest()
+        return json.dumps({'version': self.ALGORITHM_VERSION, 'key': key_check, 'breaches': corpus})
+
+    def refresh(self, progress_callback=None):
+        """
+        Brings the cached results up to date, auditing only entries whose revision changed.
+
+        Args:
+            progress_callback (Callable, optional): Called with (entries done, entries to do) after each batch.
+
+        Returns:
+            int: The number of entries audited.
+        """
+        connection = self.db.connection
+        fingerprint = self._fingerprint()
+        row = connection.execute("SELECT value FROM meta WHERE key = 'audit_fingerprint';").fetchone()
+        if row is None or row[0] != fingerprint:
+            with connection:
+                connection.execute("DELETE FROM audit_cache;")
+                connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('audit_fingerprint', ?);", (fingerprint,))
+
+        pending = connection.execute("""
+            SELECT vault.id, vault.revision, vault.password, vault.uuid, vault.key_version FROM vault
+            LEFT JOIN audit_cache ON audit_cache.entry_id = vault.id
+            WHERE audit_cache.revision IS NOT vault.revision;""").fetchall()
+        if not pending:
+            return 0
+
+        batches = [pending[start:start + self.batch_size] for start in range(0, len(pending), self.batch_size)]
+        arguments = (self.encryption_key, self._hash_key, self.breach_path)
+        with connection:
+            if self.workers <= 1 or len(batches) == 1:
+                self._store((_audit_batch(batch, *arguments) for batch in batches), len(pending), progress_callback)
+            else:
+                with ProcessPoolExecutor(max_workers=min(self.workers, len(batches))) as executor:
+                    results = executor.map(_audit_batch, batches, *([argument] * len(batches) for argument in arguments))
+                    self._store(results, len(pending), progress_callback)
+        return len(pending)
+
+    def _store(self, results, total, progress_callback):
+        """Writes audit_cache rows as worker batches complete."""
+        done = 0
+        for batch_results in results:
+            self.db.connection.executemany("INSERT OR REPLACE INTO audit_cache VALUES (?, ?, ?, ?, ?, ?, ?);", batch_results)
+            done += len(batch_results)
+            if progress_callback is not None:
+                progress_callback(done, total)
+
+    def run(self, stale_days=STALE_DAYS, progress_callback=None):
+        """
+        Audits the vault, refreshing the cache first.
+
+        Args:
+            stale_days (int): Entries not updated for this many days are reported as stale. Defaults to 365.
+            progress_callback (Callable, optional): Passed on to refresh.
+
+        Returns:
+            dict: The report:
+                'entries' (int): The number of entries in the vault.
+                'audited' (int): The number of entries decrypted for this report.
+                'reused' (list of list of int): Groups of ids of entries sharing a password, largest group first.
+                'weak' (list of dict): 'id', 'score', 'label', 'entropy' and 'warnings' of each weak password.
+                'stale' (list of dict): 'id' and 'updated_at' of each stale entry, oldest first.
+                'breached' (list of dict): 'id' and 'breach_count' of each password found in the breach database.
+        """
+        audited = self.refresh(progress_callback)
+        connection = self.db.connection
+        reused = [sorted(int(entry_id) for entry_id in ids.split(',')) for ids, in connection.execute("""
+            SELECT group_concat(entry_id) FROM audit_cache GROUP BY password_hash HAVING COUNT(*) > 1
+            ORDER BY COUNT(*) DESC, MIN(entry_id);""")]
+        weak = [{'id': entry_id, 'score': score, 'label': PasswordStrength.LABELS[score], 'entropy': entropy, 'warnings': json.loads(warnings)}
+                for entry_id, score, entropy, warnings in connection.execute(
+                    "SELECT entry_id, score, entropy, warnings FROM audit_cache WHERE score < ? ORDER BY score, entropy;", (self.WEAK_SCORE,))]
+        stale = [{'id': entry_id, 'updated_at': updated_at} for entry_id, updated_at in connection.execute(
+            "SELECT id, updated_at FROM vault WHERE updated_at < datetime('now', ?) ORDER BY updated_at;", (f"-{int(stale_days)} days",))]
+        breached = [{'id': entry_id, 'breach_count': count} for entry_id, count in connection.execute(
+            "SELECT entry_id, breach_count FROM audit_cache WHERE breach_count > 0 ORDER BY breach_count DESC;")]
+        entries = connection.execute("SELECT COUNT(*) FROM vault;").fetchone()[0]
+        return {'entries': entries, 'audited': audited, 'reused': reused, 'weak': weak, 'stale': stale, 'breached': breached}
+
+
+def _audit_batch(rows, encryption_key, hash_key, breach_path):
+    """
+    Audits a batch of (id, revision, encrypted password, uuid, key version) rows in a worker. Returns audit_cache rows, so the
+    decrypted passwords never leave this function.
+    """
+    passwords = [Encryption.decrypt_data(encrypted_password, Database.entry_key(encryption_key, entry_uuid, key_version))
+                 for _, _, encrypted_password, entry_uuid, key_version in rows]
+    estimates = PasswordStrength.estimate_many(passwords)
+    breach_counts = [None] * len(rows)
+    if breach_path is not None:
+        with BreachDatabase(breach_path) as breaches:
+            breach_counts = breaches.check_many(passwords)
+    return [(entry_id, revision, hmac.new(hash_key, password.encode('utf-8'), hashlib.sha256).digest(),
+             estimate['entropy'], estimate['score'], json.dumps(estimate['warnings']), breach_count)
+            for (entry_id, revision, *_), password, estimate, breach_count in zip(rows, passwords, estimates, breach_counts)]
@@ -0,0 +1,295 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import secrets
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+from .Database import Database
+from .Domain_Index import DomainIndex
+
+class AutofillBridge:
+    """
+    Answers browser extensions asking for the credentials of a site over HTTP on the loopback interface, while
+    the vault is unlocked in the application.
+
+    An extension is paired once: pair() gives a random token to enter in the extension, and only its SHA-256
+    digest is kept in the vault's meta table. Every request carries it as 'Authorization: Bearer <token>'.
+    Requests must also name the bridge itself as their Host, so that a web page cannot reach it through a DNS
+    name rebound to 127.0.0.1. No CORS headers are sent, so pages cannot read the replies either.
+
+        GET /ping                      -> 'pong'
+        GET /credentials?origin=<url>  -> the entries saved for the origin's site, those saved for its host or
+                                          a parent domain of it first, with their passwords
+
+    Replies are JSON, as {'ok': True, 'result': ...} or {'ok': False, 'error': ...}. An 'http' origin is only
+    given entries saved for 'http' URLs, so that a password saved for a secure site never reaches an insecure
+    page of it.
+
+    The bridge runs an asyncio server in a thread of its own and keeps connections alive between requests.
+    Requests are answered on a pool of LOOKUP_WORKERS threads, each with its own connection to the vault, so
+    that a slow lookup does not hold up the other extensions; a lookup the vault fails is answered with 503.
+    Entries are found through a DomainIndex, so a request decrypts only the entries saved for the site asked
+    about. stop() closes every connection and forgets the key.
+
+    Attributes:
+        db_path (str): The vault file.
+        encryption_key (bytes): The vault's data key, or None once stopped.
+        port (int): The port listened on. When started on port 0, the one the system picked.
+    """
+
+    HOST = '127.0.0.1'
+    DEFAULT_PORT = 17865
+    TOKEN_HASH_KEY = 'autofill_bridge_token_hash'
+    MAX_HEADER_SIZE = 16 * 1024
+    IDLE_CONNECTION_TIMEOUT = 60  # Seconds an idle connection is kept open
+    LOOKUP_WORKERS = 4
+    CREDENTIAL_FIELDS = ('uuid', 'website_name', 'website_url', 'username', 'password')
+
+    def __init__(self, db_path, encryption_key, port=DEFAULT_PORT):
+        """
+        Args:
+            db_path (str): The vault file. The bridge opens a connection of its own to it.
+            encryption_key (bytes): The vault's data key.
+            port (int, optional): The port to listen on. Defaults to DEFAULT_PORT.
+        """
+        self.db_path = db_path
+        self.encryption_key = encryption_key
+        self.port = port
+        self._token_hash = None
+        self._workers = threading.local()  # Each lookup thread's connection and DomainIndex
+        self._thread = None
+        self._loop = None
+        self._stopped = None
+        self._connections = {}  # Connection task -> its writer
+        self._ready = threading.Event()
+        self._error = None
+
+    @staticmethod
+    def hash_token(token):
+        """Return the digest a pairing token is kept and compared as."""
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def pair(db):
+        """
+        Creates a new pairing token for a vault, replacing any earlier one.
+
+        Returns:
+            str: The token, to be entered in the browser extension. It is not kept anywhere.
+        """
+        token = secrets.token_urlsafe(32)
+        with db.connection:
+            db.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?);",
+                                  (AutofillBridge.TOKEN_HASH_KEY, AutofillBridge.hash_token(token)))
+        return token
+
+    @staticmethod
+    def is_paired(db):
+        """Checks whether a browser extension has been paired with a vault."""
+        return db.connection.execute("SELECT 1 FROM meta WHERE key = ?;", (AutofillBridge.TOKEN_HASH_KEY,)).fetchone() is not None
+
+    @staticmethod
+    def unpair(db):
+        """Forgets a vault's pairing token, so that no extension is answered any more."""
+        with db.connection:
+            db.connection.execute("DELETE FROM meta WHERE key = ?;", (AutofillBridge.TOKEN_HASH_KEY,))
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """
+        Starts serving in a background thread, returning once the bridge is listening.
+
+        Raises:
+            ValueError: If no browser extension has been paired with the vault.
+            OSError: If the port cannot be listened on.
+        """
+        self._ready.clear()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="autofill-bridge", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            self._thread.join()
+            self._thread = None
+            raise self._error
+
+    def stop(self):
+        """Stops serving, closing every connection, and forgets the key. Does nothing if the bridge is not running."""
+        loop, stopped = self._loop, self._stopped
+        if loop is not None and stopped is not None:
+            try:
+                loop.call_soon_threadsafe(stopped.set)
+            except RuntimeError:
+                pass  # The loop has already closed.
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.encryption_key = None
+
+    def _run(self):
+        db = None
+        try:
+            db = Database(self.db_path)
+            asyncio.run(self._serve(db))
+        except Exception as e:
+            if not self._ready.is_set():
+                self._error = e
+        finally:
+            self._loop = self._stopped = None
+            if db is not None:
+                db.close_connection()
+            self._ready.set()
+
+    async def _serve(self, db):
+        row = db.connection.execute("SELECT value FROM meta WHERE key = ?;", (self.TOKEN_HASH_KEY,)).fetchone()
+        if row is None:
+            raise ValueError("No browser extension has been paired with the vault.")
+        self._token_hash = row[0]
+        DomainIndex(db, self.encryption_key).refresh()  # Computes missing domain keys once, before the workers share the vault.
+        self._workers = threading.local()
+        self._stopped = asyncio.Event()
+        # asyncio.run waits for these threads when the server stops; their connections close as they exit.
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=self.LOOKUP_WORKERS, thread_name_prefix="autofill-lookup"))
+        server = await asyncio.start_server(self._handle_connection, self.HOST, self.port, limit=self.MAX_HEADER_SIZE)
+        self.port = server.sockets[0].getsockname()[1]
+        self._loop = asyncio.get_running_loop()
+        self._ready.set()
+        try:
+            async with server:
+                await self._stopped.wait()
+                # Connections are closed here rather than cancelled, so that their handlers finish cleanly.
+                for writer in self._connections.values():
+                    writer.close()
+                await asyncio.gather(*self._connections, return_exceptions=True)
+        finally:
+            self._token_hash = None
+
+    async def _handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while not self._stopped.is_set():
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), self.IDLE_CONNECTION_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+                    break
+                try:
+                    method, target, version, headers = self.parse_head(head)
+                except ValueError as e:
+                    writer.write(self.encode_response(HTTPStatus.BAD_REQUEST, {'ok': False, 'error': str(e)}, False))
+                    break
+                # Requests with a body are refused, so a connection is only kept if none can follow the head.
+                keep_alive = (version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                              and method == 'GET' and 'content-length' not in headers and 'transfer-encoding' not in headers)
+                status, reply = await asyncio.to_thread(self.handle_request, method, target, headers)
+                writer.write(self.encode_response(status, reply, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            self._connections.pop(task, None)
+
+    @staticmethod
+    def parse_head(head):
+        """
+        Splits the head of an HTTP request into its method, target, version and headers.
+
+        Returns:
+            tuple: The method, target and version strings, and a dict of headers by lower-case name.
+
+        Raises:
+            ValueError: If the head is malformed.
+        """
+        request_line, *header_lines = head.decode('latin-1').rstrip('\r\n').split('\r\n')
+        method, target, version = request_line.split(' ')
+        if not version.startswith('HTTP/1.'):
+            raise ValueError("Unsupported HTTP version.")
+        headers = {}
+        for line in header_lines:
+            name, separator, value = line.partition(':')
+            if not separator or not name.strip():
+                raise ValueError("Malformed header.")
+            headers[name.strip().lower()] = value.strip()
+        return method, target, version, headers
+
+    def handle_request(self, method, target, headers):
+        """
+        Answers one request. Called on a lookup thread.
+
+        Args:
+            method (str): The HTTP method.
+            target (str): The request target, a path and query string.
+            headers (dict): The headers, by lower-case name.
+
+        Returns:
+            tuple: The HTTP status and the reply.
+        """
+        if headers.get('host') not in (f"127.0.0.1:{self.port}", f"localhost:{self.port}"):
+            return HTTPStatus.FORBIDDEN, {'ok': False, 'error': "Unexpected host."}
+        scheme, _, token = headers.get('authorization', '').partition(' ')
+        if (scheme.lower() != 'bearer' or self._token_hash is None
+                or not hmac.compare_digest(self.hash_token(token.strip()), self._token_hash)):
+            return HTTPStatus.UNAUTHORIZED, {'ok': False, 'error': "A valid pairing token is required."}
+        if method != 'GET':
+            return HTTPStatus.METHOD_NOT_ALLOWED, {'ok': False, 'error': "Only GET requests are answered."}
+
+        parts = urlsplit(target)
+        if parts.path == '/ping':
+            return HTTPStatus.OK, {'ok': True, 'result': 'pong'}
+        if parts.path != '/credentials':
+            return HTTPStatus.NOT_FOUND, {'ok': False, 'error': "Not found."}
+        origin = parse_qs(parts.query).get('origin', [''])[0]
+        try:
+            return HTTPStatus.OK, {'ok': True, 'result': self.find_credentials(origin)}
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, {'ok': False, 'error': str(e)}
+        except sqlite3.Error:
+            return HTTPStatus.SERVICE_UNAVAILABLE, {'ok': False, 'error': "The vault is not available, try again."}
+
+    def find_credentials(self, origin):
+        """
+        Returns the entries saved for an origin's site, with their passwords, ordered by DomainIndex.match_rank.
+
+        Raises:
+            ValueError: If the origin is not an http or https URL with a host.
+        """
+        normalized = DomainIndex.normalize_url(origin)
+        if normalized is None or normalized.scheme not in ('http', 'https'):
+            raise ValueError("An http or https origin is required.")
+        credentials = []
+        for entry_uuid, entry in self._domain_index().find_entries(origin):
+            if normalized.scheme == 'http' and DomainIndex.normalize_url(entry[2]).scheme != 'http':
+                continue
+            credentials.append(dict(zip(self.CREDENTIAL_FIELDS, (entry_uuid,) + tuple(entry[1:5]))))
+        return credentials
+
+    def _domain_index(self):
+        """Return the calling thread's DomainIndex, opening its connection to the vault on first use."""
+        domains = getattr(self._workers, 'domains', None)
+        if domains is None:
+            domains = self._workers.domains = DomainIndex(Database(self.db_path), self.encryption_key)
+        return domains
+
+    @staticmethod
+    def encode_response(status, reply, keep_alive):
+        """Return an HTTP response carrying a reply as JSON."""
+        body = json.dumps(reply, separators=(',', ':')).encode('utf-8')
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}",
+                 "Content-Type: application/json",
+                 f"Content-Length: {len(body)}",
+                 "Cache-Control: no-store",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if status == HTTPStatus.UNAUTHORIZED:
+            lines.append("WWW-Authenticate: Bearer")
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
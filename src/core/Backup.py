@@ -0,0 +1,651 @@
+import base64
+import json
+import os
+import re
+import struct
+from Crypto.Cipher import AES
+from Crypto.Random import get_random_bytes
+from .Attachments import AttachmentStore
+from .Encryption import Encryption
+
+class VaultBackup:
+    """
+    Writes and restores encrypted, authenticated vault backup archives.
+
+    An archive is a short header followed by a sequence of frames. The plaintext is one JSON record per
+    line, cut into chunks of at most CHUNK_SIZE bytes, and each chunk is sealed with AES-256-GCM under a key
+    derived from the backup password. Every frame's nonce carries its position in the stream, and the header,
+    the position and a final-frame flag are authenticated with it, so frames cannot be reordered, dropped,
+    spliced between archives or truncated without detection. Only one chunk is held in memory at a time.
+
+    Entry records come first. Each previous version of an entry is a {'history': ...} record and each
+    attachment an {'attachment': ...} record followed by {'chunk': ...} records holding its contents; these
+    refer to their entry by its id in the archive. Archives of format version 1 hold only entries.
+
+    Attributes:
+        db (Database): The database entries are exported from and restored into.
+        encryption_key (bytes): The vault's encryption key.
+        batch_size (int): The number of entries fetched or written at a time.
+        progress_callback (Callable, optional): Called with the number of entries processed so far.
+    """
+
+    MAGIC = b'CCBACKUP'
+    FORMAT_VERSION = 2
+    ENTRIES_ONLY_VERSION = 1  # Archives written before they held password history and attachments
+    HEADER_FORMAT = '>8sB16s8s'  # Magic, format version, password salt, nonce prefix
+    FRAME_FORMAT = '>BI'  # Final-frame flag, ciphertext length
+    TAG_SIZE = 16
+    CHUNK_SIZE = 64 * 1024
+    ENTRY_FIELDS = ('id', 'website_name', 'website_url', 'username', 'password', 'notes', 'favourite', 'created_at', 'updated_at',
+                    'uuid', 'version_vector')
+
+    def __init__(self, db, encryption_key, batch_size=500, progress_callback=None):
+        """
+        Initializes the backup helper.
+
+        Args:
+            db (Database): The database to export from or restore into.
+            encryption_key (bytes): The vault's encryption key.
+            batch_size (int): The number of entries fetched or written at a time. Defaults to 500.
+            progress_callback (Callable, optional): Receives the number of entries processed so far.
+        """
+        self.db = db
+        self.encryption_key = encryption_key
+        self.batch_size = batch_size
+        self.progress_callback = progress_callback
+
+    def export_vault(self, path, password):
+        """
+        Streams every vault entry into an encrypted backup archive.
+
+        The archive is written next to its destination and moved into place once complete, so an
+        interrupted export never leaves a partial file at the given path.
+
+        Args:
+            path (str): The archive file to write.
+            password (str): The password protecting the archive.
+
+        Returns:
+            int: The number of entries exported.
+        """
+        exported = 0
+
+        def records():
+            nonlocal exported
+            for record in self._counted(self.iter_records(self.db, self.encryption_key, self.batch_size)):
+                exported += 1
+                yield record
+            yield from self.iter_extra_records(self.db, self.encryption_key)
+
+        self.write_archive(path, password, records())
+        return exported
+
+    def restore_vault(self, path, password, wipe_existing=False):
+        """
+        Streams the entries of a backup archive back into the vault.
+
+        The restore runs as a single transaction: if the archive fails authentication part way through,
+        nothing is written. Password history and attachments are restored with their entries.
+
+        Args:
+            path (str): The archive file to read.
+            password (str): The password protecting the archive.
+            wipe_existing (bool): Whether to replace the current vault contents. Entries then keep their
+                original ids; otherwise they are added alongside the existing entries. Defaults to False.
+                Either way, entries keep the uuid and version vector sync knows them by, except those added
+                alongside an entry that has them already, which become new entries.
+
+        Returns:
+            int: The number of entries restored.
+
+        Raises:
+            ValueError: If the password is wrong or the archive is corrupt or truncated, or if wipe_existing is
+                set for an archive without password history and attachments while the vault has some.
+        """
+        if wipe_existing:
+            self.check_replaceable([path])
+        try:
+            if wipe_existing:
+                self.db.connection.execute("DELETE FROM vault;")
+            restored = self.restore_records(self._counted(self.read_archive(path, password)), keep_ids=wipe_existing)
+            self.db.connection.commit()
+        except Exception:
+            self.db.connection.rollback()
+            raise
+        return restored
+
+    def check_replaceable(self, paths):
+        """
+        Refuses to replace the vault with archives written before they held password history and attachments,
+        if the vault has any, as they would be deleted with nothing to restore them from.
+
+        Raises:
+            ValueError: If one of the archives holds only entries and the vault has history or attachments.
+        """
+        if all(self.archive_version(path) != self.ENTRIES_ONLY_VERSION for path in paths):
+            return
+        connection = self.db.connection
+        if (connection.execute("SELECT 1 FROM password_history LIMIT 1;").fetchone() is not None
+                or connection.execute("SELECT 1 FROM attachments LIMIT 1;").fetchone() is not None):
+            raise ValueError("The backup was written before backups held password history and attachments, so replacing "
+                             "the vault with it would delete the vault's. Restore it alongside the current entries instead.")
+
+    def restore_records(self, records, keep_ids=True):
+        """
+        Writes archive records into the vault in the caller's transaction, entries in batches.
+
+        Args:
+            records (iterable of dict): The records, as read_archive yields them.
+            keep_ids (bool): Whether entries keep their ids in the archive, replacing any entry with the same id
+                along with its history and attachments, and records marking an entry deleted delete it.
+                Otherwise entries are added as new ones, and those with the uuid of an existing entry are given
+                a new one. Defaults to True.
+
+        Returns:
+            int: The number of entries written.
+
+        Raises:
+            ValueError: If a record is malformed or refers to an entry the archive does not hold.
+        """
+        connection = self.db.connection
+        existing_uuids = set() if keep_ids else {row[0] for row in connection.execute("SELECT uuid FROM vault;")}
+        attachments = AttachmentStore(self.db, self.encryption_key)
+        ids = {}  # Archive id -> vault id of the entries written so far
+        batch = []
+        restored = 0
+
+        def flush():
+            nonlocal batch, restored
+            if not batch:
+                return
+            if keep_ids:
+                self.db.add_password_entries(batch, self.encryption_key, commit=False)
+                ids.update((record['id'], record['id']) for record in batch)
+            else:
+                archive_ids = [record.pop('id', None) for record in batch]
+                ids.update(zip(archive_ids, self.db.add_password_entries(batch, self.encryption_key, commit=False, return_ids=True)))
+            restored += len(batch)
+            batch = []
+
+        records = iter(records)
+        for record in records:
+            if 'snapshot' in record:
+                continue  # Incremental snapshots start with a description of themselves.
+            if 'history' in record or 'attachment' in record:
+                flush()
+                details = record.get('history') or record['attachment']
+                entry_id = ids.get(details['entry_id'])
+                if entry_id is None:
+                    raise ValueError("Backup archive refers to an entry it does not hold.")
+                if 'history' in record:
+                    self.db.add_password_history(entry_id, {field: value for field, value in details.items() if field != 'entry_id'},
+                                                 self.encryption_key, commit=False)
+                else:
+                    attachments.add_chunks(entry_id, details['name'], self._read_chunks(records, details['size']),
+                                           details.get('created_at'), commit=False)
+            elif record.get('deleted'):
+                if keep_ids:
+                    connection.execute("DELETE FROM vault WHERE id = ?;", (record['id'],))
+            else:
+                if keep_ids:
+                    # The entry's history and attachments go with it; the archive holds them if it still has any.
+                    connection.execute("DELETE FROM vault WHERE id = ?;", (record['id'],))
+                elif record.get('uuid') in existing_uuids:
+                    record.pop('uuid')
+                    record.pop('version_vector', None)
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    flush()
+        flush()
+        return restored
+
+    @staticmethod
+    def _read_chunks(records, size):
+        """Yields the contents of the attachment whose chunk records come next, until size bytes are read."""
+        read = 0
+        while read < size:
+            record = next(records, None)
+            if record is None or 'chunk' not in record:
+                raise ValueError("Backup archive is missing part of an attachment.")
+            chunk = base64.b64decode(record['chunk'])
+            read += len(chunk)
+            yield chunk
+
+    def _counted(self, records):
+        """Passes records through, reporting progress every batch."""
+        count = 0
+        for record in records:
+            yield record
+            count += 1
+            if self.progress_callback is not None and count % self.batch_size == 0:
+                self.progress_callback(count)
+        if self.progress_callback is not None:
+            self.progress_callback(count)
+
+    @classmethod
+    def entry_to_record(cls, entry, version=None):
+        """
+        Converts a decrypted entry tuple into an archive record.
+
+        Args:
+            entry (tuple): A decrypted entry as returned by Database.fetch_all_entries.
+            version (tuple, optional): The entry's uuid and version vector, as returned by
+                Database.fetch_entry_versions. Left out of the record if not given.
+
+        Returns:
+            dict: The entry keyed by column name.
+        """
+        record = dict(zip(cls.ENTRY_FIELDS, tuple(entry) + tuple(version or ())))
+        record['favourite'] = bool(record['favourite'])
+        return record
+
+    @classmethod
+    def entries_to_records(cls, db, entries):
+        """Converts decrypted entries into archive records, with the uuids and version vectors they have in db."""
+        versions = db.fetch_entry_versions([entry[0] for entry in entries])
+        return [cls.entry_to_record(entry, versions.get(entry[0])) for entry in entries]
+
+    @classmethod
+    def iter_records(cls, db, encryption_key, batch_size=500):
+        """Yields an archive record for every vault entry, fetching and decrypting batch_size entries at a time."""
+        batch = []
+        for entry in db.iter_entries(encryption_key, batch_size):
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                yield from cls.entries_to_records(db, batch)
+                batch = []
+        yield from cls.entries_to_records(db, batch)
+
+    @staticmethod
+    def iter_extra_records(db, encryption_key, entry_ids=None):
+        """
+        Yields the records of entries' password history and attachments, attachments' contents a chunk at a time.
+
+        Args:
+            db (Database): The vault.
+            encryption_key (bytes): The vault's encryption key.
+            entry_ids (list of int, optional): The entries whose records to yield. Defaults to every entry.
+        """
+        for entry_id, version in db.iter_password_history(encryption_key, entry_ids):
+            yield {'history': dict(version, entry_id=entry_id)}
+        attachments = AttachmentStore(db, encryption_key)
+        if entry_ids is None:
+            entry_ids = [row[0] for row in db.connection.execute("SELECT DISTINCT entry_id FROM attachments ORDER BY entry_id;")]
+        for entry_id in entry_ids:
+            for attachment in attachments.list(entry_id):
+                yield {'attachment': {'entry_id': entry_id, 'name': attachment['name'], 'size': attachment['size'],
+                                      'created_at': attachment['created_at']}}
+                for chunk in attachments.iter_chunks(attachment['id']):
+                    yield {'chunk': base64.b64encode(chunk).decode('ascii')}
+
+    @staticmethod
+    def record_entry_id(record):
+        """Returns the archive id of the entry an entry, deletion, history or attachment record belongs to."""
+        details = record.get('history') or record.get('attachment') or record
+        return details.get('entry_id', details.get('id'))
+
+    @classmethod
+    def archive_version(cls, path):
+        """
+        Returns the format version of an archive, read from its header.
+
+        Raises:
+            ValueError: If the file is not a backup archive.
+        """
+        with open(path, 'rb') as file:
+            header = file.read(struct.calcsize(cls.HEADER_FORMAT))
+        if len(header) != struct.calcsize(cls.HEADER_FORMAT) or struct.unpack(cls.HEADER_FORMAT, header)[0] != cls.MAGIC:
+            raise ValueError("Not a Credentials Cacher backup archive.")
+        return struct.unpack(cls.HEADER_FORMAT, header)[1]
+
+    @classmethod
+    def write_archive(cls, path, password, records, version=FORMAT_VERSION):
+        """
+        Writes records to an encrypted archive, one JSON line per record.
+
+        Args:
+            path (str): The archive file to write.
+            password (str): The password protecting the archive.
+            records (iterable of dict): The records to write.
+            version (int, optional): The format version to mark the archive with. Defaults to FORMAT_VERSION.
+
+        Returns:
+            int: The number of records written.
+        """
+        salt = get_random_bytes(16)
+        nonce_prefix = get_random_bytes(8)
+        header = struct.pack(cls.HEADER_FORMAT, cls.MAGIC, version, salt, nonce_prefix)
+        key = Encryption.derive_key(password.encode(), salt)
+
+        temporary_path = path + '.tmp'
+        count = 0
+        try:
+            with open(temporary_path, 'wb') as file:
+                file.write(header)
+                counter = 0
+                chunk = bytearray()
+                for record in records:
+                    chunk += json.dumps(record, separators=(',', ':')).encode() + b'\n'
+                    count += 1
+                    while len(chunk) >= cls.CHUNK_SIZE:
+                        # Records may straddle frames; the reader stitches lines back together.
+                        cls._write_frame(file, key, header, nonce_prefix, counter, bytes(chunk[:cls.CHUNK_SIZE]), final=False)
+                        counter += 1
+                        del chunk[:cls.CHUNK_SIZE]
+                cls._write_frame(file, key, header, nonce_prefix, counter, bytes(chunk), final=True)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary_path, path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        return count
+
+    @classmethod
+    def read_archive(cls, path, password):
+        """
+        Yields the records of an encrypted archive, decrypting and verifying one frame at a time.
+
+        Args:
+            path (str): The archive file to read.
+            password (str): The password protecting the archive.
+
+        Yields:
+            dict: The archive's records, in the order they were written.
+
+        Raises:
+            ValueError: If the password is wrong or the archive is corrupt or truncated.
+        """
+        with open(path, 'rb') as file:
+            header = file.read(struct.calcsize(cls.HEADER_FORMAT))
+            if len(header) != struct.calcsize(cls.HEADER_FORMAT):
+                raise ValueError("Not a Credentials Cacher backup archive.")
+            magic, version, salt, nonce_prefix = struct.unpack(cls.HEADER_FORMAT, header)
+            if magic != cls.MAGIC:
+                raise ValueError("Not a Credentials Cacher backup archive.")
+            if version not in (cls.ENTRIES_ONLY_VERSION, cls.FORMAT_VERSION):
+                raise ValueError(f"Unsupported backup archive version: {version}")
+            key = Encryption.derive_key(password.encode(), salt)
+
+            counter = 0
+            remainder = b''
+            while True:
+                frame_header = file.read(struct.calcsize(cls.FRAME_FORMAT))
+                if len(frame_header) != struct.calcsize(cls.FRAME_FORMAT):
+                    raise ValueError("Backup archive is truncated.")
+                final, length = struct.unpack(cls.FRAME_FORMAT, frame_header)
+                if length > cls.CHUNK_SIZE:
+                    raise ValueError("Backup archive is corrupted or the password is incorrect.")
+                sealed = file.read(length + cls.TAG_SIZE)
+                if len(sealed) != length + cls.TAG_SIZE:
+                    raise ValueError("Backup archive is truncated.")
+                plaintext = cls._open_frame(key, header, nonce_prefix, counter, final, sealed)
+                counter += 1
+
+                lines = (remainder + plaintext).split(b'\n')
+                remainder = lines.pop()
+                for line in lines:
+                    yield json.loads(line)
+                if final:
+                    break
+
+            if remainder or file.read(1):
+                raise ValueError("Backup archive has trailing data after its final frame.")
+
+    @classmethod
+    def _frame_cipher(cls, key, header, nonce_prefix, counter, final):
+        nonce = nonce_prefix + struct.pack('>I', counter)
+        cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+        cipher.update(header + struct.pack('>IB', counter, 1 if final else 0))
+        return cipher
+
+    @classmethod
+    def _write_frame(cls, file, key, header, nonce_prefix, counter, plaintext, final):
+        cipher = cls._frame_cipher(key, header, nonce_prefix, counter, final)
+        ciphertext, tag = cipher.encrypt_and_digest(plaintext)
+        file.write(struct.pack(cls.FRAME_FORMAT, 1 if final else 0, len(ciphertext)))
+        file.write(ciphertext)
+        file.write(tag)
+
+    @classmethod
+    def _open_frame(cls, key, header, nonce_prefix, counter, final, sealed):
+        cipher = cls._frame_cipher(key, header, nonce_prefix, counter, final)
+        try:
+            return cipher.decrypt_and_verify(sealed[:-cls.TAG_SIZE], sealed[-cls.TAG_SIZE:])
+        except ValueError:
+            raise ValueError("Backup archive is corrupted or the password is incorrect.")
+
+
+class IncrementalBackup:
+    """
+    Maintains a chain of backup archives in a directory: one full base snapshot followed by deltas
+    that hold only the entries changed since the previous snapshot.
+
+    Deltas are driven by the database's change log, so a backup costs I/O proportional to the number of
+    edits rather than to the size of the vault. Compaction folds the deltas into a new base. Snapshot files
+    are named after the change log sequence numbers they cover:
+
+        base-<seq>.ccbak            every entry as of change <seq>
+        delta-<from>-<to>.ccbak     entries changed after <from> up to <to>, with deletions as tombstones
+
+    Each file is a VaultBackup archive whose first record describes the snapshot. Entries are written with their
+    password history and attachments, which the change log also records changes to.
+
+    Attributes:
+        db (Database): The database being backed up.
+        encryption_key (bytes): The vault's encryption key.
+        directory (str): The directory holding the snapshot chain.
+        password (str): The password protecting the snapshot archives.
+        batch_size (int): The number of entries fetched or written at a time.
+    """
+
+    BASE_PATTERN = re.compile(r'^base-(\d+)\.ccbak$')
+    DELTA_PATTERN = re.compile(r'^delta-(\d+)-(\d+)\.ccbak$')
+
+    def __init__(self, db, encryption_key, directory, password, batch_size=500):
+        """
+        Initializes the incremental backup helper, creating the directory if needed.
+
+        Args:
+            db (Database): The database to back up or restore into.
+            encryption_key (bytes): The vault's encryption key.
+            directory (str): The directory holding the snapshot chain.
+            password (str): The password protecting the snapshot archives.
+            batch_size (int): The number of entries fetched or written at a time. Defaults to 500.
+        """
+        self.db = db
+        self.encryption_key = encryption_key
+        self.directory = directory
+        self.password = password
+        self.batch_size = batch_size
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def list_snapshots(self):
+        """
+        Finds the current chain: the newest base and the deltas that follow it, in order.
+
+        Returns:
+            tuple: The base's sequence number (None if there is no base) and a list of (from_seq, to_seq) delta ranges.
+        """
+        bases = []
+        deltas = []
+        for name in os.listdir(self.directory):
+            base_match = self.BASE_PATTERN.match(name)
+            delta_match = self.DELTA_PATTERN.match(name)
+            if base_match:
+                bases.append(int(base_match.group(1)))
+            elif delta_match:
+                deltas.append((int(delta_match.group(1)), int(delta_match.group(2))))
+        if not bases:
+            return None, []
+
+        base_seq = max(bases)
+        chain = []
+        last_seq = base_seq
+        for from_seq, to_seq in sorted(deltas):
+            if from_seq == last_seq:
+                chain.append((from_seq, to_seq))
+                last_seq = to_seq
+        return base_seq, chain
+
+    def base_path(self, seq):
+        return os.path.join(self.directory, f'base-{seq:012d}.ccbak')
+
+    def delta_path(self, from_seq, to_seq):
+        return os.path.join(self.directory, f'delta-{from_seq:012d}-{to_seq:012d}.ccbak')
+
+    def backup(self):
+        """
+        Writes the next snapshot: a base if the chain is empty or can no longer be continued, otherwise a delta.
+
+        Returns:
+            str: The path of the written snapshot, or None if nothing changed since the last one.
+        """
+        base_seq, deltas = self.list_snapshots()
+        if base_seq is None:
+            return self.write_base()
+        last_seq = deltas[-1][1] if deltas else base_seq
+
+        # If the change log has been pruned past the end of the chain, the missing changes cannot be recovered.
+        oldest_seq = self.db.oldest_change_seq()
+        current_seq = self.db.current_change_seq()
+        if current_seq == last_seq:
+            return None
+        if current_seq < last_seq or oldest_seq is None or oldest_seq > last_seq + 1:
+            return self.write_base()
+        if VaultBackup.archive_version(self.base_path(base_seq)) == VaultBackup.ENTRIES_ONLY_VERSION:
+            return self.write_base()  # Deltas cannot add the history and attachments the base lacks.
+        return self.write_delta(last_seq, current_seq)
+
+    def write_base(self):
+        """
+        Writes a full base snapshot of the vault.
+
+        Returns:
+            str: The path of the written snapshot.
+        """
+        seq = self.db.current_change_seq()
+
+        def records():
+            yield {'snapshot': {'kind': 'base', 'seq': seq}}
+            yield from VaultBackup.iter_records(self.db, self.encryption_key, self.batch_size)
+            yield from VaultBackup.iter_extra_records(self.db, self.encryption_key)
+
+        path = self.base_path(seq)
+        VaultBackup.write_archive(path, self.password, records())
+        return path
+
+    def write_delta(self, from_seq, to_seq):
+        """
+        Writes a delta holding the current state of every entry changed between two sequence numbers.
+
+        Args:
+            from_seq (int): The sequence number the previous snapshot ends at.
+            to_seq (int): The sequence number this delta ends at.
+
+        Returns:
+            str: The path of the written snapshot.
+        """
+        changed_ids = self.db.fetch_changed_entry_ids(from_seq, to_seq)
+
+        def records():
+            yield {'snapshot': {'kind': 'delta', 'from_seq': from_seq, 'to_seq': to_seq}}
+            for start in range(0, len(changed_ids), self.batch_size):
+                batch = changed_ids[start:start + self.batch_size]
+                entries = {record['id']: record for record in
+                           VaultBackup.entries_to_records(self.db, self.db.fetch_entries_by_ids(batch, self.encryption_key))}
+                for entry_id in batch:
+                    if entry_id in entries:
+                        yield entries[entry_id]
+                    else:
+                        yield {'id': entry_id, 'deleted': True}
+            yield from VaultBackup.iter_extra_records(self.db, self.encryption_key, changed_ids)
+
+        path = self.delta_path(from_seq, to_seq)
+        VaultBackup.write_archive(path, self.password, records())
+        return path
+
+    def compact(self):
+        """
+        Folds the deltas of the current chain into a new base snapshot and removes the old files.
+
+        The snapshots are streamed through: a first pass over the deltas finds which one holds the latest state
+        of each entry, and the new base takes every other entry from the old base and the rest from those
+        deltas, with their history and attachments. Change log rows covered by the new base are pruned.
+
+        Returns:
+            str: The path of the new base, or None if there was nothing to compact.
+        """
+        base_seq, deltas = self.list_snapshots()
+        if base_seq is None or not deltas:
+            return None
+
+        paths = [self.delta_path(from_seq, to_seq) for from_seq, to_seq in deltas]
+        latest = {}  # Entry id -> index of the delta holding its latest state
+        for index, path in enumerate(paths):
+            for record in VaultBackup.read_archive(path, self.password):
+                if 'snapshot' not in record and 'history' not in record and 'attachment' not in record and 'chunk' not in record:
+                    latest[record['id']] = index
+        new_seq = deltas[-1][1]
+
+        def records():
+            yield {'snapshot': {'kind': 'base', 'seq': new_seq}}
+            yield from self._records_of(self.base_path(base_seq), lambda entry_id: entry_id not in latest)
+            for index, path in enumerate(paths):
+                yield from self._records_of(path, lambda entry_id: latest.get(entry_id) == index)
+
+        # The new base only holds history and attachments if every snapshot it is made from does.
+        version = min(VaultBackup.archive_version(path) for path in [self.base_path(base_seq)] + paths)
+        path = self.base_path(new_seq)
+        VaultBackup.write_archive(path, self.password, records(), version)
+
+        # The new base is in place, so the files it replaces can go.
+        os.remove(self.base_path(base_seq))
+        for from_seq, to_seq in deltas:
+            os.remove(self.delta_path(from_seq, to_seq))
+        self.db.prune_changes(new_seq)
+        return path
+
+    def _records_of(self, path, wanted):
+        """Yields the records of a snapshot that belong to the entries wanted(entry_id) accepts, leaving out deletions."""
+        entry_id = None
+        for record in VaultBackup.read_archive(path, self.password):
+            if 'snapshot' in record or record.get('deleted'):
+                continue
+            if 'chunk' not in record:  # Chunks belong to the attachment before them.
+                entry_id = VaultBackup.record_entry_id(record)
+            if wanted(entry_id):
+                yield record
+
+    def restore(self):
+        """
+        Replaces the vault with the contents of the snapshot chain, in a single transaction.
+
+        Returns:
+            int: The number of entries in the vault after the restore.
+
+        Raises:
+            ValueError: If there is no base snapshot, the password is wrong or a snapshot is corrupt, or an entries-only
+                snapshot would wipe the vault's password history or attachments.
+        """
+        base_seq, deltas = self.list_snapshots()
+        if base_seq is None:
+            raise ValueError("No base snapshot found in the backup directory.")
+
+        paths = [self.base_path(base_seq)] + [self.delta_path(from_seq, to_seq) for from_seq, to_seq in deltas]
+        restorer = VaultBackup(self.db, self.encryption_key, self.batch_size)
+        restorer.check_replaceable(paths)
+        connection = self.db.connection
+        try:
+            connection.execute("DELETE FROM vault;")
+            for path in paths:
+                restorer.restore_records(VaultBackup.read_archive(path, self.password))
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        cursor = connection.cursor()
+        cursor.execute("SELECT COUNT(*) FROM vault;")
+        return cursor.fetchone()[0]
@@ -0,0 +1,227 @@
+import hashlib
+import heapq
+import mmap
+import os
+import struct
+import tempfile
+
+class BreachDatabase:
+    """
+    Checks passwords against a local corpus of breached password hashes, without network access.
+
+    The corpus is a binary file of fixed-size records sorted by SHA-1 digest, each holding the digest (or a
+    prefix of it) and the number of times the password was seen in breaches. The file is memory-mapped and
+    searched by bisection, so opening it reads nothing and each lookup touches about log2(n) records.
+    convert_hibp builds such a file from a Have I Been Pwned "SHA1:COUNT" text dump.
+
+    Truncated digests make the file smaller at the cost of rare false positives; with the default 20 bytes
+    (the full digest) matches are exact.
+
+    Attributes:
+        path (str): The corpus file.
+        digest_size (int): The number of digest bytes stored per record.
+        record_count (int): The number of records in the file.
+    """
+
+    MAGIC = b'CCBREACH'
+    VERSION = 1
+    HEADER = struct.Struct('>8sBB6x')  # Magic, version, digest size, padding
+    COUNT = struct.Struct('>I')
+    SORT_CHUNK_RECORDS = 1_000_000  # Records sorted in memory at a time when converting an unsorted dump
+
+    def __init__(self, path):
+        """
+        Opens a corpus file.
+
+        Args:
+            path (str): The corpus file, as written by convert_hibp.
+
+        Raises:
+            ValueError: If the file is not a corpus file.
+        """
+        self.path = path
+        with open(path, 'rb') as file:
+            header = file.read(self.HEADER.size)
+            if len(header) != self.HEADER.size:
+                raise ValueError("Not a breach database: the file is too short.")
+            magic, version, self.digest_size = self.HEADER.unpack(header)
+            if magic != self.MAGIC or version != self.VERSION or not 1 <= self.digest_size <= 20:
+                raise ValueError("Not a breach database, or written by a newer version.")
+            size = os.fstat(file.fileno()).st_size
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.record_size = self.digest_size + self.COUNT.size
+        if (size - self.HEADER.size) % self.record_size:
+            self._map.close()
+            raise ValueError("The breach database is truncated.")
+        self.record_count = (size - self.HEADER.size) // self.record_size
+
+    @classmethod
+    def get_default_path(cls):
+        """Get the default corpus location in the application's AppData directory."""
+        return os.path.join(os.getenv('APPDATA'), 'Credentials Cacher', 'breached_passwords.bin')
+
+    @classmethod
+    def open_default(cls):
+        """Opens the corpus at the default location, or returns None if there is none."""
+        path = cls.get_default_path()
+        return cls(path) if os.path.exists(path) else None
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def count_hash(self, digest):
+        """
+        Looks up a SHA-1 digest.
+
+        Args:
+            digest (bytes): The 20-byte SHA-1 digest of a password.
+
+        Returns:
+            int: The number of times the password was seen in breaches, or 0 if it is not in the corpus.
+        """
+        key = digest[:self.digest_size]
+        low, high = 0, self.record_count
+        while low < high:
+            middle = (low + high) // 2
+            offset = self.HEADER.size + middle * self.record_size
+            if self._map[offset:offset + self.digest_size] < key:
+                low = middle + 1
+            else:
+                high = middle
+        offset = self.HEADER.size + low * self.record_size
+        if low < self.record_count and self._map[offset:offset + self.digest_size] == key:
+            return self.COUNT.unpack_from(self._map, offset + self.digest_size)[0]
+        return 0
+
+    def count(self, password):
+        """Returns the number of times a password was seen in breaches, or 0."""
+        return self.count_hash(hashlib.sha1(password.encode('utf-8')).digest())
+
+    def check_many(self, passwords):
+        """
+        Looks up many passwords, for example every password in the vault. Repeated passwords are looked up once.
+
+        Args:
+            passwords (iterable of str): The passwords to check.
+
+        Returns:
+            list of int: The breach count of each password, in order.
+        """
+        counts = {}
+        results = []
+        for password in passwords:
+            if password not in counts:
+                counts[password] = self.count(password)
+            results.append(counts[password])
+        return results
+
+    @classmethod
+    def convert_hibp(cls, text_path, output_path, digest_size=20, progress_callback=None):
+        """
+        Converts a Have I Been Pwned SHA-1 dump ("HASH:COUNT" lines) into a corpus file.
+
+        Dumps ordered by hash are streamed straight through. Dumps in any other order are sorted in chunks
+        written to temporary files, which are then merged, so memory use stays bounded either way. Records
+        that share a (truncated) digest are merged and their counts added.
+
+        Args:
+            text_path (str): The dump to convert.
+            output_path (str): The corpus file to write. It is replaced only once conversion succeeds.
+            digest_size (int): Digest bytes to keep per record, from 1 to 20. Defaults to 20.
+            progress_callback (Callable, optional): Called with the number of lines read so far.
+
+        Returns:
+            int: The number of records written.
+
+        Raises:
+            ValueError: If a line is not a SHA-1 hash followed by an optional count.
+        """
+        if not 1 <= digest_size <= 20:
+            raise ValueError("digest_size must be between 1 and 20")
+        record_size = digest_size + cls.COUNT.size
+        runs = []
+        try:
+            chunk = []
+            previous = b''
+            in_order = True
+            for line_number, digest, count in cls._read_hibp(text_path, digest_size):
+                if digest < previous:
+                    in_order = False
+                previous = digest
+                chunk.append((digest, count))
+                if len(chunk) >= cls.SORT_CHUNK_RECORDS:
+                    runs.append(cls._write_run(chunk, in_order))
+                    chunk = []
+                    if progress_callback is not None:
+                        progress_callback(line_number)
+            if chunk or not runs:
+                runs.append(cls._write_run(chunk, in_order))
+
+            streams = [cls._read_run(run, digest_size, record_size) for run in runs]
+            temporary_path = output_path + '.tmp'
+            written = 0
+            try:
+                with open(temporary_path, 'wb') as output:
+                    output.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, digest_size))
+                    current, total = None, 0
+                    for digest, count in heapq.merge(*streams):
+                        if digest != current:
+                            if current is not None:
+                                output.write(current + cls.COUNT.pack(min(total, 0xFFFFFFFF)))
+                                written += 1
+                            current, total = digest, 0
+                        total += count
+                    if current is not None:
+                        output.write(current + cls.COUNT.pack(min(total, 0xFFFFFFFF)))
+                        written += 1
+                os.replace(temporary_path, output_path)
+            except BaseException:
+                if os.path.exists(temporary_path):
+                    os.remove(temporary_path)
+                raise
+            return written
+        finally:
+            for run in runs:
+                run.close()
+
+    @staticmethod
+    def _read_hibp(text_path, digest_size):
+        with open(text_path, 'r', encoding='ascii') as file:
+            for line_number, line in enumerate(file, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                hash_text, _, count_text = line.partition(':')
+                try:
+                    digest = bytes.fromhex(hash_text)
+                    count = int(count_text) if count_text else 1
+                except ValueError:
+                    digest, count = b'', 0
+                if len(digest) != 20 or count < 0:
+                    raise ValueError(f"Line {line_number} is not a SHA-1 hash with an optional count.")
+                yield line_number, digest[:digest_size], count
+
+    @staticmethod
+    def _write_run(chunk, in_order):
+        """Writes a chunk of records, sorted, to an anonymous temporary file."""
+        if not in_order:
+            chunk.sort()
+        run = tempfile.TemporaryFile()
+        run.write(b''.join(digest + BreachDatabase.COUNT.pack(min(count, 0xFFFFFFFF)) for digest, count in chunk))
+        run.seek(0)
+        return run
+
+    @staticmethod
+    def _read_run(run, digest_size, record_size):
+        while True:
+            block = run.read(record_size * 4096)
+            if not block:
+                return
+            for offset in range(0, len(block), record_size):
+                yield block[offset:offset + digest_size], BreachDatabase.COUNT.unpack_from(block, offset + digest_size)[0]
@@ -0,0 +1,245 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+from .Encryption import Encryption
+from .Key_Rotation import KeyRotation
+
+class Credentials:
+    """
+    Stores and checks the master credentials and derives the vault key, for the Qt application and for
+    tools that unlock the vault without it.
+
+    The credentials are kept in the vault's meta table, next to the global salt and the wrapped data key,
+    as a small versioned JSON record holding the username, a salted verifier of the master password and
+    the parameters it was derived with, so the parameters can change for new records without breaking old
+    ones. Logging in reads one file, and a password change updates the verifier and the wrapped data key
+    in one transaction.
+    """
+
+    VERSION = 1  # Version of the credential record format
+    # How the verifier is derived for new records; each record stores its own parameters.
+    KDF = {'algorithm': 'pbkdf2-sha256', 'iterations': 100000, 'length': 32}
+
+    LEGACY_VAULT_NAME = 'passwords.db'  # The only vault file earlier versions kept credential files for
+
+    @staticmethod
+    def get_legacy_paths(db):
+        """
+        Get the paths of the credential files earlier versions kept next to the vault: a JSON record, and
+        before that a pickle.
+        """
+        directory = os.path.dirname(db.db_path)
+        return os.path.join(directory, 'credentials.json'), os.path.join(directory, 'credentials.bin')
+
+    @staticmethod
+    def has_legacy_files(db):
+        """
+        Return True if the vault has credential files from earlier versions to move into it. The files belong to
+        passwords.db, so other vault files in the same directory never take them.
+        """
+        if os.path.basename(db.db_path) != Credentials.LEGACY_VAULT_NAME:
+            return False
+        record_path, pickle_path = Credentials.get_legacy_paths(db)
+        return os.path.exists(record_path) or (os.path.exists(pickle_path) and os.path.getsize(pickle_path) > 0)
+
+    @staticmethod
+    def exists(db):
+        """Return True if master credentials have been registered for the vault, here or in a legacy file."""
+        if db.connection.execute("SELECT 1 FROM meta WHERE key = 'credentials';").fetchone() is not None:
+            return True
+        return Credentials.has_legacy_files(db)
+
+    @staticmethod
+    def load(db):
+        """
+        Reads the vault's master credentials. Credentials kept in files by earlier versions are moved into the
+        vault on first read.
+
+        Returns:
+            dict: The credential record: 'version', 'username', 'kdf' (the verifier's derivation parameters),
+                and base64 'salt' and 'verifier'.
+
+        Raises:
+            ValueError: If no credentials have been registered, or the record is corrupt or from a newer version.
+        """
+        row = db.connection.execute("SELECT value FROM meta WHERE key = 'credentials';").fetchone()
+        if row is None:
+            Credentials._migrate(db)
+            row = db.connection.execute("SELECT value FROM meta WHERE key = 'credentials';").fetchone()
+        try:
+            record = json.loads(row[0])
+        except json.JSONDecodeError as e:
+            raise ValueError(f"The stored credentials are corrupt: {e}")
+        if not isinstance(record, dict) or not {'version', 'username', 'kdf', 'salt', 'verifier'} <= record.keys():
+            raise ValueError("The stored credentials are corrupt: fields are missing.")
+        if record['version'] > Credentials.VERSION:
+            raise ValueError("The stored credentials were written by a newer version of the application.")
+        return record
+
+    @staticmethod
+    def _migrate(db):
+        """
+        Moves credentials from the files earlier versions kept into the vault, then renames the files with a
+        .migrated suffix: they are never read again, so an outdated verifier cannot outlive a password change,
+        but a copy is kept in case the vault is lost.
+
+        Raises:
+            ValueError: If there are no credentials to move, or they cannot be read.
+        """
+        if not Credentials.has_legacy_files(db):
+            raise ValueError("No master credentials have been registered.")
+        record_path, pickle_path = Credentials.get_legacy_paths(db)
+        if os.path.exists(record_path):
+            with open(record_path, 'r', encoding='utf-8') as file:
+                record = file.read()
+        elif os.path.exists(pickle_path) and os.path.getsize(pickle_path) > 0:
+            record = json.dumps(Credentials._read_pickle(pickle_path))
+        else:
+            raise ValueError("No master credentials have been registered.")
+        Credentials._store(db, record)
+        for path in (record_path, pickle_path):
+            if os.path.exists(path):
+                os.replace(path, path + '.migrated')
+
+    @staticmethod
+    def _read_pickle(pickle_path):
+        """Converts pickled credentials ({'username', 'password': "salt::hash"}) to a credential record."""
+        import pickle  # Only needed once per installation, so not imported at startup.
+
+        class RestrictedUnpickler(pickle.Unpickler):
+            """Loads plain data only: a credentials file naming any class or function is rejected."""
+            def find_class(self, module, name):
+                raise pickle.UnpicklingError(f"The credentials file refers to {module}.{name}.")
+
+        with open(pickle_path, 'rb') as file:
+            try:
+                credentials = RestrictedUnpickler(file).load()
+                salt, verifier = credentials['password'].split("::")
+                username = credentials['username']
+            except (pickle.UnpicklingError, EOFError, KeyError, TypeError, AttributeError, ValueError) as e:
+                raise ValueError(f"The legacy credentials file could not be read: {e}")
+        # Older versions hashed with Hashing.hash_password, whose parameters match the defaults.
+        return {'version': Credentials.VERSION, 'username': username, 'kdf': dict(Credentials.KDF), 'salt': salt, 'verifier': verifier}
+
+    @staticmethod
+    def _derive_verifier(password, salt, kdf):
+        """Derive the verifier of a master password with a record's parameters."""
+        if kdf.get('algorithm') != 'pbkdf2-sha256':
+            raise ValueError(f"Unsupported key derivation function: {kdf.get('algorithm')}")
+        return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, kdf['iterations'], kdf['length'])
+
+    @staticmethod
+    def verify(db, username, password):
+        """
+        Checks a username and master password against the vault's credentials.
+
+        Args:
+            db (Database): The vault.
+            username (str): The entered username.
+            password (str): The entered master password.
+
+        Returns:
+            bool: True if the credentials match, False otherwise.
+
+        Raises:
+            ValueError: If no credentials have been registered or they cannot be read.
+        """
+        record = Credentials.load(db)
+        verifier = Credentials._derive_verifier(password, base64.b64decode(record['salt']), record['kdf'])
+        return hmac.compare_digest(verifier, base64.b64decode(record['verifier'])) and record['username'] == username
+
+    @staticmethod
+    def save(db, username, password, commit=True):
+        """
+        Stores the vault's master credentials.
+
+        Args:
+            db (Database): The vault.
+            username (str): The username.
+            password (str): The master password, stored as a salted verifier.
+            commit (bool): Whether to commit, or leave that to a caller writing more in the same transaction.
+        """
+        salt = os.urandom(16)
+        Credentials._store(db, json.dumps({
+            'version': Credentials.VERSION,
+            'username': username,
+            'kdf': dict(Credentials.KDF),
+            'salt': base64.b64encode(salt).decode(),
+            'verifier': base64.b64encode(Credentials._derive_verifier(password, salt, Credentials.KDF)).decode(),
+        }), commit)
+
+    @staticmethod
+    def _store(db, record, commit=True):
+        db.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('credentials', ?);", (record,))
+        if commit:
+            db.connection.commit()
+
+    @staticmethod
+    def unlock(db, username, password):
+        """
+        Verifies the master credentials and unlocks the vault's data key with the key derived from them.
+
+        Args:
+            db (Database): The vault, whose global salt is used for the master key.
+            username (str): The entered username.
+            password (str): The entered master password.
+
+        Returns:
+            bytes: The data key entries are encrypted with.
+
+        Raises:
+            ValueError: If the username or password is incorrect.
+        """
+        if not Credentials.verify(db, username, password):
+            raise ValueError("The username or password is incorrect.")
+        master_key = Credentials.derive_master_key(db, password)
+        if db.key_rotation_pending():
+            return KeyRotation(db, master_key).run()
+        return db.unwrap_data_key(master_key)
+
+    @staticmethod
+    def derive_master_key(db, password):
+        """Derive the master key from a master password and the vault's global salt."""
+        return Encryption.derive_key(password.encode(), db.global_salt())
+
+    @staticmethod
+    def change_password(db, username, old_password, new_password, rotate_data_key=False, workers=None, progress_callback=None):
+        """
+        Changes the master password.
+
+        The vault's data key is rewrapped under the new master key, which takes the same time whatever the
+        size of the vault. With rotate_data_key the vault is also re-encrypted under a new data key (see
+        KeyRotation), as when the old master password may have been exposed along with a copy of the vault.
+        The data keys and the credentials are replaced in one transaction, so a crash leaves the vault
+        opening with either the old or the new password.
+
+        Args:
+            db (Database): The vault.
+            username (str): The username.
+            old_password (str): The current master password.
+            new_password (str): The new master password.
+            rotate_data_key (bool): Whether to re-encrypt the vault under a new data key. Defaults to False.
+            workers (int, optional): Worker processes for the re-encryption. Defaults to the number of CPUs.
+            progress_callback (Callable, optional): Called with (items done, items to do) while re-encrypting.
+
+        Returns:
+            bytes: The vault's data key after the change.
+
+        Raises:
+            ValueError: If the username or current password is incorrect.
+        """
+        if not Credentials.verify(db, username, old_password):
+            raise ValueError("The username or password is incorrect.")
+        old_master_key = Credentials.derive_master_key(db, old_password)
+        new_master_key = Credentials.derive_master_key(db, new_password)
+        rotation = KeyRotation(db, old_master_key, workers=workers, progress_callback=progress_callback)
+        rotation.run()  # Finishes a rotation interrupted earlier, so the data keys are settled before rewrapping.
+        with db.connection:
+            if rotate_data_key:
+                rotation.start(new_master_key, commit=False)
+            else:
+                db.rewrap_data_key(old_master_key, new_master_key, commit=False)
+            Credentials.save(db, username, new_password, commit=False)
+        return rotation.run() if rotate_data_key else db.unwrap_data_key(new_master_key)
@@ -1,14 +1,65 @@
+import hashlib
 import sqlite3
 import os
+import uuid
+from Crypto.Random import get_random_bytes
+from .Domain_Index import DomainIndex
 from .Encryption import Encryption
+from .Migrations import Migrations
+from .utils import get_installation_id
 
 class Database:
-    def __init__(self):
-        # Initialize database paths and connection
-        self.db_path = self.get_db_path()
+    # Columns read to decrypt an entry: the nine returned fields, then what selects the entry's key.
+    ENTRY_COLUMNS = "id, website_name, website_url, username, password, notes, favourite, created_at, updated_at, uuid, key_version"
+    KEY_VERSION = 1  # Key version of newly written entries: fields encrypted under the entry's own subkey
+    DATA_KEY_CONTEXT = b"credentials-cacher data key"  # Associated data of the wrapped data key
+    HISTORY_FIELDS = ("website_name", "website_url", "username", "password", "notes")
+    # Columns read to decrypt a password history row: what selects its key, then the fields it may hold.
+    HISTORY_COLUMNS = ("entry_id, changed_fields, replaced_at, key_version, (SELECT uuid FROM vault WHERE id = password_history.entry_id), "
+                       + ", ".join(HISTORY_FIELDS))
+
+    def __init__(self, db_path=None, progress_callback=None):
+        # Initialize database paths and connection. A path can be given to open a vault other than the default one,
+        # and a progress callback to follow the upgrade of a vault from an earlier version (see create_table).
+        self.db_path = db_path if db_path is not None else self.get_db_path()
         self.salt_path = self.get_salt_path()
         self.connection = self.connect_to_db()
-        self.create_table()
+        self.upgrade(progress_callback)
+        self.claim_replica_id()
+
+    @classmethod
+    def inspect(cls, db_path):
+        """
+        Open another vault file, such as one to sync with, without writing to it: its schema is not upgraded and
+        it is given no salt or replica id. Call upgrade() before using it as a vault.
+
+        Raises:
+            ValueError: If the file is not a vault, was written by a newer version of the application, or has no
+                salt. A salt made up for it would never derive the key its entries are encrypted with.
+        """
+        if not os.path.isfile(db_path):
+            raise ValueError("The vault file does not exist.")
+        db = cls.__new__(cls)
+        db.db_path = db_path
+        db.salt_path = db.get_salt_path()
+        db.connection = db.connect_to_db()
+        try:
+            if Migrations.schema_version(db.connection) > Migrations.latest_version():
+                raise ValueError("The vault was written by a newer version of the application.")
+            has_meta = db.connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'meta';").fetchone()
+            if (not has_meta or db.global_salt() is None) and not os.path.exists(db.salt_path):
+                raise ValueError("The vault file has no salt, so it cannot be unlocked.")
+        except sqlite3.DatabaseError as e:
+            db.close_connection()
+            raise ValueError(f"Not a vault file: {e}")
+        except ValueError:
+            db.close_connection()
+            raise
+        return db
+
+    def upgrade(self, progress_callback=None):
+        """Bring the vault's schema up to date and make sure its salt is kept in it (see create_table and initialize_salt)."""
+        self.create_table(progress_callback)
         self.initialize_salt()
 
     def get_db_path(self):
@@ -20,40 +71,332 @@ class Database:
         return os.path.join(db_directory, 'passwords.db')
 
     def get_salt_path(self):
-        """Get the file path for the global salt used in encryption."""
+        """Get the file path of the global salt of vaults from before it was kept in the meta table."""
         return os.path.join(os.path.dirname(self.db_path), 'global_salt.bin')
 
     def initialize_salt(self):
-        """Create a new global salt file if it doesn't already exist."""
-        if not os.path.exists(self.salt_path):
+        """
+        Give the vault a global salt in the meta table. Vaults from before it was kept there take the one from
+        global_salt.bin next to them. The file is left in place, as other vault files in the same directory
+        may still need to take it.
+        """
+        if self.global_salt() is not None:
+            return
+        if os.path.exists(self.salt_path):
+            with open(self.salt_path, 'rb') as salt_file:
+                salt = salt_file.read()
+        else:
             salt = os.urandom(16)
-            with open(self.salt_path, 'wb') as f:
-                f.write(salt)
+        with self.connection:
+            self.connection.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('global_salt', ?);", (salt,))
+
+    def global_salt(self):
+        """Return the salt the master key is derived with, or None before initialize_salt has run."""
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'global_salt';").fetchone()
+        return row[0] if row is not None else None
 
     def connect_to_db(self):
         """Establish a SQLite database connection."""
         return sqlite3.connect(self.db_path)
 
-    def create_table(self):
-        """Create the main table for storing encrypted vault entries if it doesn't exist."""
-        cursor = self.connection.cursor()
-        table_creation_query = """
-            CREATE TABLE IF NOT EXISTS vault (
-                id INTEGER PRIMARY KEY,
-                website_name TEXT NOT NULL,
-                website_url TEXT,
-                username TEXT NOT NULL,
-                password TEXT NOT NULL,
-                notes TEXT,
-                favourite INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );"""
-        cursor.execute(table_creation_query)
+    def create_table(self, progress_callback=None):
+        """
+        Bring the vault's schema up to date (see Migrations), creating it for a new vault.
+
+        Args:
+            progress_callback (Callable, optional): Called with (description, done, total) while migrations run.
+
+        Raises:
+            ValueError: If the vault was written by a newer version of the application.
+        """
+        Migrations.upgrade(self.connection, progress_callback)
+
+    def unwrap_data_key(self, master_key):
+        """
+        Return the vault's data key, the key entries are encrypted with, by unwrapping it with the key derived
+        from the master password.
+
+        A vault without a data key gets one here: a random key if the vault is empty, or otherwise the master
+        key itself, since that is what its existing entries are encrypted with. In the second case the master
+        key is first checked against an entry, so a wrong password can never become the data key.
+
+        Args:
+            master_key (bytes): The key derived from the master password with Encryption.derive_key.
+
+        Returns:
+            bytes: The data key.
+
+        Raises:
+            ValueError: If the master key is wrong, or a key rotation is pending and must be finished first
+                (see Key_Rotation.KeyRotation).
+        """
+        if self.key_rotation_pending():
+            raise ValueError("An interrupted key rotation must be finished before the vault can be unlocked.")
+        wrapped_key = self.wrapped_data_key()
+        if wrapped_key is not None:
+            return Encryption.decrypt_bytes(wrapped_key, master_key, self.DATA_KEY_CONTEXT)
+        cursor = self.connection.cursor()
+
+        sample = cursor.execute("SELECT password, uuid, key_version FROM vault LIMIT 1;").fetchone()
+        if sample is None:
+            data_key = get_random_bytes(32)
+        else:
+            Encryption.decrypt_data(sample[0], self.entry_key(master_key, sample[1], sample[2]))  # Raises ValueError for a wrong key.
+            data_key = master_key
+        with self.connection:
+            cursor.execute("INSERT INTO meta (key, value) VALUES ('wrapped_data_key', ?);",
+                           (Encryption.encrypt_bytes(data_key, master_key, self.DATA_KEY_CONTEXT),))
+        return data_key
+
+    def wrapped_data_key(self):
+        """Return the wrapped data key, or None if the vault has none yet. Copies of one vault share it."""
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'wrapped_data_key';").fetchone()
+        return row[0] if row is not None else None
+
+    def key_rotation_pending(self):
+        """Return True while a data key rotation has been started but not finished."""
+        return self.connection.execute("SELECT 1 FROM meta WHERE key = 'pending_data_key';").fetchone() is not None
+
+    def rewrap_data_key(self, old_master_key, new_master_key, commit=True):
+        """
+        Protect the data key with a new master key, as when the master password changes. Only the small
+        wrapped key is rewritten; entries keep their encryption.
+
+        Args:
+            old_master_key (bytes): The master key the data key is wrapped with.
+            new_master_key (bytes): The master key to wrap it with.
+            commit (bool): Whether to commit, or leave that to a caller writing more in the same transaction.
+
+        Raises:
+            ValueError: If the old master key is wrong.
+        """
+        data_key = self.unwrap_data_key(old_master_key)
+        self.connection.execute("UPDATE meta SET value = ? WHERE key = 'wrapped_data_key';",
+                                (Encryption.encrypt_bytes(data_key, new_master_key, self.DATA_KEY_CONTEXT),))
+        if commit:
+            self.connection.commit()
+
+    @staticmethod
+    def entry_key(encryption_key, entry_uuid, key_version):
+        """
+        Return the key an entry's fields are encrypted with.
+
+        Args:
+            encryption_key (bytes): The vault's data key.
+            entry_uuid (str): The entry's uuid.
+            key_version (int): The entry's key version.
+        """
+        if key_version == 0 or encryption_key is None:
+            return encryption_key
+        return Encryption.derive_subkey(encryption_key, b"credentials-cacher entry " + entry_uuid.encode())
+
+    def history_retention(self):
+        """
+        Return how much password history is kept per entry.
+
+        Returns:
+            tuple: (max_versions, max_age_days). Either is None when that limit is off.
+        """
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT key, value FROM meta WHERE key IN ('history_max_versions', 'history_max_age_days');")
+        values = dict(cursor.fetchall())
+        return values.get('history_max_versions'), values.get('history_max_age_days')
+
+    def set_history_retention(self, max_versions, max_age_days):
+        """
+        Set how much password history is kept per entry, pruning existing history to match.
+
+        Args:
+            max_versions (int): The most previous versions kept per entry, or None for no limit.
+            max_age_days (int): How long previous versions are kept, or None for no limit.
+
+        Raises:
+            ValueError: If a limit is negative.
+        """
+        if (max_versions is not None and max_versions < 0) or (max_age_days is not None and max_age_days < 0):
+            raise ValueError("History limits cannot be negative")
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?);", [
+                ('history_max_versions', max_versions), ('history_max_age_days', max_age_days)])
+            if max_age_days is not None:
+                self.connection.execute("DELETE FROM password_history WHERE replaced_at < datetime('now', ?);", (f"-{int(max_age_days)} days",))
+            if max_versions is not None:
+                self.connection.execute("""
+                    DELETE FROM password_history WHERE id IN (
+                        SELECT id FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY entry_id ORDER BY id DESC) AS position
+                                        FROM password_history) WHERE position > ?);""", (max_versions,))
+
+    def fetch_password_history(self, entry_id, encryption_key):
+        """
+        Fetch and decrypt the previous versions of an entry, newest first.
+
+        Args:
+            entry_id (int): The entry whose history to fetch.
+            encryption_key (bytes): The encryption key used for decrypting the values.
+
+        Returns:
+            list of dict: One dict per change, holding 'replaced_at' (when the values stopped being current)
+                and the previous value of each field the change replaced, such as 'password'.
+        """
+        cursor = self.connection.cursor()
+        cursor.execute(f"""SELECT {self.HISTORY_COLUMNS} FROM password_history WHERE entry_id = ? ORDER BY id DESC;""", (entry_id,))
+        return [self._decrypt_history_row(row, encryption_key)[1] for row in cursor.fetchall()]
+
+    def iter_password_history(self, encryption_key, entry_ids=None):
+        """
+        Yield the previous versions of entries, decrypted, in the order they were recorded, as backups write them.
+
+        Args:
+            encryption_key (bytes): The encryption key used for decrypting the values.
+            entry_ids (list of int, optional): The entries whose history to yield. Defaults to every entry.
+
+        Yields:
+            tuple: The entry id and the version, as a dict like those fetch_password_history returns.
+        """
+        cursor = self.connection.cursor()
+        if entry_ids is None:
+            cursor.execute(f"SELECT {self.HISTORY_COLUMNS} FROM password_history ORDER BY entry_id, id;")
+            yield from (self._decrypt_history_row(row, encryption_key) for row in cursor)
+            return
+        for start in range(0, len(entry_ids), 500):  # Stay below SQLite's limit on query parameters.
+            batch = entry_ids[start:start + 500]
+            placeholders = ', '.join('?' for _ in batch)
+            cursor.execute(f"SELECT {self.HISTORY_COLUMNS} FROM password_history WHERE entry_id IN ({placeholders}) ORDER BY entry_id, id;", batch)
+            yield from (self._decrypt_history_row(row, encryption_key) for row in cursor.fetchall())
+
+    def _decrypt_history_row(self, row, encryption_key):
+        entry_id, changed_fields, replaced_at, key_version, entry_uuid = row[:5]
+        key = self.entry_key(encryption_key, entry_uuid, key_version)
+        version = {'replaced_at': replaced_at}
+        for field in changed_fields.split(','):
+            encrypted = row[5 + self.HISTORY_FIELDS.index(field)]
+            version[field] = Encryption.decrypt_data(encrypted, key) if encrypted is not None else None
+        return entry_id, version
+
+    def add_password_history(self, entry_id, version, encryption_key, commit=True):
+        """
+        Add a previous version to an entry's history, as restores do. The retention limits are applied when the
+        entry next changes.
+
+        Args:
+            entry_id (int): The entry the version belongs to.
+            version (dict): As fetch_password_history returns: 'replaced_at' and the previous value of each field
+                the change replaced.
+            encryption_key (bytes): The encryption key used for encrypting the values.
+            commit (bool): Whether to commit once the version is written. Defaults to True.
+
+        Raises:
+            ValueError: If there is no entry with that id, or the version holds no field.
+        """
+        row = self.connection.execute("SELECT uuid FROM vault WHERE id = ?;", (entry_id,)).fetchone()
+        if row is None:
+            raise ValueError(f"There is no entry with id {entry_id}.")
+        changed = [field for field in self.HISTORY_FIELDS if field in version]
+        if not changed:
+            raise ValueError("A history version needs at least one field.")
+        key = self.entry_key(encryption_key, row[0], self.KEY_VERSION)
+        values = [Encryption.encrypt_data(version[field], key) if version.get(field) is not None else None for field in self.HISTORY_FIELDS]
+        self.connection.execute(f"""INSERT INTO password_history (entry_id, changed_fields, key_version, {', '.join(self.HISTORY_FIELDS)}, replaced_at)
+                                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP));""",
+                                [entry_id, ','.join(changed), self.KEY_VERSION] + values + [version.get('replaced_at')])
+        if commit:
+            self.connection.commit()
+
+    def current_revision(self):
+        """Return the vault-wide revision counter. It changes whenever any entry is added, changed or deleted."""
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT value FROM meta WHERE key = 'revision';")
+        return cursor.fetchone()[0]
+
+    def fetch_entry_revisions(self, since_revision=0):
+        """
+        Return the identity and revision of entries changed after a given revision, without decrypting anything.
+
+        Args:
+            since_revision (int): Entries with a revision above this are included. Defaults to 0, meaning all entries.
+
+        Returns:
+            dict: Maps entry ids to (uuid, revision) tuples.
+        """
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT id, uuid, revision FROM vault WHERE revision > ?;", (since_revision,))
+        return {entry_id: (entry_uuid, revision) for entry_id, entry_uuid, revision in cursor.fetchall()}
+
+    def claim_replica_id(self):
+        """
+        Give this copy of the vault a replica id of its own. The id is kept in the file, so a copied file would
+        share it with the original, and edits made to each copy would look like edits of one replica. The meta
+        table therefore records the installation and path the id was made for, and a file opened anywhere else
+        takes a new id. Entries keep the counts of earlier ids in their version vectors.
+        """
+        owner = hashlib.sha256(f"{get_installation_id()}:{os.path.realpath(self.db_path)}".encode('utf-8')).hexdigest()
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'replica_owner';").fetchone()
+        if row is not None and row[0] == owner:
+            return
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?);",
+                                        [('replica_id', uuid.uuid4().hex), ('replica_owner', owner)])
+
+    def replica_id(self):
+        """Return the id identifying this vault file in version vectors."""
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT value FROM meta WHERE key = 'replica_id';")
+        return cursor.fetchone()[0]
+
+    def fetch_entry_versions(self, entry_ids):
+        """
+        Return the uuid and version vector of the entries with the given ids, which identify them to sync.
+
+        Returns:
+            dict: Maps entry ids to (uuid, version_vector) tuples. Ids with no entry are left out.
+        """
+        cursor = self.connection.cursor()
+        versions = {}
+        for start in range(0, len(entry_ids), 500):  # Stay below SQLite's limit on query parameters.
+            batch = entry_ids[start:start + 500]
+            placeholders = ', '.join('?' for _ in batch)
+            cursor.execute(f"SELECT id, uuid, version_vector FROM vault WHERE id IN ({placeholders});", batch)
+            versions.update((entry_id, (entry_uuid, version_vector)) for entry_id, entry_uuid, version_vector in cursor.fetchall())
+        return versions
+
+    def current_change_seq(self):
+        """Return the sequence number of the most recent change, or 0 if the vault has never changed."""
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'vault_changes';")
+        result = cursor.fetchone()
+        return result[0] if result else 0
+
+    def oldest_change_seq(self):
+        """Return the sequence number of the oldest change still in the log, or None if the log is empty."""
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT MIN(seq) FROM vault_changes;")
+        return cursor.fetchone()[0]
+
+    def fetch_changed_entry_ids(self, since_seq, up_to_seq=None):
+        """
+        Return the ids of entries changed after a given sequence number, each listed once.
+
+        Args:
+            since_seq (int): Changes with a sequence number above this are included.
+            up_to_seq (int, optional): Changes with a sequence number above this are left out.
+
+        Returns:
+            list of int: The changed entry ids, including deleted ones.
+        """
+        cursor = self.connection.cursor()
+        if up_to_seq is None:
+            cursor.execute("SELECT DISTINCT entry_id FROM vault_changes WHERE seq > ?;", (since_seq,))
+        else:
+            cursor.execute("SELECT DISTINCT entry_id FROM vault_changes WHERE seq > ? AND seq <= ?;", (since_seq, up_to_seq))
+        return [row[0] for row in cursor.fetchall()]
+
+    def prune_changes(self, up_to_seq):
+        """Delete change log rows up to and including the given sequence number."""
+        cursor = self.connection.cursor()
+        cursor.execute("DELETE FROM vault_changes WHERE seq <= ?;", (up_to_seq,))
         self.connection.commit()
 
     def delete_password_entry(self, entry_id):
-        print(f"Attempting to delete entry with ID: {entry_id}, type: {type(entry_id)}")
         cursor = self.connection.cursor()
         if isinstance(entry_id, tuple):
             # If entry_id is a tuple, extract the first element assuming it's the correct ID.
@@ -63,56 +406,172 @@ class Database:
 
     def add_password_entry(self, website_name, website_url, username, password, notes, encryption_key):
         """Add a new vault entry, encrypting the data with the provided encryption key."""
-        # Check for None values in mandatory fields
-        if website_name is None or username is None or password is None:
-            raise ValueError("Website name, username, and password cannot be None")
-
-        # Directly encrypt data, using ternary conditional expressions to handle None values
-        encrypted_website_name = Encryption.encrypt_data(website_name, encryption_key) if website_name is not None else None
-        encrypted_website_url = Encryption.encrypt_data(website_url, encryption_key) if website_url is not None else None
-        encrypted_username = Encryption.encrypt_data(username, encryption_key) if username is not None else None
-        encrypted_password = Encryption.encrypt_data(password, encryption_key) if password is not None else None
-        encrypted_notes = Encryption.encrypt_data(notes, encryption_key) if notes is not None else None
-
-        cursor = self.connection.cursor()
-        query = """INSERT INTO vault (website_name, website_url, username, password, notes)
-                VALUES (?, ?, ?, ?, ?);"""
-        cursor.execute(query, (
-            encrypted_website_name,
-            encrypted_website_url,
-            encrypted_username,
-            encrypted_password,
-            encrypted_notes))
-        self.connection.commit()
-            
+        self.add_password_entries([{'website_name': website_name, 'website_url': website_url, 'username': username,
+                                    'password': password, 'notes': notes}], encryption_key)
+
+    def add_password_entries(self, entries, encryption_key, commit=True, return_ids=False):
+        """
+        Add many vault entries in a single transaction, encrypting them with the provided encryption key.
+
+        Args:
+            entries (iterable of dict): The entries to add. Each dict holds 'website_name', 'username' and 'password',
+                and optionally 'website_url', 'notes', 'favourite', 'created_at', 'updated_at', 'id', 'uuid' and
+                'version_vector'. An entry with an id replaces any existing entry with that id. Entries without a
+                version vector start a new one.
+            encryption_key (bytes): The encryption key used for encrypting the entries.
+            commit (bool): Whether to commit once the entries are written. Callers that group several batches
+                into one transaction pass False and commit or roll back themselves. Defaults to True.
+            return_ids (bool): Whether to return the ids of the added entries instead of their count. Defaults to False.
+
+        Returns:
+            int: The number of entries added, or a list of their ids if return_ids is set.
+
+        Raises:
+            ValueError: If an entry is missing its website name, username or password. No entries are added.
+        """
+        return self.insert_encrypted_entries(self.encrypt_entries(entries, encryption_key), commit, return_ids)
+
+    @staticmethod
+    def encrypt_entries(entries, encryption_key):
+        """
+        Encrypt entry dicts into rows for insert_encrypted_entries. This touches no database state,
+        so it can run on any thread. Each entry is given a uuid, unless it has one, and encrypted under its own subkey.
+
+        Args:
+            entries (iterable of dict): The entries, as accepted by add_password_entries.
+            encryption_key (bytes): The encryption key used for encrypting the entries.
+
+        Returns:
+            list of tuple: The encrypted rows.
+
+        Raises:
+            ValueError: If an entry is missing its website name, username or password.
+        """
+        rows = []
+        index_key = DomainIndex.derive_index_key(encryption_key)
+        for entry in entries:
+            if entry.get('website_name') is None or entry.get('username') is None or entry.get('password') is None:
+                raise ValueError("Website name, username, and password cannot be None")
+            entry_uuid = entry.get('uuid') or uuid.uuid4().hex
+            key = Database.entry_key(encryption_key, entry_uuid, Database.KEY_VERSION)
+            rows.append((entry.get('id'),) + tuple(
+                Encryption.encrypt_data(entry[field], key) if entry.get(field) is not None else None
+                for field in ('website_name', 'website_url', 'username', 'password', 'notes')
+            ) + (1 if entry.get('favourite') else 0, entry.get('created_at'), entry.get('updated_at'), entry_uuid, Database.KEY_VERSION,
+                 DomainIndex.domain_key(index_key, entry.get('website_url')), entry.get('version_vector')))
+        return rows
+
+    def insert_encrypted_entries(self, rows, commit=True, return_ids=False):
+        """
+        Write rows produced by encrypt_entries in a single transaction.
+
+        Args:
+            rows (list of tuple): The encrypted rows.
+            commit (bool): Whether to commit once the rows are written. Defaults to True.
+            return_ids (bool): Whether to return the ids of the added entries instead of their count. Defaults to False.
+
+        Returns:
+            int: The number of entries added, or a list of their ids if return_ids is set.
+        """
+        query = """INSERT OR REPLACE INTO vault (id, website_name, website_url, username, password, notes, favourite, created_at, updated_at,
+                                             uuid, key_version, domain_key, version_vector)
+                VALUES (?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), COALESCE(?, CURRENT_TIMESTAMP),
+                        ?, ?, ?, COALESCE(?, json_object((SELECT value FROM meta WHERE key = 'replica_id'), 1)));"""
+        cursor = self.connection.cursor()
+        try:
+            if return_ids:
+                result = [cursor.execute(query, row).lastrowid for row in rows]
+            else:
+                cursor.executemany(query, rows)
+                result = len(rows)
+            if commit:
+                self.connection.commit()
+        except Exception:
+            if commit:
+                self.connection.rollback()
+            raise
+        return result
+
+    def iter_entries(self, encryption_key, batch_size=500):
+        """
+        Yield all vault entries one at a time, fetching and decrypting them in batches so that only
+        one batch is held in memory.
+
+        Args:
+            encryption_key (bytes): The encryption key used for decrypting the entries.
+            batch_size (int): The number of rows fetched and decrypted at a time. Defaults to 500.
+
+        Yields:
+            tuple: A decrypted entry, in the same layout as returned by fetch_all_entries.
+        """
+        cursor = self.connection.cursor()
+        cursor.execute(f"SELECT {self.ENTRY_COLUMNS} FROM vault ORDER BY id;")
+        while True:
+            encrypted_entries = cursor.fetchmany(batch_size)
+            if not encrypted_entries:
+                break
+            yield from self.decrypt_entries(encrypted_entries, encryption_key)
+
     def fetch_all_entries(self, encryption_key):
         """Fetch all vault entries, decrypting them with the given encryption key."""
         cursor = self.connection.cursor()
-        cursor.execute("SELECT id, website_name, website_url, username, password, notes, favourite, created_at, updated_at FROM vault;")
+        cursor.execute(f"SELECT {self.ENTRY_COLUMNS} FROM vault;")
         encrypted_entries = cursor.fetchall()
         
         return self.decrypt_entries(encrypted_entries, encryption_key)
 
+    def fetch_entries_by_ids(self, entry_ids, encryption_key):
+        """
+        Fetch and decrypt the entries with the given ids. Ids with no entry are left out of the result.
+
+        Args:
+            entry_ids (list of int): The ids of the entries to fetch.
+            encryption_key (bytes): The encryption key used for decrypting the entries.
+
+        Returns:
+            list of tuple: The decrypted entries.
+        """
+        cursor = self.connection.cursor()
+        encrypted_entries = []
+        for start in range(0, len(entry_ids), 500):  # Stay below SQLite's limit on query parameters.
+            batch = entry_ids[start:start + 500]
+            placeholders = ', '.join('?' for _ in batch)
+            cursor.execute(f"SELECT {self.ENTRY_COLUMNS} FROM vault WHERE id IN ({placeholders});", batch)
+            encrypted_entries.extend(cursor.fetchall())
+        return self.decrypt_entries(encrypted_entries, encryption_key)
+
     def close_connection(self):
         """Safely close the database connection."""
         if self.connection:
             self.connection.close()
             
     def update_password_entry(self, id, website_name, website_url, username, password, notes, encryption_key):
-        """Update an existing vault entry with new data, re-encrypting with the provided key."""
-        encrypted_website_name = Encryption.encrypt_data(website_name, encryption_key)
-        encrypted_website_url = Encryption.encrypt_data(website_url, encryption_key)
-        encrypted_username = Encryption.encrypt_data(username, encryption_key)
-        encrypted_password = Encryption.encrypt_data(password, encryption_key)
-        encrypted_notes = Encryption.encrypt_data(notes, encryption_key)
-        
+        """
+        Update an existing vault entry with new data. Only the fields whose values differ are re-encrypted and
+        written, so the password history records just those, and nothing is written if nothing changed.
+        """
         cursor = self.connection.cursor()
-        query = """UPDATE vault SET website_name = ?, website_url = ?, username = ?, password = ?, notes = ?
-                   WHERE id = ?;"""
-        cursor.execute(query, (encrypted_website_name, encrypted_website_url, encrypted_username, encrypted_password, encrypted_notes, id))
+        cursor.execute("SELECT website_name, website_url, username, password, notes, uuid, key_version FROM vault WHERE id = ?;", (id,))
+        row = cursor.fetchone()
+        if row is None:
+            return
+        key = self.entry_key(encryption_key, row[5], row[6])
+        fields = ("website_name", "website_url", "username", "password", "notes")
+        new_values = (website_name, website_url, username, password, notes)
+        changes = {}
+        for field, encrypted, value in zip(fields, row, new_values):
+            current = Encryption.decrypt_data(encrypted, key) if encrypted is not None else None
+            if value != current:
+                changes[field] = Encryption.encrypt_data(value, key)
+        if not changes:
+            return
+        if 'website_url' in changes:
+            changes['domain_key'] = DomainIndex.domain_key(DomainIndex.derive_index_key(encryption_key), website_url)
+
+        assignments = ", ".join(f"{field} = ?" for field in changes)
+        cursor.execute(f"UPDATE vault SET {assignments} WHERE id = ?;", (*changes.values(), id))
         self.connection.commit()
-        
-        
+
     def toggle_favourite_status(self, entry_id, new_status):
         """Sets the current favourite value to the opposite"""
         new_status_int = 1 if new_status else 0
@@ -145,7 +604,7 @@ class Database:
             list of tuple: A list of decrypted entries that are marked as favourites.
         """
         cursor = self.connection.cursor()
-        cursor.execute("SELECT * FROM vault WHERE favourite = 1;")
+        cursor.execute(f"SELECT {self.ENTRY_COLUMNS} FROM vault WHERE favourite = 1;")
         encrypted_entries = cursor.fetchall()
         return self.decrypt_entries(encrypted_entries, encryption_key)
     
@@ -154,19 +613,31 @@ class Database:
         cursor = self.connection.cursor()
         # This deletes all entries in the vault
         cursor.execute("DELETE FROM vault;")
+        # With nothing left to decrypt, the next unlock creates a fresh data key for whichever password it uses.
+        cursor.execute("DELETE FROM meta WHERE key = 'wrapped_data_key';")
         self.connection.commit()
         
     def decrypt_entries(self, encrypted_entries, encryption_key):
-        """Decrypt a list of encrypted vault entries."""
+        """
+        Decrypt a list of encrypted vault entries.
+
+        Args:
+            encrypted_entries (list of tuple): Rows selected with ENTRY_COLUMNS.
+            encryption_key (bytes): The vault's data key.
+
+        Returns:
+            list of tuple: The decrypted entries, without the uuid and key version.
+        """
         decrypted_entries = []
         for entry in encrypted_entries:
-            id, encrypted_website_name, encrypted_website_url, encrypted_username, encrypted_password, encrypted_notes, favourite, created_at, updated_at = entry
-            
-            website_name = Encryption.decrypt_data(encrypted_website_name, encryption_key) if encrypted_website_name else None
-            website_url = Encryption.decrypt_data(encrypted_website_url, encryption_key) if encrypted_website_url else None
-            username = Encryption.decrypt_data(encrypted_username, encryption_key)
-            password = Encryption.decrypt_data(encrypted_password, encryption_key)
-            notes = Encryption.decrypt_data(encrypted_notes, encryption_key) if encrypted_notes else None
+            id, encrypted_website_name, encrypted_website_url, encrypted_username, encrypted_password, encrypted_notes, favourite, created_at, updated_at, entry_uuid, key_version = entry
+            key = self.entry_key(encryption_key, entry_uuid, key_version)
+
+            website_name = Encryption.decrypt_data(encrypted_website_name, key) if encrypted_website_name else None
+            website_url = Encryption.decrypt_data(encrypted_website_url, key) if encrypted_website_url else None
+            username = Encryption.decrypt_data(encrypted_username, key)
+            password = Encryption.decrypt_data(encrypted_password, key)
+            notes = Encryption.decrypt_data(encrypted_notes, key) if encrypted_notes else None
             
             decrypted_entries.append((id, website_name, website_url, username, password, notes, bool(favourite), created_at, updated_at))
         
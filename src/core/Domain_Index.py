@@ -0,0 +1,231 @@
+from collections import namedtuple
+import hashlib
+import hmac
+import ipaddress
+import os
+from urllib.parse import urlsplit
+from .Encryption import Encryption
+
+NormalizedUrl = namedtuple('NormalizedUrl', ('scheme', 'host', 'registrable_domain'))
+
+class PublicSuffixList:
+    """
+    The rules of the Public Suffix List (https://publicsuffix.org), used to find the registrable domain of a host:
+    the public suffix under which names are registered (such as 'co.uk' or 'github.io') plus one label.
+
+    The bundled copy holds only the rules, one per line, with internationalized labels in their ASCII form so
+    that hosts need no Unicode handling. It is read on first use and kept as three sets of rule strings.
+    """
+
+    DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))),
+                                'resources', 'public_suffix_list.dat')
+    _default = None
+
+    def __init__(self, path):
+        """
+        Reads a public suffix list.
+
+        Args:
+            path (str): The list file, in the publicsuffix.org format.
+        """
+        rules, wildcards, exceptions = set(), set(), set()
+        with open(path, 'r', encoding='utf-8') as file:
+            for line in file:
+                rule = line.split(maxsplit=1)[0] if line.strip() else ''
+                if not rule or rule.startswith('//'):
+                    continue
+                if rule.startswith('!'):
+                    exceptions.add(rule[1:])
+                elif rule.startswith('*.'):
+                    wildcards.add(rule[2:])
+                else:
+                    rules.add(rule)
+        self._rules, self._wildcards, self._exceptions = frozenset(rules), frozenset(wildcards), frozenset(exceptions)
+
+    @classmethod
+    def default(cls):
+        """Return the bundled list, reading it on first use."""
+        if cls._default is None:
+            cls._default = cls(cls.DEFAULT_PATH)
+        return cls._default
+
+    def public_suffix(self, host):
+        """Return the public suffix of a lower-case ASCII host name, following the publicsuffix.org algorithm."""
+        labels = host.split('.')
+        for start in range(len(labels)):
+            candidate = '.'.join(labels[start:])
+            if candidate in self._exceptions:
+                return '.'.join(labels[start + 1:])
+            if candidate in self._rules or (start + 1 < len(labels) and '.'.join(labels[start + 1:]) in self._wildcards):
+                return candidate
+        return labels[-1]  # The implicit '*' rule: an unlisted top-level domain.
+
+    def registrable_domain(self, host):
+        """Return the registrable domain of a lower-case ASCII host name, or the host itself if it is a public suffix."""
+        suffix = self.public_suffix(host)
+        if suffix == host:
+            return host
+        return '.'.join(host.split('.')[-(suffix.count('.') + 2):])
+
+
+class DomainIndex:
+    """
+    Finds the entries saved for a site without decrypting the vault.
+
+    Every entry carries a domain key: an HMAC of the registrable domain of its URL under a key derived from the
+    vault's data key, written whenever the entry's URL is. The file therefore reveals which entries share a
+    site, but not which site. Entries without a usable URL carry NO_DOMAIN, and entries whose key has not been
+    computed yet (written before the index existed, or copied from another vault) carry NULL until the next
+    refresh. After unlocking, the index holds a map from domain keys to entry ids, so finding the entries for
+    a URL is one dictionary lookup. It is kept current through the vault's revision counter like VaultAgent.
+
+    Attributes:
+        db (Database): The vault.
+        encryption_key (bytes): The vault's data key.
+    """
+
+    INDEX_KEY_PURPOSE = b"credentials-cacher domain index"
+    NO_DOMAIN = b""
+    DOMAIN_KEY_SIZE = 16
+
+    def __init__(self, db, encryption_key):
+        """
+        Args:
+            db (Database): The vault. It must be used from the thread that uses the index.
+            encryption_key (bytes): The vault's data key.
+        """
+        self.db = db
+        self.encryption_key = encryption_key
+        self._index_key = self.derive_index_key(encryption_key)
+        self._ids = {}
+        self._keys = {}
+        self._revision = None
+
+    @staticmethod
+    def normalize_url(url):
+        """
+        Splits a URL, or a bare host name, into its scheme, host and registrable domain. The host is lower-cased
+        and in ASCII form, without a trailing dot or a leading 'www.'; the scheme defaults to 'https'.
+
+        Returns:
+            NormalizedUrl: The parts, or None if the URL has no host.
+        """
+        url = (url or '').strip()
+        try:
+            parts = urlsplit(url if '//' in url else '//' + url)
+            host = (parts.hostname or '').rstrip('.')
+        except ValueError:
+            return None
+        if not host:
+            return None
+        try:
+            host = host.encode('idna').decode('ascii')
+        except UnicodeError:
+            pass
+        if host.startswith('www.'):
+            host = host[4:]
+        try:
+            ipaddress.ip_address(host)
+            registrable_domain = host
+        except ValueError:
+            registrable_domain = PublicSuffixList.default().registrable_domain(host)
+        return NormalizedUrl(parts.scheme.lower() or 'https', host, registrable_domain)
+
+    @staticmethod
+    def derive_index_key(encryption_key):
+        """Return the key domain keys are computed with for a vault's data key."""
+        return Encryption.derive_subkey(encryption_key, DomainIndex.INDEX_KEY_PURPOSE)
+
+    @staticmethod
+    def domain_key(index_key, url):
+        """Return the domain key of a URL under an index key, or NO_DOMAIN if the URL has no host."""
+        normalized = DomainIndex.normalize_url(url)
+        if normalized is None:
+            return DomainIndex.NO_DOMAIN
+        return hmac.new(index_key, normalized.registrable_domain.encode(), hashlib.sha256).digest()[:DomainIndex.DOMAIN_KEY_SIZE]
+
+    @staticmethod
+    def match_rank(host, url):
+        """
+        Sort key ordering a site's entries for a host: those saved for the host itself or a parent domain of it
+        first, the most specific first, then the rest of the site.
+        """
+        normalized = DomainIndex.normalize_url(url)
+        entry_host = normalized.host if normalized is not None else ''
+        if entry_host and (host == entry_host or host.endswith('.' + entry_host)):
+            return 0, -entry_host.count('.')
+        return 1, 0
+
+    def refresh(self):
+        """Brings the map up to date with the vault, computing the domain keys the vault is missing first."""
+        revision = self.db.current_revision()
+        if revision == self._revision:
+            return
+        connection = self.db.connection
+        missing = connection.execute("SELECT id, uuid, key_version, website_url FROM vault WHERE domain_key IS NULL;").fetchall()
+        if missing:
+            with connection:
+                connection.executemany("UPDATE vault SET domain_key = ? WHERE id = ?;", [
+                    (self.domain_key(self._index_key, Encryption.decrypt_data(url, self.db.entry_key(self.encryption_key, entry_uuid, key_version))
+                                     if url else None), entry_id)
+                    for entry_id, entry_uuid, key_version, url in missing])
+
+        for entry_id, domain_key in connection.execute("SELECT id, domain_key FROM vault WHERE revision > ?;", (self._revision or 0,)):
+            self._remove(entry_id)
+            self._keys[entry_id] = domain_key
+            if domain_key:
+                self._ids.setdefault(domain_key, set()).add(entry_id)
+        if connection.execute("SELECT COUNT(*) FROM vault;").fetchone()[0] != len(self._keys):
+            existing = {row[0] for row in connection.execute("SELECT id FROM vault;")}
+            for entry_id in set(self._keys) - existing:
+                self._remove(entry_id)
+        self._revision = revision
+
+    def _remove(self, entry_id):
+        domain_key = self._keys.pop(entry_id, None)
+        ids = self._ids.get(domain_key)
+        if ids is not None:
+            ids.discard(entry_id)
+            if not ids:
+                del self._ids[domain_key]
+
+    def lookup(self, url):
+        """
+        Returns the ids of the entries saved for the same site (registrable domain) as a URL, in id order.
+
+        Raises:
+            ValueError: If the URL has no host.
+        """
+        domain_key = self.domain_key(self._index_key, url)
+        if domain_key == self.NO_DOMAIN:
+            raise ValueError("A URL or domain is required.")
+        self.refresh()
+        return sorted(self._ids.get(domain_key, ()))
+
+    def find_entries(self, url):
+        """
+        Fetches and decrypts just the entries saved for a URL's site, ordered by match_rank.
+
+        Returns:
+            list of tuple: (uuid, entry) pairs, with entries in the layout returned by Database.fetch_all_entries.
+
+        Raises:
+            ValueError: If the URL has no host.
+        """
+        entry_ids = self.lookup(url)
+        rows = []
+        for start in range(0, len(entry_ids), 500):  # Stay below SQLite's limit on query parameters.
+            batch = entry_ids[start:start + 500]
+            rows.extend(self.db.connection.execute(
+                f"SELECT {self.db.ENTRY_COLUMNS} FROM vault WHERE id IN ({', '.join('?' for _ in batch)}) ORDER BY id;", batch))
+        host = self.normalize_url(url).host
+        pairs = zip((row[9] for row in rows), self.db.decrypt_entries(rows, self.encryption_key))
+        return sorted(pairs, key=lambda pair: self.match_rank(host, pair[1][2]))
+
+    def clear(self):
+        """Forgets the map and the key, as when the vault locks."""
+        self.encryption_key = None
+        self._index_key = None
+        self._ids.clear()
+        self._keys.clear()
+        self._revision = None
@@ -1,5 +1,7 @@
 import json
 import base64
+import hashlib
+import hmac
 from Crypto.Cipher import AES
 from Crypto.Protocol.KDF import PBKDF2
 from Crypto.Random import get_random_bytes
@@ -21,6 +23,52 @@ class Encryption:
         key = PBKDF2(password, salt, dkLen=key_length, count=iterations, hmac_hash_module=SHA256)
         return key
 
+    @staticmethod
+    def derive_subkey(key: bytes, purpose: bytes, length: int = 32) -> bytes:
+        """
+        Derive an independent key for one purpose from a vault key using HKDF-SHA256 (RFC 5869, without salt),
+        so the vault key itself is never used for more than one thing. Built on hmac, as subkeys are derived
+        for every entry read.
+        """
+        pseudorandom_key = hmac.new(b'\x00' * 32, key, hashlib.sha256).digest()
+        output = b''
+        block = b''
+        counter = 1
+        while len(output) < length:
+            block = hmac.new(pseudorandom_key, block + purpose + bytes([counter]), hashlib.sha256).digest()
+            output += block
+            counter += 1
+        return output[:length]
+
+    @staticmethod
+    def encrypt_bytes(data: bytes, key: bytes, associated_data: bytes = b'') -> bytes:
+        """
+        Encrypt binary data with AES-256 GCM, returning the nonce, ciphertext and tag as one byte string.
+        The associated data is authenticated but not stored, so it must be passed again to decrypt.
+        """
+        nonce = get_random_bytes(12)
+        cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+        cipher.update(associated_data)
+        ciphertext, tag = cipher.encrypt_and_digest(data)
+        return nonce + ciphertext + tag
+
+    @staticmethod
+    def decrypt_bytes(encrypted: bytes, key: bytes, associated_data: bytes = b'') -> bytes:
+        """
+        Decrypt data produced by encrypt_bytes.
+
+        Raises:
+            ValueError: If the key or associated data is wrong or the data was tampered with.
+        """
+        if len(encrypted) < 28:
+            raise ValueError("Decryption failed: the data is truncated.")
+        cipher = AES.new(key, AES.MODE_GCM, nonce=encrypted[:12])
+        cipher.update(associated_data)
+        try:
+            return cipher.decrypt_and_verify(encrypted[12:-16], encrypted[-16:])
+        except ValueError:
+            raise ValueError("Decryption failed due to incorrect key or tampering.")
+
     @staticmethod
     def encrypt_data(data: str, key: bytes) -> str:
         """
@@ -0,0 +1,315 @@
+import csv
+import io
+import json
+import os
+from urllib.parse import urlsplit
+
+class PasswordImporter:
+    """
+    Imports credentials exported by other password managers into the vault.
+
+    Input files are read row by row and written to the database in fixed-size batches, so memory use
+    stays flat no matter how many rows the file holds. Supported formats are generic CSV (Chrome, Firefox,
+    LastPass, Bitwarden and similar exports) and Bitwarden-style JSON.
+
+    Attributes:
+        db (Database): The database the entries are written to.
+        encryption_key (bytes): The key the entries are encrypted with.
+        batch_size (int): The number of entries encrypted and written per transaction.
+        progress_callback (Callable, optional): Called after every batch with the number of rows processed,
+            the number of bytes read and the total size of the file in bytes.
+    """
+
+    # Lower-cased column names recognised for each vault field, in order of preference.
+    FIELD_ALIASES = {
+        'website_name': ('website_name', 'name', 'title', 'website', 'account'),
+        'website_url': ('website_url', 'url', 'login_uri', 'uri', 'website url', 'web site', 'hostname'),
+        'username': ('username', 'login_username', 'user', 'login', 'email', 'user name'),
+        'password': ('password', 'login_password', 'pass'),
+        'notes': ('notes', 'note', 'extra', 'comments', 'comment'),
+        'favourite': ('favourite', 'favorite', 'fav'),
+    }
+    TRUE_VALUES = ('1', 'true', 'yes', 'y')
+    JSON_CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, db, encryption_key, batch_size=500, progress_callback=None):
+        """
+        Initializes the importer.
+
+        Args:
+            db (Database): The database to import into.
+            encryption_key (bytes): The key used to encrypt the imported entries.
+            batch_size (int): The number of entries per transaction. Defaults to 500.
+            progress_callback (Callable, optional): Receives (rows processed, bytes read, total bytes) after each batch.
+        """
+        self.db = db
+        self.encryption_key = encryption_key
+        self.batch_size = batch_size
+        self.progress_callback = progress_callback
+
+    def import_file(self, path, file_format=None, column_mapping=None):
+        """
+        Imports a file, choosing the format from its extension unless one is given.
+
+        Args:
+            path (str): The file to import.
+            file_format (str, optional): 'csv' or 'json'. Defaults to the file extension.
+            column_mapping (dict, optional): For CSV files, maps vault field names to column names,
+                overriding the automatic column detection.
+
+        Returns:
+            tuple: The number of entries imported and the number of rows skipped.
+        """
+        file_format = (file_format or os.path.splitext(path)[1].lstrip('.')).lower()
+        if file_format == 'csv':
+            return self.import_csv(path, column_mapping)
+        if file_format == 'json':
+            return self.import_bitwarden_json(path)
+        raise ValueError(f"Unsupported import format: {file_format}")
+
+    def import_csv(self, path, column_mapping=None):
+        """
+        Imports a CSV export with a header row.
+
+        Args:
+            path (str): The CSV file to import.
+            column_mapping (dict, optional): Maps vault field names to column names.
+
+        Returns:
+            tuple: The number of entries imported and the number of rows skipped.
+        """
+        with open(path, 'rb') as binary_file:
+            text_file = io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+            entries = self.iter_csv_entries(text_file, column_mapping)
+            return self._write_batches(entries, binary_file, os.path.getsize(path))
+
+    def import_bitwarden_json(self, path):
+        """
+        Imports an unencrypted Bitwarden-style JSON export. Only login items are imported.
+
+        Args:
+            path (str): The JSON file to import.
+
+        Returns:
+            tuple: The number of entries imported and the number of items skipped.
+        """
+        with open(path, 'rb') as binary_file:
+            text_file = io.TextIOWrapper(binary_file, encoding='utf-8-sig')
+            entries = self.iter_bitwarden_entries(text_file)
+            return self._write_batches(entries, binary_file, os.path.getsize(path))
+
+    def _write_batches(self, entries, binary_file, total_bytes):
+        """
+        Encrypts and writes entries batch by batch. Rows that could not be mapped arrive as None and are counted as skipped.
+        """
+        imported = 0
+        skipped = 0
+        batch = []
+        for entry in entries:
+            if entry is None:
+                skipped += 1
+            else:
+                batch.append(entry)
+            if len(batch) >= self.batch_size:
+                imported += self.db.add_password_entries(batch, self.encryption_key)
+                batch = []
+                self._report_progress(imported + skipped, binary_file, total_bytes)
+        if batch:
+            imported += self.db.add_password_entries(batch, self.encryption_key)
+        self._report_progress(imported + skipped, binary_file, total_bytes, finished=True)
+        return imported, skipped
+
+    def _report_progress(self, rows, binary_file, total_bytes, finished=False):
+        if self.progress_callback is not None:
+            self.progress_callback(rows, total_bytes if finished else min(binary_file.tell(), total_bytes), total_bytes)
+
+    @classmethod
+    def resolve_columns(cls, header, column_mapping=None):
+        """
+        Works out which CSV column holds each vault field.
+
+        Args:
+            header (list of str): The CSV header row.
+            column_mapping (dict, optional): Explicit field to column name mappings, which take precedence.
+
+        Returns:
+            dict: Maps vault field names to column indexes. Fields without a column are left out.
+        """
+        normalised = [column.strip().lower() for column in header]
+        columns = {}
+        for field, aliases in cls.FIELD_ALIASES.items():
+            if column_mapping and field in column_mapping:
+                aliases = (column_mapping[field].strip().lower(),)
+            for alias in aliases:
+                if alias in normalised:
+                    columns[field] = normalised.index(alias)
+                    break
+        return columns
+
+    @classmethod
+    def iter_csv_entries(cls, text_file, column_mapping=None):
+        """
+        Yields one entry dict per CSV row, or None for rows missing a username or password.
+
+        Args:
+            text_file (file): An open text file positioned at the header row.
+            column_mapping (dict, optional): Explicit field to column name mappings.
+        """
+        reader = csv.reader(text_file)
+        header = next(reader, None)
+        if header is None:
+            return
+        columns = cls.resolve_columns(header, column_mapping)
+        if 'username' not in columns or 'password' not in columns:
+            raise ValueError("The CSV file needs a username and a password column.")
+
+        for row in reader:
+            if not any(row):
+                continue
+            values = {field: row[index] if index < len(row) else '' for field, index in columns.items()}
+            yield cls.build_entry(
+                values.get('website_name'),
+                values.get('website_url'),
+                values.get('username'),
+                values.get('password'),
+                values.get('notes'),
+                values.get('favourite', '').strip().lower() in cls.TRUE_VALUES,
+            )
+
+    @classmethod
+    def iter_bitwarden_entries(cls, text_file):
+        """
+        Yields one entry dict per login item of a Bitwarden-style JSON export, or None for other item types.
+
+        Args:
+            text_file (file): An open text file holding the export.
+        """
+        for item in cls.iter_json_array(text_file, 'items'):
+            if not isinstance(item, dict) or item.get('type', 1) != 1 or not isinstance(item.get('login'), dict):
+                yield None
+                continue
+            login = item['login']
+            uris = login.get('uris') or []
+            website_url = uris[0].get('uri') if uris and isinstance(uris[0], dict) else None
+            yield cls.build_entry(
+                item.get('name'),
+                website_url,
+                login.get('username'),
+                login.get('password'),
+                item.get('notes'),
+                bool(item.get('favorite', False)),
+            )
+
+    @staticmethod
+    def build_entry(website_name, website_url, username, password, notes, favourite=False):
+        """
+        Builds a vault entry dict from imported values, falling back to the URL's host name for a missing website name.
+
+        Returns:
+            dict: The entry, or None if a username, password or any way to name the entry is missing.
+        """
+        website_name = (website_name or '').strip()
+        website_url = (website_url or '').strip()
+        if not website_name and website_url:
+            website_name = urlsplit(website_url if '//' in website_url else '//' + website_url).hostname or ''
+        if not website_name or not username or not password:
+            return None
+        return {
+            'website_name': website_name,
+            'website_url': website_url,
+            'username': username,
+            'password': password,
+            'notes': notes or '',
+            'favourite': favourite,
+        }
+
+    @classmethod
+    def iter_json_array(cls, text_file, key):
+        """
+        Streams the elements of the array stored under a key of a top-level JSON object.
+
+        Only one element is held in memory at a time. Values under other keys are parsed and discarded.
+
+        Args:
+            text_file (file): An open text file holding a JSON object.
+            key (str): The key whose array should be streamed.
+        """
+        reader = _JsonStreamReader(text_file, cls.JSON_CHUNK_SIZE)
+        reader.expect('{')
+        if reader.consume_if('}'):
+            return
+        while True:
+            name = reader.decode_value()
+            reader.expect(':')
+            if name == key:
+                reader.expect('[')
+                if not reader.consume_if(']'):
+                    while True:
+                        yield reader.decode_value()
+                        if reader.consume_if(']'):
+                            break
+                        reader.expect(',')
+            else:
+                reader.decode_value()
+            if reader.consume_if('}'):
+                return
+            reader.expect(',')
+
+
+class _JsonStreamReader:
+    """
+    A minimal incremental JSON tokenizer: it reads a file in chunks and decodes one value at a time.
+    """
+
+    MAX_VALUE_SIZE = 16 * 1024 * 1024  # Stops a malformed file from being buffered whole
+
+    def __init__(self, text_file, chunk_size):
+        self._file = text_file
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._position = 0
+        self._eof = False
+
+    def _fill(self):
+        """Reads another chunk, dropping the part of the buffer that has already been consumed."""
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+        self._buffer = self._buffer[self._position:] + chunk
+        self._position = 0
+
+    def _skip_whitespace(self):
+        while True:
+            while self._position < len(self._buffer) and self._buffer[self._position] in ' \t\r\n':
+                self._position += 1
+            if self._position < len(self._buffer) or self._eof:
+                return
+            self._fill()
+
+    def consume_if(self, character):
+        self._skip_whitespace()
+        if self._buffer.startswith(character, self._position):
+            self._position += 1
+            return True
+        return False
+
+    def expect(self, character):
+        if not self.consume_if(character):
+            raise ValueError(f"Malformed JSON: expected '{character}' at offset {self._position}")
+
+    def decode_value(self):
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._position)
+                # A number or literal running up to the end of the buffer may continue in the next chunk.
+                if end < len(self._buffer) or self._eof:
+                    self._position = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise ValueError("Malformed JSON: unexpected end of file")
+            if len(self._buffer) - self._position > self.MAX_VALUE_SIZE:
+                raise ValueError("Malformed JSON: value too large")
+            self._fill()
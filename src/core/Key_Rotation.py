@@ -0,0 +1,226 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+import os
+from Crypto.Random import get_random_bytes
+from .Attachments import AttachmentStore
+from .Database import Database
+from .Domain_Index import DomainIndex
+from .Encryption import Encryption
+
+class KeyRotation:
+    """
+    Replaces the vault's data key, re-encrypting every entry, its password history and its attachments
+    under a new random key.
+
+    The new key is recorded, wrapped by the master key, in the meta table before anything is rewritten, and
+    only becomes the vault's data key in the transaction that finishes the rotation. Entries are rewritten in
+    batches, each committed in its own transaction together with the entry's history, and take a key version
+    no entry had before the rotation, so the entries still to do are exactly those without it and an
+    interrupted rotation picks up where it stopped. Attachment chunks follow, tracked by a position in the
+    meta table. Until the rotation is finished the vault cannot be unlocked (see Database.unwrap_data_key),
+    so nothing is written under either key in the meantime, and the content triggers leave revisions,
+    version vectors, updated_at, the change log and the history untouched, as the entries do not change.
+
+    Batches are decrypted and encrypted in worker processes, a few batches ahead of the one being written,
+    so memory use does not grow with the vault.
+
+    Attributes:
+        db (Database): The vault.
+        master_key (bytes): The key derived from the master password, which wraps both data keys.
+        workers (int): The number of worker processes.
+        batch_size (int): The number of entries re-encrypted per batch and transaction.
+        progress_callback (Callable): Called with (items done, items to do) after each batch.
+    """
+
+    PENDING_KEY_CONTEXT = b"credentials-cacher pending data key"
+    CHUNK_BATCH_SIZE = 16  # Attachment chunks are up to 1 MiB each.
+
+    def __init__(self, db, master_key, workers=None, batch_size=500, progress_callback=None):
+        """
+        Args:
+            db (Database): The vault.
+            master_key (bytes): The key derived from the master password with Encryption.derive_key.
+            workers (int, optional): The number of worker processes. Defaults to the number of CPUs.
+            batch_size (int): The number of entries per batch. Defaults to 500.
+            progress_callback (Callable, optional): Called with (items done, items to do) after each batch.
+        """
+        self.db = db
+        self.master_key = master_key
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.progress_callback = progress_callback
+
+    def start(self, new_master_key=None, commit=True):
+        """
+        Records a new data key for the vault to be re-encrypted under, without rewriting any entry yet. Does
+        nothing if a rotation is already pending.
+
+        Args:
+            new_master_key (bytes, optional): A new master key to wrap the data keys with from now on, as when
+                the master password changes in the same step. Defaults to the current one.
+            commit (bool): Whether to commit, or leave that to a caller writing more in the same transaction.
+
+        Raises:
+            ValueError: If the master key is wrong.
+        """
+        connection = self.db.connection
+        if self.db.key_rotation_pending():
+            return
+        data_key = self.db.unwrap_data_key(self.master_key)
+        master_key = new_master_key or self.master_key
+        target_version = connection.execute("SELECT COALESCE(MAX(key_version), 0) + 1 FROM vault;").fetchone()[0]
+        connection.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?);", [
+            ('wrapped_data_key', Encryption.encrypt_bytes(data_key, master_key, Database.DATA_KEY_CONTEXT)),
+            ('pending_data_key', Encryption.encrypt_bytes(get_random_bytes(32), master_key, self.PENDING_KEY_CONTEXT)),
+            ('rotation_key_version', target_version),
+            ('rotation_chunk_position', 0),
+        ])
+        if commit:
+            connection.commit()
+        self.master_key = master_key
+
+    def run(self):
+        """
+        Re-encrypts everything not yet under the pending data key and makes it the vault's data key. Safe to
+        call again after an interruption; does nothing if no rotation is pending.
+
+        Returns:
+            bytes: The vault's data key once the rotation is finished.
+
+        Raises:
+            ValueError: If the master key is wrong or stored data fails authentication.
+        """
+        connection = self.db.connection
+        if not self.db.key_rotation_pending():
+            return self.db.unwrap_data_key(self.master_key)
+        meta = dict(connection.execute("""
+            SELECT key, value FROM meta WHERE key IN
+            ('wrapped_data_key', 'pending_data_key', 'rotation_key_version', 'rotation_chunk_position');"""))
+        old_key = Encryption.decrypt_bytes(meta['wrapped_data_key'], self.master_key, Database.DATA_KEY_CONTEXT)
+        new_key = Encryption.decrypt_bytes(meta['pending_data_key'], self.master_key, self.PENDING_KEY_CONTEXT)
+        target_version = meta['rotation_key_version']
+        chunk_position = meta['rotation_chunk_position']
+
+        total = connection.execute("SELECT COUNT(*) FROM vault WHERE key_version != ?;", (target_version,)).fetchone()[0]
+        total += connection.execute("SELECT COUNT(*) FROM chunks WHERE rowid > ?;", (chunk_position,)).fetchone()[0]
+        self._done, self._total = 0, total
+
+        self._pipeline(self._entry_batches(target_version), _reencrypt_entries,
+                       (old_key, new_key, target_version), self._store_entries)
+        self._pipeline(self._chunk_batches(chunk_position), _reencrypt_chunks,
+                       (AttachmentStore.derive_keys(old_key), AttachmentStore.derive_keys(new_key)), self._store_chunks)
+
+        with connection:
+            AttachmentStore(self.db, new_key).rekey_attachments(old_key)
+            connection.execute("UPDATE meta SET value = ? WHERE key = 'wrapped_data_key';",
+                               (Encryption.encrypt_bytes(new_key, self.master_key, Database.DATA_KEY_CONTEXT),))
+            connection.execute("""
+                DELETE FROM meta WHERE key IN ('pending_data_key', 'rotation_key_version', 'rotation_chunk_position');""")
+        return new_key
+
+    def _entry_batches(self, target_version):
+        """Yields (entry rows, history rows) batches of entries not yet at the target key version."""
+        connection = self.db.connection
+        last_id = 0
+        while True:
+            entries = connection.execute("""
+                SELECT id, uuid, key_version, website_name, website_url, username, password, notes FROM vault
+                WHERE key_version != ? AND id > ? ORDER BY id LIMIT ?;""", (target_version, last_id, self.batch_size)).fetchall()
+            if not entries:
+                return
+            last_id = entries[-1][0]
+            history = connection.execute(f"""
+                SELECT password_history.id, vault.uuid, password_history.key_version, password_history.website_name,
+                       password_history.website_url, password_history.username, password_history.password, password_history.notes
+                FROM password_history JOIN vault ON vault.id = password_history.entry_id
+                WHERE password_history.entry_id IN ({", ".join("?" * len(entries))});""", [entry[0] for entry in entries]).fetchall()
+            yield entries, history
+
+    def _chunk_batches(self, position):
+        """Yields batches of (rowid, address, data) chunk rows after the given rowid."""
+        while True:
+            chunks = self.db.connection.execute("SELECT rowid, hash, data FROM chunks WHERE rowid > ? ORDER BY rowid LIMIT ?;",
+                                                (position, self.CHUNK_BATCH_SIZE)).fetchall()
+            if not chunks:
+                return
+            position = chunks[-1][0]
+            yield chunks
+
+    def _pipeline(self, batches, function, arguments, store):
+        """Runs function over each batch, in worker processes when there are several, storing results in order."""
+        batches = iter(batches)
+        head = list(islice(batches, 2))
+        if self.workers <= 1 or len(head) < 2:
+            for batch in chain(head, batches):
+                store(function(batch, *arguments))
+            return
+
+        executor = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            pending = deque()
+            for batch in chain(head, batches):
+                # Keep a couple of batches per worker in flight, writing the oldest as it completes.
+                if len(pending) >= 2 * self.workers:
+                    store(pending.popleft().result())
+                pending.append(executor.submit(function, batch, *arguments))
+            while pending:
+                store(pending.popleft().result())
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    def _store_entries(self, result):
+        """Writes a re-encrypted batch of entries and their history in one transaction."""
+        entries, history = result
+        with self.db.connection as connection:
+            connection.executemany("""
+                UPDATE vault SET website_name = ?, website_url = ?, username = ?, password = ?, notes = ?, domain_key = ?, key_version = ?
+                WHERE id = ?;""", entries)
+            connection.executemany("""
+                UPDATE password_history SET website_name = ?, website_url = ?, username = ?, password = ?, notes = ?, key_version = ?
+                WHERE id = ?;""", history)
+        self._report(len(entries))
+
+    def _store_chunks(self, chunks):
+        """Writes a re-encrypted batch of chunks under their new addresses, and the position reached, in one transaction."""
+        with self.db.connection as connection:
+            for rowid, address, new_address, data in chunks:
+                connection.execute("UPDATE chunks SET hash = ?, data = ? WHERE rowid = ?;", (new_address, data, rowid))
+                connection.execute("UPDATE attachment_chunks SET chunk_hash = ? WHERE chunk_hash = ?;", (new_address, address))
+            connection.execute("UPDATE meta SET value = ? WHERE key = 'rotation_chunk_position';", (chunks[-1][0],))
+        self._report(len(chunks))
+
+    def _report(self, count):
+        self._done += count
+        if self.progress_callback is not None:
+            self.progress_callback(self._done, self._total)
+
+
+def _reencrypt_rows(rows, old_key, new_key, target_version, index_key=None):
+    """
+    Re-encrypts (id, uuid, key version, five fields) rows for the new data key. NULL fields, which history
+    rows have for the fields that did not change, stay NULL. With an index key, the new domain key of each
+    row's URL follows its fields. Returns UPDATE parameters.
+    """
+    updates = []
+    for row_id, entry_uuid, key_version, *fields in rows:
+        old_entry_key = Database.entry_key(old_key, entry_uuid, key_version)
+        new_entry_key = Database.entry_key(new_key, entry_uuid, target_version)
+        values = [None if field is None else Encryption.decrypt_data(field, old_entry_key) for field in fields]
+        update = tuple(None if value is None else Encryption.encrypt_data(value, new_entry_key) for value in values)
+        if index_key is not None:
+            update += (DomainIndex.domain_key(index_key, values[1]),)
+        updates.append(update + (target_version, row_id))
+    return updates
+
+
+def _reencrypt_entries(batch, old_key, new_key, target_version):
+    """Re-encrypts an (entry rows, history rows) batch in a worker."""
+    entries, history = batch
+    return (_reencrypt_rows(entries, old_key, new_key, target_version, DomainIndex.derive_index_key(new_key)),
+            _reencrypt_rows(history, old_key, new_key, target_version))
+
+
+def _reencrypt_chunks(chunks, old_keys, new_keys):
+    """Re-encrypts a batch of (rowid, address, data) chunk rows in a worker, returning (rowid, old address, new address, data) rows."""
+    return [(rowid, address, *AttachmentStore.rekey_chunk(address, data, old_keys, new_keys)) for rowid, address, data in chunks]
@@ -0,0 +1,427 @@
+import sqlite3
+import uuid
+
+# Content triggers stay quiet while a key rotation rewrites ciphertexts, as the entries themselves do not change.
+NOT_REKEYING = "NOT EXISTS (SELECT 1 FROM meta WHERE key = 'pending_data_key')"
+HISTORY_MAX_VERSIONS = 20  # Previous versions kept per entry in a new vault
+BATCH_SIZE = 1000  # Rows rewritten per statement batch by data migrations, between progress reports
+
+class Migrations:
+    """
+    Upgrades vault databases to the current schema.
+
+    Migrations are registered in order with a schema version each, and the version a vault has reached is
+    kept in its PRAGMA user_version, so opening an up-to-date vault runs no schema statements at all. Each
+    migration runs in its own transaction together with the version bump, so an interrupted upgrade leaves
+    the vault at the last completed version and is picked up from there on the next open. Data rewrites
+    report progress as they go.
+
+    Vaults created before versioned migrations existed are at version 0 but can be in any earlier shape, so
+    the migrations up to BASELINE check what is already there and only add what is missing. Later ones run
+    exactly once and need not.
+    """
+
+    BASELINE = 9
+    _migrations = []  # (version, description, function), in version order
+
+    @classmethod
+    def register(cls, version, description):
+        """
+        Decorator registering a migration function(connection, progress) as the given schema version, where
+        progress(done, total) reports how far a data rewrite has got.
+
+        Raises:
+            ValueError: If the version does not follow the last registered one.
+        """
+        if version != len(cls._migrations) + 1:
+            raise ValueError(f"Migration {version} registered out of order; expected {len(cls._migrations) + 1}.")
+
+        def decorator(function):
+            cls._migrations.append((version, description, function))
+            return function
+        return decorator
+
+    @classmethod
+    def latest_version(cls):
+        """Return the schema version of a fully upgraded vault."""
+        return len(cls._migrations)
+
+    @staticmethod
+    def schema_version(connection):
+        """Return the schema version a vault has reached."""
+        return connection.execute("PRAGMA user_version;").fetchone()[0]
+
+    @classmethod
+    def upgrade(cls, connection, progress_callback=None):
+        """
+        Runs the migrations a vault has not had yet, in order, each in its own transaction.
+
+        Args:
+            connection (sqlite3.Connection): The vault's connection.
+            progress_callback (Callable, optional): Called with (description, done, total) as migrations run.
+
+        Returns:
+            int: The number of migrations run.
+
+        Raises:
+            ValueError: If the vault was written by a newer version of the application.
+        """
+        current = cls.schema_version(connection)
+        if current > cls.latest_version():
+            raise ValueError("The vault was written by a newer version of the application.")
+        pending = cls._migrations[current:]
+        if connection.in_transaction:
+            connection.commit()
+        for version, description, function in pending:
+            def progress(done, total, description=description):
+                if progress_callback is not None:
+                    progress_callback(description, done, total)
+            connection.execute("BEGIN;")
+            try:
+                function(connection, progress)
+                connection.execute(f"PRAGMA user_version = {version};")
+                connection.commit()
+            except BaseException:
+                connection.rollback()
+                raise
+        return len(pending)
+
+
+def execute_script(connection, script):
+    """
+    Runs a script of SQL statements inside the current transaction. Unlike Connection.executescript, which
+    commits first, this keeps schema changes in the migration's transaction. Statements must end their line.
+    """
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            connection.execute(statement)
+            statement = ""
+    if statement.strip():
+        raise ValueError(f"Incomplete SQL statement in migration: {statement.strip()[:80]}")
+
+
+def table_columns(connection, table):
+    """Return the column names of a table, or an empty set if it does not exist."""
+    return {row[1] for row in connection.execute(f"PRAGMA table_info({table});")}
+
+
+@Migrations.register(1, "Create the vault table")
+def create_vault(connection, progress):
+    execute_script(connection, """
+        CREATE TABLE IF NOT EXISTS vault (
+            id INTEGER PRIMARY KEY,
+            website_name TEXT NOT NULL,
+            website_url TEXT,
+            username TEXT NOT NULL,
+            password TEXT NOT NULL,
+            notes TEXT,
+            favourite INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );""")
+
+
+@Migrations.register(2, "Add the change log")
+def add_change_log(connection, progress):
+    """
+    Create the change log table and the triggers that fill it.
+
+    Every insert, update, delete and favourite flip on the vault appends a row with a monotonically
+    increasing sequence number (AUTOINCREMENT never reuses a value, even after pruning), so
+    incremental backups can find the entries changed since a given point without scanning the vault.
+    """
+    execute_script(connection, f"""
+        CREATE TABLE IF NOT EXISTS vault_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            entry_id INTEGER NOT NULL,
+            operation TEXT NOT NULL,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TRIGGER IF NOT EXISTS vault_log_insert AFTER INSERT ON vault BEGIN
+            INSERT INTO vault_changes (entry_id, operation) VALUES (NEW.id, 'insert');
+        END;
+        DROP TRIGGER IF EXISTS vault_log_update;
+        CREATE TRIGGER vault_log_update AFTER UPDATE OF website_name, website_url, username, password, notes ON vault
+        WHEN {NOT_REKEYING} BEGIN
+            INSERT INTO vault_changes (entry_id, operation) VALUES (NEW.id, 'update');
+        END;
+        CREATE TRIGGER IF NOT EXISTS vault_log_favourite AFTER UPDATE OF favourite ON vault WHEN OLD.favourite IS NOT NEW.favourite BEGIN
+            INSERT INTO vault_changes (entry_id, operation) VALUES (NEW.id, 'favourite');
+        END;
+        CREATE TRIGGER IF NOT EXISTS vault_log_delete AFTER DELETE ON vault BEGIN
+            INSERT INTO vault_changes (entry_id, operation) VALUES (OLD.id, 'delete');
+        END;""")
+
+
+@Migrations.register(3, "Add entry uuids, version vectors and tombstones for sync")
+def add_sync_schema(connection, progress):
+    """
+    Add what vault sync needs on top of the basic table: a stable uuid and a version vector per entry,
+    tombstones for deleted entries, and a meta table holding this vault's replica id.
+
+    A version vector maps replica ids to the number of edits that replica has made to the entry. Triggers
+    keep them current: new entries get a random uuid and {replica: 1}, content or favourite changes bump
+    this replica's counter unless the writer set the vector itself (as sync does when applying a remote
+    version), and deletions leave a tombstone holding the bumped vector.
+
+    Entries created before sync existed get a uuid derived from their id and creation time, so copies of
+    the same vault file upgraded on different machines agree on it, and an empty version vector.
+    """
+    connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value BLOB);")
+    connection.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('replica_id', ?);", (uuid.uuid4().hex,))
+
+    columns = table_columns(connection, 'vault')
+    if 'uuid' not in columns:
+        connection.execute("ALTER TABLE vault ADD COLUMN uuid TEXT;")
+    if 'version_vector' not in columns:
+        connection.execute("ALTER TABLE vault ADD COLUMN version_vector TEXT NOT NULL DEFAULT '{}';")
+    total = connection.execute("SELECT COUNT(*) FROM vault WHERE uuid IS NULL;").fetchone()[0]
+    done = 0
+    while done < total:
+        legacy_rows = connection.execute("SELECT id, created_at FROM vault WHERE uuid IS NULL LIMIT ?;", (BATCH_SIZE,)).fetchall()
+        if not legacy_rows:
+            break
+        connection.executemany("UPDATE vault SET uuid = ? WHERE id = ?;", [
+            (uuid.uuid5(uuid.NAMESPACE_OID, f"credentials-cacher:{entry_id}:{created_at}").hex, entry_id)
+            for entry_id, created_at in legacy_rows
+        ])
+        done += len(legacy_rows)
+        progress(done, total)
+
+    replica_path = """'$."' || (SELECT value FROM meta WHERE key = 'replica_id') || '"'"""
+    execute_script(connection, f"""
+        CREATE UNIQUE INDEX IF NOT EXISTS vault_uuid ON vault (uuid);
+        CREATE TABLE IF NOT EXISTS vault_tombstones (
+            uuid TEXT PRIMARY KEY,
+            version_vector TEXT NOT NULL,
+            deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TRIGGER IF NOT EXISTS vault_assign_uuid AFTER INSERT ON vault WHEN NEW.uuid IS NULL BEGIN
+            UPDATE vault SET uuid = lower(hex(randomblob(16))),
+                version_vector = json_object((SELECT value FROM meta WHERE key = 'replica_id'), 1)
+            WHERE id = NEW.id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS vault_clear_tombstone AFTER INSERT ON vault WHEN NEW.uuid IS NOT NULL BEGIN
+            DELETE FROM vault_tombstones WHERE uuid = NEW.uuid;
+        END;
+        DROP TRIGGER IF EXISTS vault_bump_version;
+        CREATE TRIGGER vault_bump_version
+        AFTER UPDATE OF website_name, website_url, username, password, notes, favourite ON vault
+        WHEN NEW.version_vector IS OLD.version_vector AND {NOT_REKEYING} AND (
+            NEW.website_name IS NOT OLD.website_name OR NEW.website_url IS NOT OLD.website_url
+            OR NEW.username IS NOT OLD.username OR NEW.password IS NOT OLD.password
+            OR NEW.notes IS NOT OLD.notes OR NEW.favourite IS NOT OLD.favourite) BEGIN
+            UPDATE vault SET version_vector = json_set(OLD.version_vector, {replica_path},
+                COALESCE(json_extract(OLD.version_vector, {replica_path}), 0) + 1)
+            WHERE id = NEW.id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS vault_tombstone AFTER DELETE ON vault BEGIN
+            INSERT OR REPLACE INTO vault_tombstones (uuid, version_vector) VALUES (OLD.uuid,
+                json_set(OLD.version_vector, {replica_path}, COALESCE(json_extract(OLD.version_vector, {replica_path}), 0) + 1));
+        END;""")
+
+
+@Migrations.register(4, "Add entry revisions")
+def add_revision_tracking(connection, progress):
+    """
+    Add a revision number to every entry and keep updated_at current.
+
+    A vault-wide counter in the meta table is bumped by every insert, content or favourite change and
+    delete, and the touched entry takes the new value as its revision. Revisions therefore only grow,
+    so comparing them (or the counter) tells callers what changed without decrypting anything.
+    Changes also set updated_at, unless the writer supplied its own timestamp or version (as restores
+    and sync do when they copy an entry).
+    """
+    if 'revision' not in table_columns(connection, 'vault'):
+        connection.execute("ALTER TABLE vault ADD COLUMN revision INTEGER NOT NULL DEFAULT 0;")
+        connection.execute("UPDATE vault SET revision = id;")
+    connection.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('revision', (SELECT COALESCE(MAX(revision), 0) FROM vault));")
+
+    next_revision = "UPDATE meta SET value = value + 1 WHERE key = 'revision';"
+    current_revision = "(SELECT value FROM meta WHERE key = 'revision')"
+    execute_script(connection, f"""
+        CREATE INDEX IF NOT EXISTS vault_revision ON vault (revision);
+        CREATE TRIGGER IF NOT EXISTS vault_revision_insert AFTER INSERT ON vault BEGIN
+            {next_revision}
+            UPDATE vault SET revision = {current_revision} WHERE id = NEW.id;
+        END;
+        DROP TRIGGER IF EXISTS vault_revision_update;
+        CREATE TRIGGER vault_revision_update
+        AFTER UPDATE OF website_name, website_url, username, password, notes, favourite ON vault
+        WHEN {NOT_REKEYING} AND (NEW.website_name IS NOT OLD.website_name OR NEW.website_url IS NOT OLD.website_url
+            OR NEW.username IS NOT OLD.username OR NEW.password IS NOT OLD.password
+            OR NEW.notes IS NOT OLD.notes OR NEW.favourite IS NOT OLD.favourite) BEGIN
+            {next_revision}
+            UPDATE vault SET revision = {current_revision},
+                updated_at = CASE WHEN NEW.updated_at IS OLD.updated_at AND NEW.version_vector IS OLD.version_vector
+                                  THEN CURRENT_TIMESTAMP ELSE NEW.updated_at END
+            WHERE id = NEW.id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS vault_revision_delete AFTER DELETE ON vault BEGIN
+            {next_revision}
+        END;""")
+
+
+@Migrations.register(5, "Add entry key versions")
+def add_envelope_keys(connection, progress):
+    """
+    Add a key version to every entry, telling which key its fields are encrypted with.
+
+    Entries are encrypted with keys derived from the vault's data key, a random key stored in the meta
+    table wrapped (encrypted) by the key derived from the master password; see Database.unwrap_data_key. Key
+    version 1 entries use a subkey derived from the data key and the entry's uuid. Key version 0 entries,
+    written before data keys existed, are encrypted with the data key itself.
+    """
+    if 'key_version' not in table_columns(connection, 'vault'):
+        connection.execute("ALTER TABLE vault ADD COLUMN key_version INTEGER NOT NULL DEFAULT 0;")
+
+
+@Migrations.register(6, "Add the security audit cache")
+def add_audit_cache(connection, progress):
+    """
+    Create the table where the security audit keeps its per-entry results, tagged with the revision they
+    were computed for. Passwords are only stored as a keyed hash. Results are dropped with their entry.
+    """
+    execute_script(connection, """
+        CREATE TABLE IF NOT EXISTS audit_cache (
+            entry_id INTEGER PRIMARY KEY,
+            revision INTEGER NOT NULL,
+            password_hash BLOB NOT NULL,
+            entropy REAL NOT NULL,
+            score INTEGER NOT NULL,
+            warnings TEXT NOT NULL,
+            breach_count INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS audit_cache_password_hash ON audit_cache (password_hash);
+        CREATE TRIGGER IF NOT EXISTS vault_audit_delete AFTER DELETE ON vault BEGIN
+            DELETE FROM audit_cache WHERE entry_id = OLD.id;
+        END;""")
+
+
+@Migrations.register(7, "Add password history")
+def add_password_history(connection, progress):
+    """
+    Keep the previous encrypted values of entries in the password_history table.
+
+    A trigger records, for every content change, the old ciphertext of just the fields that changed (the
+    others are left NULL and changed_fields lists the ones kept), then prunes the entry's history to the
+    retention limits held in the meta table, all within the updating statement's transaction. History
+    is removed with its entry.
+    """
+    connection.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('history_max_versions', ?);", (HISTORY_MAX_VERSIONS,))
+    connection.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('history_max_age_days', NULL);")
+    columns = table_columns(connection, 'password_history')
+    if columns and 'key_version' not in columns:
+        connection.execute("ALTER TABLE password_history ADD COLUMN key_version INTEGER NOT NULL DEFAULT 0;")
+
+    fields = ("website_name", "website_url", "username", "password", "notes")
+    changed = " OR ".join(f"NEW.{field} IS NOT OLD.{field}" for field in fields)
+    old_values = ", ".join(f"CASE WHEN NEW.{field} IS NOT OLD.{field} THEN OLD.{field} END" for field in fields)
+    changed_fields = " || ".join(f"CASE WHEN NEW.{field} IS NOT OLD.{field} THEN '{field},' ELSE '' END" for field in fields)
+    setting = "(SELECT value FROM meta WHERE key = '{}')"
+    execute_script(connection, f"""
+        CREATE TABLE IF NOT EXISTS password_history (
+            id INTEGER PRIMARY KEY,
+            entry_id INTEGER NOT NULL,
+            changed_fields TEXT NOT NULL,
+            website_name TEXT,
+            website_url TEXT,
+            username TEXT,
+            password TEXT,
+            notes TEXT,
+            key_version INTEGER NOT NULL DEFAULT 0,
+            replaced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE INDEX IF NOT EXISTS password_history_entry ON password_history (entry_id, id);
+        DROP TRIGGER IF EXISTS vault_history_update;
+        CREATE TRIGGER vault_history_update
+        AFTER UPDATE OF {", ".join(fields)} ON vault WHEN {NOT_REKEYING} AND ({changed}) BEGIN
+            INSERT INTO password_history (entry_id, changed_fields, key_version, {", ".join(fields)})
+            VALUES (OLD.id, rtrim({changed_fields}, ','), OLD.key_version, {old_values});
+            DELETE FROM password_history WHERE entry_id = OLD.id AND (
+                id <= (SELECT id FROM password_history WHERE entry_id = OLD.id ORDER BY id DESC
+                       LIMIT 1 OFFSET COALESCE({setting.format('history_max_versions')}, 1000000000))
+                OR replaced_at < datetime('now', '-' || {setting.format('history_max_age_days')} || ' days'));
+        END;
+        CREATE TRIGGER IF NOT EXISTS vault_history_delete AFTER DELETE ON vault BEGIN
+            DELETE FROM password_history WHERE entry_id = OLD.id;
+        END;""")
+
+
+@Migrations.register(8, "Add file attachments")
+def add_attachments(connection, progress):
+    """
+    Create the tables for file attachments: one row per attachment, the ordered list of chunks making up
+    each one, and the encrypted chunks themselves, keyed by their content address and shared between
+    attachments. Triggers keep each chunk's reference count and delete chunks nothing refers to, and
+    attachments are deleted with their entry.
+    """
+    execute_script(connection, """
+        CREATE TABLE IF NOT EXISTS attachments (
+            id INTEGER PRIMARY KEY,
+            entry_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            content_hash BLOB NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE INDEX IF NOT EXISTS attachments_entry ON attachments (entry_id);
+        CREATE TABLE IF NOT EXISTS attachment_chunks (
+            attachment_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            chunk_hash BLOB NOT NULL,
+            PRIMARY KEY (attachment_id, position)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS attachment_chunks_hash ON attachment_chunks (chunk_hash);
+        CREATE TABLE IF NOT EXISTS chunks (
+            hash BLOB PRIMARY KEY,
+            data BLOB NOT NULL,
+            refcount INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TRIGGER IF NOT EXISTS attachment_chunk_insert AFTER INSERT ON attachment_chunks BEGIN
+            UPDATE chunks SET refcount = refcount + 1 WHERE hash = NEW.chunk_hash;
+        END;
+        CREATE TRIGGER IF NOT EXISTS attachment_chunk_delete AFTER DELETE ON attachment_chunks BEGIN
+            UPDATE chunks SET refcount = refcount - 1 WHERE hash = OLD.chunk_hash;
+            DELETE FROM chunks WHERE hash = OLD.chunk_hash AND refcount <= 0;
+        END;
+        CREATE TRIGGER IF NOT EXISTS attachment_delete AFTER DELETE ON attachments BEGIN
+            DELETE FROM attachment_chunks WHERE attachment_id = OLD.id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS vault_attachments_delete AFTER DELETE ON vault BEGIN
+            DELETE FROM attachments WHERE entry_id = OLD.id;
+        END;""")
+
+
+@Migrations.register(9, "Track the schema version in PRAGMA user_version")
+def drop_schema_version_key(connection, progress):
+    """The schema version used to be kept in the meta table, and is now the database's user_version."""
+    connection.execute("DELETE FROM meta WHERE key = 'schema_version';")
+
+
+@Migrations.register(10, "Add entry domain keys")
+def add_domain_keys(connection, progress):
+    """
+    Add a domain key to every entry, the keyed hash of its site that Domain_Index.DomainIndex finds entries by.
+    Existing entries are left NULL, as computing their keys needs the data key; the index fills them in after
+    the vault is next unlocked.
+    """
+    connection.execute("ALTER TABLE vault ADD COLUMN domain_key BLOB;")
+    connection.execute("CREATE INDEX vault_domain_key ON vault (domain_key);")
+
+
+@Migrations.register(11, "Log attachment changes")
+def log_attachment_changes(connection, progress):
+    """
+    Log attaching and deleting files in the change log against their entry, so that incremental backups
+    write the entry again, along with its attachments.
+    """
+    execute_script(connection, """
+        CREATE TRIGGER IF NOT EXISTS attachment_log_insert AFTER INSERT ON attachments BEGIN
+            INSERT INTO vault_changes (entry_id, operation) VALUES (NEW.entry_id, 'attachment');
+        END;
+        CREATE TRIGGER IF NOT EXISTS attachment_log_delete AFTER DELETE ON attachments BEGIN
+            INSERT INTO vault_changes (entry_id, operation) VALUES (OLD.entry_id, 'attachment');
+        END;""")
@@ -1,11 +1,21 @@
-import random
+from array import array
+import mmap
+import os
+import secrets
 import string
 
 class PasswordGenerator:
     """
     A utility class for generating random passwords with specific criteria.
+
+    All randomness comes from the operating system's CSPRNG (via secrets), read in large buffers so that
+    generating many passwords costs few system calls. Random bytes are mapped to characters and positions
+    by rejection sampling, so every choice is unbiased.
     """
-    
+
+    SPECIALS = "!@#$%^&*()?:|"  # Removed characters that might break SQL
+    BUFFER_SIZE = 4096
+
     @staticmethod
     def generate_password(length=12, include_uppercase=True, num_digits=2, num_specials=2):
         """
@@ -20,33 +30,205 @@ class PasswordGenerator:
         Returns:
             str: A string representing the randomly generated password.
         """
-        characters = string.ascii_lowercase
-        password_parts = []
+        return next(PasswordGenerator.iter_passwords(1, length, include_uppercase, num_digits, num_specials))
+
+    @staticmethod
+    def generate_passwords(count, length=12, include_uppercase=True, num_digits=2, num_specials=2):
+        """
+        Generates many passwords at once, all meeting the same criteria as generate_password.
+
+        Args:
+            count (int): The number of passwords to generate.
+
+        Returns:
+            list of str: The generated passwords.
+        """
+        return list(PasswordGenerator.iter_passwords(count, length, include_uppercase, num_digits, num_specials))
+
+    @staticmethod
+    def iter_passwords(count=None, length=12, include_uppercase=True, num_digits=2, num_specials=2):
+        """
+        Returns an iterator of passwords meeting the criteria of generate_password, sharing one random buffer
+        between them. The options are checked here, before the first password is asked for.
+
+        Each password holds exactly num_digits distinct digits, num_specials distinct special characters,
+        one uppercase letter if include_uppercase is set, and lowercase letters everywhere else (at least one).
+        If length is too short for all of these the password is made just long enough.
+
+        Args:
+            count (int, optional): The number of passwords to yield. Defaults to an endless stream.
+
+        Raises:
+            ValueError: If more distinct digits or special characters are requested than exist.
+        """
+        if not 0 <= num_digits <= len(string.digits):
+            raise ValueError(f"num_digits must be between 0 and {len(string.digits)}")
+        if not 0 <= num_specials <= len(PasswordGenerator.SPECIALS):
+            raise ValueError(f"num_specials must be between 0 and {len(PasswordGenerator.SPECIALS)}")
+        return PasswordGenerator._generate(count, max(length, int(include_uppercase) + 1 + num_digits + num_specials),
+                                           include_uppercase, num_digits, num_specials)
+
+    @staticmethod
+    def _generate(count, total_length, include_uppercase, num_digits, num_specials):
+        source = _RandomSource(PasswordGenerator.BUFFER_SIZE)
+
+        produced = 0
+        while count is None or produced < count:
+            # Start from all lowercase letters, then drop the required characters into distinct random positions.
+            # This gives the same distribution as shuffling the required characters in with the letters.
+            characters = list(source.letters(total_length))
+            required = source.sample(string.digits, num_digits) + source.sample(PasswordGenerator.SPECIALS, num_specials)
+            if include_uppercase:
+                required.append(string.ascii_uppercase[source.below(len(string.ascii_uppercase))])
+            for position, character in zip(source.sample(range(total_length), len(required)), required):
+                characters[position] = character
+            yield ''.join(characters)
+            produced += 1
+
+    @staticmethod
+    def generate_passphrase(word_count=6, separator='-', capitalization='lower', wordlist=None):
+        """
+        Generates a diceware-style passphrase from words picked uniformly at random.
+
+        Args:
+            word_count (int): The number of words. Defaults to 6 (about 77 bits with the default wordlist).
+            separator (str): The text placed between words. Defaults to '-'.
+            capitalization (str): 'lower', 'title' (each word capitalised), 'upper', or 'one' (one random word
+                in upper case). Defaults to 'lower'.
+            wordlist (Wordlist, optional): The words to pick from. Defaults to the bundled EFF large wordlist.
+
+        Returns:
+            str: The passphrase.
+        """
+        if word_count < 1:
+            raise ValueError("word_count must be at least 1")
+        if capitalization not in ('lower', 'title', 'upper', 'one'):
+            raise ValueError("capitalization must be 'lower', 'title', 'upper' or 'one'")
+        wordlist = wordlist or Wordlist.default()
+        source = _RandomSource(64)
+        words = [wordlist[source.below(len(wordlist))] for _ in range(word_count)]
+        if capitalization == 'title':
+            words = [word.capitalize() for word in words]
+        elif capitalization == 'upper':
+            words = [word.upper() for word in words]
+        elif capitalization == 'one':
+            index = source.below(word_count)
+            words[index] = words[index].upper()
+        return separator.join(words)
+
+
+class Wordlist:
+    """
+    A wordlist read through a memory map. Only an index of line offsets (4 bytes per word) is held in memory,
+    and words are decoded when picked, so even large lists load quickly and cost little memory.
+
+    Each non-empty line holds one word. Diceware-style lines ("11111<tab>abacus") are also accepted; the last
+    field on the line is the word.
+    """
+
+    DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))),
+                                'resources', 'wordlists', 'eff_large_wordlist.txt')
+    _default = None
+
+    def __init__(self, path):
+        """
+        Opens and indexes a wordlist file.
+
+        Args:
+            path (str): The wordlist file, UTF-8 encoded.
+
+        Raises:
+            ValueError: If the file holds no words.
+        """
+        self.path = path
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(file.fileno()).st_size else b''
+        self._offsets = array('I')
+        position = 0
+        size = len(self._map)
+        while position < size:
+            end = self._map.find(b'\n', position)
+            if end == -1:
+                end = size
+            if self._map[position:end].strip():
+                self._offsets.append(position)
+            position = end + 1
+        if not self._offsets:
+            raise ValueError(f"The wordlist {path} holds no words.")
+
+    @classmethod
+    def default(cls):
+        """Returns the bundled EFF large wordlist, opening it on first use."""
+        if cls._default is None:
+            cls._default = cls(cls.DEFAULT_PATH)
+        return cls._default
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, index):
+        start = self._offsets[index]
+        end = self._map.find(b'\n', start)
+        line = self._map[start:end if end != -1 else len(self._map)]
+        return line.split()[-1].decode('utf-8')
+
+
+class _RandomSource:
+    """
+    Hands out unbiased random choices drawn from a buffer of CSPRNG bytes, refilled as it runs out.
+    """
 
-        # Ensure at least one uppercase letter is added if required
-        if include_uppercase:
-            password_parts.append(random.choice(string.ascii_uppercase))
+    # Bytes 0-233 map evenly onto the 26 letters; the remaining 22 values are discarded.
+    _LETTER_TABLE = bytes(ord(string.ascii_lowercase[value % 26]) for value in range(256))
+    _REJECTED_LETTER_BYTES = bytes(range(256 - 256 % 26, 256))
 
-        # Ensure at least one lowercase letter is added
-        password_parts.append(random.choice(string.ascii_lowercase))
+    def __init__(self, buffer_size):
+        self._buffer_size = buffer_size
+        self._bytes = b''
+        self._position = 0
+        self._letters = ''
+        self._letter_position = 0
 
-        # Select unique digits if required
-        if num_digits > 0:
-            digits = random.sample(string.digits, k=num_digits)
-            password_parts.extend(digits)
+    def _next_byte(self):
+        if self._position >= len(self._bytes):
+            self._bytes = secrets.token_bytes(self._buffer_size)
+            self._position = 0
+        value = self._bytes[self._position]
+        self._position += 1
+        return value
 
-        # Select unique special characters if required
-        specials = "!@#$%^&*()?:|"  # Removed characters that might break SQL
-        if num_specials > 0:
-            specials_selected = random.sample(specials, k=num_specials)
-            password_parts.extend(specials_selected)
+    def below(self, n):
+        """Returns a uniformly random integer in [0, n)."""
+        if n <= 256:
+            limit = 256 - 256 % n
+            while True:
+                value = self._next_byte()
+                if value < limit:
+                    return value % n
+        size = max(1, (n.bit_length() + 7) // 8)
+        span = 256 ** size
+        limit = span - span % n
+        while True:
+            value = 0
+            for _ in range(size):
+                value = (value << 8) | self._next_byte()
+            if value < limit:
+                return value % n
 
-        # Ensure the remainder of the password length with a mix of character types
-        remaining_length = length - len(password_parts)
-        remaining_characters = [char for char in characters if char not in string.digits and char not in specials]
-        password_parts.extend(random.choices(remaining_characters, k=remaining_length))
+    def sample(self, population, k):
+        """Returns k distinct elements of the population in random order (a partial Fisher-Yates shuffle)."""
+        pool = list(population)
+        for index in range(k):
+            swap = index + self.below(len(pool) - index)
+            pool[index], pool[swap] = pool[swap], pool[index]
+        return pool[:k]
 
-        # Shuffle the selected characters to eliminate any predictable patterns
-        random.shuffle(password_parts)
-        
-        return ''.join(password_parts)
\ No newline at end of file
+    def letters(self, n):
+        """Returns n uniformly random lowercase letters, mapped from random bytes in bulk."""
+        while len(self._letters) - self._letter_position < n:
+            fresh = secrets.token_bytes(self._buffer_size).translate(self._LETTER_TABLE, self._REJECTED_LETTER_BYTES)
+            self._letters = self._letters[self._letter_position:] + fresh.decode('ascii')
+            self._letter_position = 0
+        start = self._letter_position
+        self._letter_position += n
+        return self._letters[start:self._letter_position]
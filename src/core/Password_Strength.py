@@ -0,0 +1,229 @@
+import math
+import os
+
+class PasswordStrength:
+    """
+    Estimates how hard a password is to guess, in bits of entropy.
+
+    The password is split into the cheapest combination of parts an attacker would guess separately:
+    common passwords and dictionary words (also when capitalised or written in leetspeak), keyboard and
+    alphabetical sequences, repeated characters, and leftover characters, which cost the size of the
+    character pool the password draws from. The total is the sum of the parts' entropies. Long passwords
+    are scanned in windows of MAX_SCANNED_LENGTH characters, and a password that repeats one unit costs at
+    most the unit plus the number of repeats.
+
+    Lookup tables (character classes, leetspeak, sequence neighbours and the dictionary) are built once,
+    on first use. Estimates work on plain string operations and set lookups, so one password takes tens of
+    microseconds; estimate_many scores duplicates only once.
+    """
+
+    LABELS = ("Very weak", "Weak", "Fair", "Strong", "Very strong")
+    SCORE_THRESHOLDS = (28, 36, 60, 80)  # Minimum bits for scores 1 to 4
+    SHORT_MAX_SCORE = 1  # Passwords under 8 characters can be brute-forced whatever they contain
+    MAX_SCANNED_LENGTH = 64  # Longer passwords are scanned in windows of this many characters
+    MIN_WORD_LENGTH = 4
+    WORDLIST_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))), 'resources', 'wordlists')
+
+    # Pool sizes per character class: lowercase, uppercase, digits, ASCII symbols and anything else.
+    CLASS_POOLS = {'a': 26, 'A': 26, '0': 10, '!': 33}
+    OTHER_POOL = 100
+    SEQUENCES = ("abcdefghijklmnopqrstuvwxyz", "0123456789", "qwertyuiop", "asdfghjkl", "zxcvbnm", "1qaz2wsx3edc4rfv5tgb6yhn7ujm8ik9ol0p")
+    LEET = {'@': 'a', '4': 'a', '8': 'b', '(': 'c', '3': 'e', '6': 'g', '1': 'i', '!': 'i', '|': 'l', '0': 'o', '$': 's', '5': 's', '7': 't', '+': 't', '2': 'z'}
+
+    _tables = None
+
+    @classmethod
+    def _load_tables(cls):
+        """Builds the lookup tables shared by every estimate."""
+        if cls._tables is not None:
+            return cls._tables
+        class_table = {}
+        for code in range(32, 127):
+            character = chr(code)
+            class_table[code] = 'a' if character.islower() else 'A' if character.isupper() else '0' if character.isdigit() else '!'
+
+        neighbours = set()
+        for sequence in cls.SEQUENCES:
+            for first, second in zip(sequence, sequence[1:]):
+                neighbours.add((first, second))
+                neighbours.add((second, first))
+
+        # Common passwords cost log2 of their popularity rank; ordinary words cost log2 of the wordlist size.
+        dictionary = {}
+        with open(os.path.join(cls.WORDLIST_DIRECTORY, 'eff_large_wordlist.txt'), encoding='utf-8') as file:
+            words = [line.split()[-1] for line in file if line.strip()]
+        word_bits = math.log2(len(words))
+        for word in words:
+            if len(word) >= cls.MIN_WORD_LENGTH:
+                dictionary[word] = ('dictionary word', word_bits)
+        with open(os.path.join(cls.WORDLIST_DIRECTORY, 'common_passwords.txt'), encoding='utf-8') as file:
+            for rank, line in enumerate(file, start=1):
+                word = line.strip().lower()
+                if len(word) >= cls.MIN_WORD_LENGTH and (word not in dictionary or dictionary[word][1] > math.log2(rank)):
+                    dictionary[word] = ('common password', max(1.0, math.log2(rank)))
+
+        cls._tables = {
+            'classes': str.maketrans(class_table),
+            'leet': str.maketrans(cls.LEET),
+            'neighbours': neighbours,
+            'dictionary': dictionary,
+            'word_lengths': sorted({len(word) for word in dictionary}, reverse=True),
+            'prefixes': {word[:cls.MIN_WORD_LENGTH] for word in dictionary},
+        }
+        return cls._tables
+
+    @classmethod
+    def estimate(cls, password):
+        """
+        Estimates a password's strength.
+
+        Args:
+            password (str): The password to score.
+
+        Returns:
+            dict: 'entropy' (bits, float), 'score' (0 to 4), 'label' (a short description of the score) and
+                'warnings' (a list of the weaknesses found, such as 'common password' or 'sequence').
+        """
+        tables = cls._load_tables()
+        if not password:
+            return {'entropy': 0.0, 'score': 0, 'label': cls.LABELS[0], 'warnings': ['empty']}
+
+        classes = set(password.translate(tables['classes']))
+        pool = sum(cls.CLASS_POOLS.get(character_class, 0) for character_class in classes)
+        if not classes <= cls.CLASS_POOLS.keys():
+            pool += cls.OTHER_POOL
+        character_bits = math.log2(pool)
+
+        entropy, warnings = cls._cover_windows(password, tables, character_bits)
+        # A password made of one unit repeated costs no more than the unit and the number of repeats.
+        period = cls._period(password)
+        if period < len(password):
+            unit_entropy, unit_warnings = cls._cover_windows(password[:period], tables, character_bits)
+            repeated_entropy = unit_entropy + math.log2(len(password) / period)
+            if repeated_entropy < entropy:
+                kind = 'repeated characters' if period == 1 else 'repeated pattern'
+                entropy, warnings = repeated_entropy, unit_warnings + [kind] * (kind not in unit_warnings)
+
+        if len(password) < 12:
+            warnings.append('short')
+        if len(classes) <= 1:
+            warnings.append('one character type')
+        score = sum(entropy >= threshold for threshold in cls.SCORE_THRESHOLDS)
+        if len(password) < 8:
+            score = min(score, cls.SHORT_MAX_SCORE)
+        return {'entropy': round(entropy, 1), 'score': score, 'label': cls.LABELS[score], 'warnings': warnings}
+
+    @staticmethod
+    def _period(text):
+        """Returns the length of the shortest unit that text repeats (the whole length if it repeats none)."""
+        # Prefix function: failure[i] is the length of the longest proper prefix of text[:i + 1] that is also its suffix.
+        failure = [0] * len(text)
+        for index in range(1, len(text)):
+            length = failure[index - 1]
+            while length and text[index] != text[length]:
+                length = failure[length - 1]
+            failure[index] = length + (text[index] == text[length])
+        period = len(text) - failure[-1]
+        return period if len(text) % period == 0 else len(text)
+
+    @classmethod
+    def _cover_windows(cls, text, tables, character_bits):
+        """
+        Returns the entropy and warnings of text, covered window by window so that the cost stays linear in
+        its length. A window equal to the one before it costs one bit.
+        """
+        entropy, warnings = 0.0, []
+        previous = None
+        for start in range(0, len(text), cls.MAX_SCANNED_LENGTH):
+            window = text[start:start + cls.MAX_SCANNED_LENGTH]
+            if window == previous:
+                entropy += 1
+                kinds = ['repeated pattern']
+            else:
+                bits, kinds = cls._cover(window, tables, character_bits)
+                entropy += bits
+            warnings.extend(kind for kind in kinds if kind not in warnings)
+            previous = window
+        return entropy, warnings
+
+    @classmethod
+    def _cover(cls, scanned, tables, character_bits):
+        """Returns the entropy of the cheapest way to cover text with patterns and single characters, and the kinds of pattern used."""
+        length = len(scanned)
+        lowered = scanned.lower()
+        normalised = lowered.translate(tables['leet'])
+        dictionary = tables['dictionary']
+        neighbours = tables['neighbours']
+
+        # matches[end] lists (start, bits, kind) for every pattern ending just before position end.
+        matches = [[] for _ in range(length + 1)]
+        prefixes = tables['prefixes']
+        for start in range(length - cls.MIN_WORD_LENGTH + 1):
+            if normalised[start:start + cls.MIN_WORD_LENGTH] not in prefixes:
+                continue
+            for word_length in tables['word_lengths']:
+                end = start + word_length
+                if end > length:
+                    continue
+                entry = dictionary.get(normalised[start:end])
+                if entry is None:
+                    continue
+                kind, bits = entry
+                original = scanned[start:end]
+                if original != lowered[start:end]:
+                    bits += 1 if original[0].isupper() and original[1:].islower() else math.log2(word_length)
+                substitutions = sum(1 for a, b in zip(lowered[start:end], normalised[start:end]) if a != b)
+                bits += min(substitutions, 3)
+                matches[end].append((start, bits, kind))
+
+        # Runs of three or more characters that repeat or follow each other on the keyboard or alphabet.
+        start = 0
+        while start < length - 2:
+            end = start + 1
+            repeating = lowered[end] == lowered[start]
+            while end < length and ((lowered[end] == lowered[end - 1]) if repeating else (lowered[end - 1], lowered[end]) in neighbours):
+                end += 1
+            if end - start >= 3:
+                kind = 'repeated characters' if repeating else 'sequence'
+                first_pool = cls.CLASS_POOLS.get(scanned[start].translate(tables['classes']), cls.OTHER_POOL)
+                matches[end].append((start, math.log2(first_pool) + math.log2(end - start), kind))
+                start = end - 1
+            else:
+                start += 1
+
+        best = [0.0] * (length + 1)
+        via = [None] * (length + 1)
+        for end in range(1, length + 1):
+            best[end] = best[end - 1] + character_bits
+            for match_start, bits, kind in matches[end]:
+                if best[match_start] + bits < best[end]:
+                    best[end] = best[match_start] + bits
+                    via[end] = (match_start, kind)
+
+        kinds = []
+        position = length
+        while position > 0:
+            if via[position] is None:
+                position -= 1
+            else:
+                position, kind = via[position]
+                if kind not in kinds:
+                    kinds.append(kind)
+        return best[length], kinds
+
+    @classmethod
+    def estimate_many(cls, passwords):
+        """
+        Estimates the strength of many passwords in one pass, for example every password in the vault.
+
+        Args:
+            passwords (iterable of str): The passwords to score.
+
+        Returns:
+            list of dict: One estimate per password, in order, as returned by estimate. Identical passwords
+                share one result.
+        """
+        cls._load_tables()
+        results = {}
+        return [results[password] if password in results else results.setdefault(password, cls.estimate(password))
+                for password in passwords]
@@ -0,0 +1,266 @@
+from array import array
+from collections import Counter
+from datetime import datetime, timezone
+import heapq
+import re
+import time
+from .Domain_Index import DomainIndex
+
+class SearchIndex:
+    """
+    Ranked, typo-tolerant search over the decrypted names, URL hosts and usernames of a vault's entries.
+
+    Decrypted entries are held in memory only, split into lower-case words. A posting list per trigram (and
+    per one- and two-letter word start) records the (entry, field) pairs whose words contain it, with each
+    word padded by a leading space so that its first letters form grams of their own. A query term is looked
+    up through its rarest grams only: a word within k edits of the term shares all but at most 3k of the
+    term's trigrams, so every such word appears in at least one of the 3k + 1 rarest posting lists, and only
+    the entries found there are scored. Typing a longer query therefore narrows the work rather than
+    scanning the vault.
+
+    Each term scores its best word in the best field, weighted by field: a whole word counts most, then a
+    word prefix, a substring, and a prefix within the allowed number of typos. Every term has to match. The
+    total is raised for favourites and recently updated entries, and results come back best first.
+
+    The index follows the vault through its revision counter, like VaultAgent, decrypting only the entries
+    changed since the last refresh. Replaced entries leave stale postings behind, which scoring skips; the
+    lists are rebuilt once stale postings outnumber live ones.
+
+    Attributes:
+        db (Database): The vault.
+        encryption_key (bytes): The vault's data key.
+    """
+
+    FIELD_WEIGHTS = (1.0, 0.8, 0.6)  # Name, URL host, username
+    MATCH_SCORES = {'word': 1.0, 'prefix': 0.9, 'substring': 0.7, 'typo': 0.6}
+    FAVOURITE_BOOST = 0.2
+    RECENCY_BOOST = 0.1  # For an entry updated now, halving every RECENCY_HALF_LIFE_DAYS
+    RECENCY_HALF_LIFE_DAYS = 30
+    TYPO_THRESHOLD = 50  # Without a limit, typo matches are looked for while a term has fewer exact matches
+    WORD_PATTERN = re.compile(r'[^\W_]+')
+    _EMPTY = array('q')
+
+    def __init__(self, db, encryption_key):
+        """
+        Args:
+            db (Database): The vault. It must be used from the thread that uses the index.
+            encryption_key (bytes): The vault's data key.
+        """
+        self.db = db
+        self.encryption_key = encryption_key
+        self._entries = {}  # Entry id -> (entry tuple, field texts, favourite, updated_at as a timestamp, lower-case name)
+        self._postings = {}  # Gram -> array of entry id * 4 + field
+        self._stale = 0
+        self._revision = None
+        self._boosts = {}
+        self._boost_day = None
+
+    @classmethod
+    def words(cls, text):
+        """Split text into the lower-case words that are indexed and matched."""
+        return cls.WORD_PATTERN.findall((text or '').lower())
+
+    @staticmethod
+    def grams(word):
+        """Return the grams a word is indexed under: its one- and two-letter start, and its trigrams with a leading space."""
+        padded = ' ' + word
+        return {padded[:2]} | {padded[position:position + 3] for position in range(len(padded) - 2)}
+
+    @staticmethod
+    def allowed_typos(term):
+        """Return how many edits a query term may be away from a word: none for short terms, more for longer ones."""
+        return 0 if len(term) < 6 else 1 if len(term) < 12 else 2
+
+    @staticmethod
+    def prefix_distance(term, word, limit):
+        """
+        Return the smallest number of edits (insertions, deletions, substitutions and transpositions of adjacent
+        letters) turning term into a prefix of word, or limit + 1 if that takes more than limit edits.
+        """
+        word = word[:len(term) + limit]
+        previous_previous, previous = None, list(range(len(word) + 1))
+        for row, term_letter in enumerate(term, 1):
+            current = [row] + [0] * len(word)
+            for column, word_letter in enumerate(word, 1):
+                current[column] = min(previous[column] + 1, current[column - 1] + 1, previous[column - 1] + (term_letter != word_letter))
+                if (row > 1 and column > 1 and term_letter == word[column - 2] and term[row - 2] == word_letter):
+                    current[column] = min(current[column], previous_previous[column - 2] + 1)
+            if min(current) > limit:
+                return limit + 1
+            previous_previous, previous = previous, current
+        return min(min(previous[max(0, len(term) - limit):]), limit + 1)
+
+    def refresh(self):
+        """Brings the index up to date with the vault, decrypting only entries changed since the last refresh."""
+        revision = self.db.current_revision()
+        if revision == self._revision:
+            return
+        changed = self.db.fetch_entry_revisions(self._revision or 0)
+        for entry in self.db.fetch_entries_by_ids(list(changed), self.encryption_key):
+            self._add(entry)
+
+        cursor = self.db.connection.cursor()
+        cursor.execute("SELECT COUNT(*) FROM vault;")
+        if cursor.fetchone()[0] != len(self._entries):
+            cursor.execute("SELECT id FROM vault;")
+            existing = {row[0] for row in cursor.fetchall()}
+            for entry_id in set(self._entries) - existing:
+                self._remove(entry_id)
+        if self._stale > max(len(self._entries), 1000):
+            self._rebuild()
+        self._revision = revision
+
+    def _add(self, entry):
+        self._remove(entry[0])
+        normalized = DomainIndex.normalize_url(entry[2])
+        fields = (self.words(entry[1]), normalized.host.split('.') if normalized is not None else self.words(entry[2]), self.words(entry[3]))
+        try:
+            updated_at = datetime.strptime(entry[8], "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+        except (TypeError, ValueError):
+            updated_at = 0
+        # Fields are kept as ' word word ' so that whole-word, prefix and substring tests are single 'in' checks.
+        texts = tuple(' ' + ' '.join(words) + ' ' for words in fields)
+        self._entries[entry[0]] = (entry, texts, bool(entry[6]), updated_at, (entry[1] or '').lower())
+        self._post(entry[0], fields)
+
+    def _post(self, entry_id, fields):
+        for field, words in enumerate(fields):
+            for gram in set().union(*map(self.grams, words)):
+                postings = self._postings.get(gram)
+                if postings is None:
+                    postings = self._postings[gram] = array('q')
+                postings.append(entry_id * 4 + field)
+
+    def _remove(self, entry_id):
+        self._boosts.pop(entry_id, None)
+        if self._entries.pop(entry_id, None) is not None:
+            self._stale += 1
+
+    def _rebuild(self):
+        self._postings = {}
+        for entry_id, (_, texts, _, _, _) in self._entries.items():
+            self._post(entry_id, [text.split() for text in texts])
+        self._stale = 0
+
+    def _grams_postings(self, term):
+        """Return the posting lists of a term's word-start gram and trigrams, shortest first."""
+        padded = ' ' + term
+        grams = {padded[position:position + 3] for position in range(len(padded) - 2)}
+        return sorted((self._postings.get(gram, self._EMPTY) for gram in grams), key=len)
+
+    def _candidates(self, term):
+        """
+        Return the (entry id * 4 + field) keys whose field may contain a term: every word containing it holds
+        all of its trigrams, so it is found in whichever list is shortest.
+        """
+        if len(term) < 3:
+            return set(self._postings.get(' ' + term, ()))
+        padded = ' ' + term
+        trigrams = [padded[position:position + 3] for position in range(1, len(padded) - 2)]
+        return set(min((self._postings.get(gram, self._EMPTY) for gram in trigrams), key=len))
+
+    def _typo_candidates(self, term, typos):
+        """
+        Return the keys whose field may hold a word starting within the allowed typos of a term. Such a word
+        shares all but 4 * typos of the term's grams, as one edit (a transposition at worst) changes at most
+        four, so it is in one of the rarest lists; only the keys found there are counted in the others.
+        """
+        postings = self._grams_postings(term)
+        required = len(postings) - 4 * typos
+        if required < 1:
+            return []  # Too few distinct grams to narrow the search down; only exact matches are found.
+        counts = Counter()
+        for posting in postings[:len(postings) - required + 1]:
+            counts.update(posting)
+        for posting in postings[len(postings) - required + 1:]:
+            counts.update(filter(counts.__contains__, posting))
+        return [key for key, count in counts.items() if count >= required]
+
+    def _typo_score(self, term, text, typos):
+        distance = min(self.prefix_distance(term, word, typos) for word in text.split())
+        return self.MATCH_SCORES['typo'] * (1 - distance / (len(term) + 1)) if distance <= typos else 0
+
+    def _score_candidates(self, term, candidates, typos, scores, term_scores):
+        """Scores the candidate keys for a term into term_scores, keeping each entry's best field."""
+        entries, weights = self._entries, self.FIELD_WEIGHTS
+        word, prefix, substring = (self.MATCH_SCORES[kind] for kind in ('word', 'prefix', 'substring'))
+        spaced, padded = ' ' + term + ' ', ' ' + term
+        for key in candidates:
+            entry_id = key >> 2
+            if scores is not None and entry_id not in scores:
+                continue
+            record = entries.get(entry_id)
+            if record is None:
+                continue
+            text = record[1][key & 3]
+            # The common cases are tested inline, as this runs for every candidate.
+            if spaced in text:
+                score = word
+            elif padded in text:
+                score = prefix
+            elif term in text:
+                score = substring
+            elif typos:
+                score = self._typo_score(term, text, typos)
+            else:
+                continue
+            score *= weights[key & 3]
+            if score > term_scores.get(entry_id, 0):
+                term_scores[entry_id] = score
+
+    def _boost(self, entry_id):
+        """
+        Return the factor an entry's score is raised by for being a favourite and for being recently updated.
+        Factors are cached for the day.
+        """
+        today = int(time.time() // 86400)
+        if today != self._boost_day:
+            self._boosts, self._boost_day = {}, today
+        boost = self._boosts.get(entry_id)
+        if boost is None:
+            _, _, favourite, updated_at, _ = self._entries[entry_id]
+            age_days = max(time.time() - updated_at, 0) / 86400
+            boost = self._boosts[entry_id] = (1 + self.FAVOURITE_BOOST * favourite
+                                              + self.RECENCY_BOOST * 0.5 ** (age_days / self.RECENCY_HALF_LIFE_DAYS))
+        return boost
+
+    def search(self, query, limit=None):
+        """
+        Returns the entries matching a query, best first.
+
+        Args:
+            query (str): Words to look for, in any order, each in the name, URL host or username.
+            limit (int, optional): The most entries to return. Defaults to all matches.
+
+        Returns:
+            list of tuple: Decrypted entries, in the layout returned by Database.fetch_all_entries.
+        """
+        self.refresh()
+        terms = set(self.words(query))
+        if not terms:
+            return []
+        scores = None
+        for term in sorted(terms, key=len, reverse=True):  # The longest term usually has the fewest candidates.
+            term_scores = {}
+            self._score_candidates(term, self._candidates(term), 0, scores, term_scores)
+            typos = self.allowed_typos(term)
+            if typos and len(term_scores) < (limit or self.TYPO_THRESHOLD):
+                # Typo matches rank below exact ones, so they are only looked for while exact matches are few.
+                self._score_candidates(term, self._typo_candidates(term, typos), typos, scores, term_scores)
+            scores = term_scores if scores is None else {entry_id: scores[entry_id] + score for entry_id, score in term_scores.items()}
+            if not scores:
+                return []
+
+        boosts, boost = self._boosts, self._boost
+        ranked = [(-score * (boosts.get(entry_id) or boost(entry_id)), self._entries[entry_id][4], entry_id)
+                  for entry_id, score in scores.items()]
+        ranked = heapq.nsmallest(limit, ranked) if limit is not None else sorted(ranked)
+        return [self._entries[entry_id][0] for _, _, entry_id in ranked]
+
+    def clear(self):
+        """Forgets every decrypted entry and the key, as when the vault locks."""
+        self.encryption_key = None
+        self._entries.clear()
+        self._postings = {}
+        self._stale = 0
+        self._revision = None
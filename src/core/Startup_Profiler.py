@@ -0,0 +1,227 @@
+import importlib.abc
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+PROFILE_FLAG = '--profile-startup'
+PROFILE_ENV_VAR = 'CREDENTIALS_CACHER_PROFILE'
+
+
+class _TimedLoader:
+    """
+    Wraps a module loader so that executing the module is timed by the owning profiler.
+    All other attribute lookups are forwarded to the wrapped loader.
+    """
+
+    def __init__(self, loader, profiler):
+        self._loader = loader
+        self._profiler = profiler
+
+    def create_module(self, spec):
+        # Extension modules do most of their initialisation here rather than in exec_module.
+        with self._profiler.record_import(spec.name):
+            return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        with self._profiler.record_import(module.__name__):
+            self._loader.exec_module(module)
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+
+class _TimingFinder(importlib.abc.MetaPathFinder):
+    """
+    Meta path finder placed at the front of sys.meta_path. It defers the actual lookup to the
+    remaining finders and swaps the resulting loader for a timed one.
+    """
+
+    def __init__(self, profiler):
+        self._profiler = profiler
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                    spec.loader = _TimedLoader(spec.loader, self._profiler)
+                return spec
+        return None
+
+
+class StartupProfiler:
+    """
+    Records how long application startup takes, broken down into per-module import times and named phases.
+
+    The profiler is inert unless enabled, so the startup code can call it unconditionally.
+
+    Attributes:
+        enabled (bool): Whether timings are being recorded.
+        report_path (str): Where the report is written when the profiler finishes.
+    """
+
+    def __init__(self, enabled=False, report_path=None):
+        """
+        Initializes the profiler and starts the startup clock.
+
+        Args:
+            enabled (bool): Whether to record timings. Defaults to False.
+            report_path (str, optional): The file to write the report to. Defaults to 'startup_profile.json'
+                in the application's AppData directory.
+        """
+        self.enabled = enabled
+        self.report_path = report_path
+        self._start = time.perf_counter()
+        self._finder = None
+        self._import_stack = []
+        self.imports = {}  # module name -> [cumulative seconds, self seconds, nesting depth]
+        self.phases = []  # (phase name, start offset seconds, duration seconds)
+
+    @classmethod
+    def from_environment(cls, argv=None):
+        """
+        Creates a profiler enabled by the --profile-startup command line flag or the
+        CREDENTIALS_CACHER_PROFILE environment variable. Either may carry a report path,
+        e.g. '--profile-startup=report.json' or 'CREDENTIALS_CACHER_PROFILE=report.json'.
+
+        Args:
+            argv (list of str, optional): The command line arguments. Defaults to sys.argv. The profiling
+                flag is removed from the list so it is not passed on to Qt.
+
+        Returns:
+            StartupProfiler: A profiler, enabled or not.
+        """
+        argv = sys.argv if argv is None else argv
+        enabled = False
+        report_path = None
+
+        env_value = os.getenv(PROFILE_ENV_VAR, '').strip()
+        if env_value and env_value.lower() not in ('0', 'false', 'no', 'off'):
+            enabled = True
+            if env_value.lower() not in ('1', 'true', 'yes', 'on'):
+                report_path = env_value
+
+        for arg in list(argv[1:]):
+            if arg == PROFILE_FLAG or arg.startswith(PROFILE_FLAG + '='):
+                enabled = True
+                if '=' in arg:
+                    report_path = arg.split('=', 1)[1]
+                argv.remove(arg)
+
+        return cls(enabled, report_path)
+
+    def install_import_hook(self):
+        """Starts timing every module imported from now on."""
+        if self.enabled and self._finder is None:
+            self._finder = _TimingFinder(self)
+            sys.meta_path.insert(0, self._finder)
+
+    def remove_import_hook(self):
+        """Stops timing imports."""
+        if self._finder is not None:
+            sys.meta_path.remove(self._finder)
+            self._finder = None
+
+    @contextmanager
+    def record_import(self, module_name):
+        """
+        Times the execution of one module. Time spent importing nested modules is counted in the
+        cumulative time but subtracted from the module's own (self) time.
+
+        Args:
+            module_name (str): The fully qualified name of the module being executed.
+        """
+        depth = len(self._import_stack)
+        self._import_stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = self._import_stack.pop()
+            if self._import_stack:
+                self._import_stack[-1] += elapsed
+            timing = self.imports.setdefault(module_name, [0.0, 0.0, depth])
+            timing[0] += elapsed
+            timing[1] += elapsed - nested
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Times a named startup phase such as 'db_init' or 'window_construction'.
+
+        Args:
+            name (str): The name of the phase.
+        """
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, started - self._start, time.perf_counter() - started))
+
+    def mark(self, name):
+        """
+        Records a zero-length phase, for points in time such as the first frame being shown.
+
+        Args:
+            name (str): The name of the milestone.
+        """
+        if self.enabled:
+            self.phases.append((name, time.perf_counter() - self._start, 0.0))
+
+    def build_report(self):
+        """
+        Builds the profiling report.
+
+        Returns:
+            dict: The total elapsed time, the phases in the order they ran and the imports sorted by cumulative time.
+        """
+        return {
+            'total_seconds': time.perf_counter() - self._start,
+            'import_seconds': sum(timing[0] for timing in self.imports.values() if timing[2] == 0),
+            'phases': [
+                {'name': name, 'offset_seconds': offset, 'duration_seconds': duration}
+                for name, offset, duration in self.phases
+            ],
+            'imports': [
+                {'module': module, 'cumulative_seconds': cumulative, 'self_seconds': own, 'depth': depth}
+                for module, (cumulative, own, depth) in sorted(self.imports.items(), key=lambda item: item[1][0], reverse=True)
+            ],
+        }
+
+    def write_report(self):
+        """
+        Writes the report as JSON and logs a short summary to stderr.
+
+        Returns:
+            str: The path of the written report, or None if profiling is disabled.
+        """
+        if not self.enabled:
+            return None
+        self.remove_import_hook()
+        report = self.build_report()
+
+        report_path = self.report_path
+        if report_path is None:
+            report_directory = os.path.join(os.getenv('APPDATA'), 'Credentials Cacher')
+            if not os.path.exists(report_directory):
+                os.makedirs(report_directory)
+            report_path = os.path.join(report_directory, 'startup_profile.json')
+
+        with open(report_path, 'w') as file:
+            json.dump(report, file, indent=4)
+
+        print(f"Startup took {report['total_seconds'] * 1000:.1f} ms "
+              f"({report['import_seconds'] * 1000:.1f} ms in imports)", file=sys.stderr)
+        for phase in report['phases']:
+            print(f"  {phase['name']:<24} at {phase['offset_seconds'] * 1000:8.1f} ms "
+                  f"took {phase['duration_seconds'] * 1000:8.1f} ms", file=sys.stderr)
+        print(f"Full report written to {report_path}", file=sys.stderr)
+        return report_path
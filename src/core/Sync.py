@@ -0,0 +1,234 @@
+import json
+import os
+from .Database import Database
+from .Domain_Index import DomainIndex
+from .Encryption import Encryption
+
+class VaultSync:
+    """
+    Two-way merge between the open vault and another vault file, such as a copy of passwords.db
+    from another machine.
+
+    Entries are matched by uuid and compared by version vector, entirely in SQL on the two attached
+    files, so only entries that differ are read. Differing entries are copied as ciphertext when both
+    vaults use the same encryption key; otherwise only those entries are decrypted and re-encrypted.
+    All changes to both files are applied in one transaction.
+
+    Concurrent edits (neither version vector dominates the other) are conflicts. They are resolved in
+    favour of the side named by 'prefer', merged so both files end up with the same version, and reported.
+
+    Attributes:
+        db (Database): The open (local) vault.
+        encryption_key (bytes): The local vault's data key.
+        remote_path (str): The path of the other vault file.
+        remote_encryption_key (bytes): The other vault's data key.
+        prefer (str): 'local' or 'remote', the side that wins a conflict.
+    """
+
+    CONTENT_COLUMNS = ('website_name', 'website_url', 'username', 'password', 'notes')
+    COPY_COLUMNS = CONTENT_COLUMNS + ('favourite', 'created_at', 'updated_at', 'uuid', 'version_vector', 'key_version', 'domain_key')
+
+    def __init__(self, db, encryption_key, remote_path, remote_encryption_key=None, prefer='local'):
+        """
+        Initializes the sync.
+
+        Args:
+            db (Database): The open vault.
+            encryption_key (bytes): The open vault's encryption key.
+            remote_path (str): The other vault file.
+            remote_encryption_key (bytes, optional): The other vault's key. Defaults to the local key.
+            prefer (str): The side that wins conflicting edits, 'local' or 'remote'. Defaults to 'local'.
+        """
+        if prefer not in ('local', 'remote'):
+            raise ValueError("prefer must be 'local' or 'remote'")
+        self.db = db
+        self.encryption_key = encryption_key
+        self.remote_path = remote_path
+        self.remote_encryption_key = remote_encryption_key if remote_encryption_key is not None else encryption_key
+        self.prefer = prefer
+
+    @staticmethod
+    def compare_versions(local_vector, remote_vector):
+        """
+        Compares two version vectors.
+
+        Args:
+            local_vector (dict): Maps replica ids to edit counts.
+            remote_vector (dict): Maps replica ids to edit counts.
+
+        Returns:
+            str: 'equal', 'local' if the local version includes every remote edit and more, 'remote' for the
+                reverse, or 'concurrent' if each side has edits the other lacks.
+        """
+        local_ahead = any(count > remote_vector.get(replica, 0) for replica, count in local_vector.items())
+        remote_ahead = any(count > local_vector.get(replica, 0) for replica, count in remote_vector.items())
+        if local_ahead and remote_ahead:
+            return 'concurrent'
+        if local_ahead:
+            return 'local'
+        if remote_ahead:
+            return 'remote'
+        return 'equal'
+
+    @staticmethod
+    def merge_versions(local_vector, remote_vector, replica_id):
+        """
+        Returns a version vector that dominates both inputs, recording a merge made by the given replica.
+        """
+        merged = dict(local_vector)
+        for replica, count in remote_vector.items():
+            merged[replica] = max(merged.get(replica, 0), count)
+        merged[replica_id] = merged.get(replica_id, 0) + 1
+        return merged
+
+    @staticmethod
+    def encode_version(vector):
+        """Returns a version vector as stored in the vault, in the compact form the triggers' json_set writes."""
+        return json.dumps(vector, separators=(',', ':'))
+
+    def sync(self):
+        """
+        Brings both vault files to the same state.
+
+        Returns:
+            dict: Counts of entries 'pulled' into and 'pushed' out of the local vault, entries deleted on each
+                side ('deleted_local', 'deleted_remote'), and a list of 'conflicts', each a dict with the entry's
+                'uuid' and which side's version was 'kept'.
+        """
+        if os.path.realpath(self.remote_path) == os.path.realpath(self.db.db_path):
+            raise ValueError("Cannot sync a vault with itself.")
+        # The other vault's schema is brought up to date (uuids, version vectors, tombstones), but it keeps its
+        # own salt and replica id: a vault without a salt is refused rather than given a new one.
+        remote = Database.inspect(self.remote_path)
+        try:
+            remote.upgrade()
+        finally:
+            remote.close_connection()
+
+        report = {'pulled': 0, 'pushed': 0, 'deleted_local': 0, 'deleted_remote': 0, 'conflicts': []}
+        connection = self.db.connection
+        connection.commit()
+        connection.execute("ATTACH DATABASE ? AS remote;", (self.remote_path,))
+        try:
+            connection.execute("BEGIN IMMEDIATE;")
+            try:
+                self._merge(report)
+                connection.commit()
+            except BaseException:
+                connection.rollback()
+                raise
+        finally:
+            connection.execute("DETACH DATABASE remote;")
+        return report
+
+    def _merge(self, report):
+        cursor = self.db.connection.cursor()
+        replica_id = self.db.replica_id()
+        same_key = self.encryption_key == self.remote_encryption_key
+
+        # Entries on both sides whose versions may differ. With a shared key their ciphertext is compared too:
+        # equal vectors over different content are edits no vector recorded apart, such as edits made before
+        # version vectors existed, or by copies of one file that still shared a replica id. Vectors are compared
+        # parsed, as the same vector can be stored as different text.
+        content_differs = " OR ".join(f"l.{column} IS NOT r.{column}" for column in self.CONTENT_COLUMNS) if same_key else "0"
+        cursor.execute(f"""
+            SELECT l.uuid, l.version_vector, r.version_vector, ({content_differs}) FROM main.vault l JOIN remote.vault r ON l.uuid = r.uuid
+            WHERE l.version_vector IS NOT r.version_vector OR ({content_differs});""")
+        for entry_uuid, local_json, remote_json, content_differs in cursor.fetchall():
+            local_vector, remote_vector = json.loads(local_json), json.loads(remote_json)
+            order = self.compare_versions(local_vector, remote_vector)
+            if order == 'equal' and not content_differs:
+                continue
+            if order == 'remote':
+                self._copy_entry(entry_uuid, 'remote', 'main', update=True)
+                report['pulled'] += 1
+            elif order == 'local':
+                self._copy_entry(entry_uuid, 'main', 'remote', update=True)
+                report['pushed'] += 1
+            else:  # Concurrent, or equal vectors over different content.
+                self._resolve_conflict(entry_uuid, local_vector, remote_vector, replica_id, report, present_on_both=True)
+
+        # Entries only one side has: either new, or deleted on the other side.
+        for source, target in (('main', 'remote'), ('remote', 'main')):
+            cursor.execute(f"""
+                SELECT s.uuid, s.version_vector, t.version_vector FROM {source}.vault s
+                LEFT JOIN {target}.vault_tombstones t ON t.uuid = s.uuid
+                WHERE s.uuid NOT IN (SELECT uuid FROM {target}.vault);""")
+            for entry_uuid, entry_json, tombstone_json in cursor.fetchall():
+                if tombstone_json is None:
+                    self._copy_entry(entry_uuid, source, target, update=False)
+                    report['pushed' if source == 'main' else 'pulled'] += 1
+                    continue
+                entry_vector, tombstone_vector = json.loads(entry_json), json.loads(tombstone_json)
+                order = self.compare_versions(entry_vector, tombstone_vector)
+                if order in ('remote', 'equal'):
+                    # The deletion saw this version of the entry, so it wins.
+                    cursor.execute(f"DELETE FROM {source}.vault WHERE uuid = ?;", (entry_uuid,))
+                    cursor.execute(f"UPDATE {source}.vault_tombstones SET version_vector = ? WHERE uuid = ?;", (tombstone_json, entry_uuid))
+                    report['deleted_local' if source == 'main' else 'deleted_remote'] += 1
+                elif order == 'local':
+                    self._copy_entry(entry_uuid, source, target, update=False)
+                    report['pushed' if source == 'main' else 'pulled'] += 1
+                else:
+                    # Edited on one side, deleted on the other: keep the edit rather than lose data.
+                    self._copy_entry(entry_uuid, source, target, update=False)
+                    merged = self.encode_version(self.merge_versions(entry_vector, tombstone_vector, replica_id))
+                    for schema in ('main', 'remote'):
+                        cursor.execute(f"UPDATE {schema}.vault SET version_vector = ? WHERE uuid = ?;", (merged, entry_uuid))
+                    report['conflicts'].append({'uuid': entry_uuid, 'kept': 'local' if source == 'main' else 'remote'})
+
+        # Share tombstones so that a third vault synced later learns about the deletions too.
+        for source, target in (('main', 'remote'), ('remote', 'main')):
+            cursor.execute(f"""
+                INSERT OR IGNORE INTO {target}.vault_tombstones (uuid, version_vector, deleted_at)
+                SELECT uuid, version_vector, deleted_at FROM {source}.vault_tombstones
+                WHERE uuid NOT IN (SELECT uuid FROM {target}.vault);""")
+
+    def _resolve_conflict(self, entry_uuid, local_vector, remote_vector, replica_id, report, present_on_both):
+        """Copies the preferred side's version over the other and gives both a version vector that dominates each."""
+        if self.prefer == 'local':
+            self._copy_entry(entry_uuid, 'main', 'remote', update=present_on_both)
+        else:
+            self._copy_entry(entry_uuid, 'remote', 'main', update=present_on_both)
+        merged = self.encode_version(self.merge_versions(local_vector, remote_vector, replica_id))
+        cursor = self.db.connection.cursor()
+        for schema in ('main', 'remote'):
+            cursor.execute(f"UPDATE {schema}.vault SET version_vector = ? WHERE uuid = ?;", (merged, entry_uuid))
+        report['conflicts'].append({'uuid': entry_uuid, 'kept': self.prefer})
+
+    def _copy_entry(self, entry_uuid, source, target, update):
+        """
+        Copies one entry between the attached vaults, as ciphertext when both use the same key.
+        The target's id is left alone; entries are matched by uuid.
+        """
+        cursor = self.db.connection.cursor()
+        columns = ', '.join(self.COPY_COLUMNS)
+        if self.encryption_key == self.remote_encryption_key:
+            if update:
+                cursor.execute(f"""UPDATE {target}.vault SET ({columns}) = (SELECT {columns} FROM {source}.vault WHERE uuid = ?)
+                                   WHERE uuid = ?;""", (entry_uuid, entry_uuid))
+            else:
+                cursor.execute(f"INSERT INTO {target}.vault ({columns}) SELECT {columns} FROM {source}.vault WHERE uuid = ?;", (entry_uuid,))
+            return
+
+        source_key, target_key = (self.encryption_key, self.remote_encryption_key) if source == 'main' else (self.remote_encryption_key, self.encryption_key)
+        cursor.execute(f"SELECT {columns} FROM {source}.vault WHERE uuid = ?;", (entry_uuid,))
+        row = list(cursor.fetchone())
+        key_version_index = self.COPY_COLUMNS.index('key_version')
+        source_entry_key = Database.entry_key(source_key, entry_uuid, row[key_version_index])
+        target_entry_key = Database.entry_key(target_key, entry_uuid, Database.KEY_VERSION)
+        url = None
+        for index, column in enumerate(self.CONTENT_COLUMNS):
+            if row[index]:
+                plaintext = Encryption.decrypt_data(row[index], source_entry_key)
+                url = plaintext if column == 'website_url' else url
+                row[index] = Encryption.encrypt_data(plaintext, target_entry_key)
+        row[key_version_index] = Database.KEY_VERSION
+        # The source's domain key is keyed by its own data key, so the target's is computed from the URL.
+        row[self.COPY_COLUMNS.index('domain_key')] = DomainIndex.domain_key(DomainIndex.derive_index_key(target_key), url)
+        if update:
+            assignments = ', '.join(f"{column} = ?" for column in self.COPY_COLUMNS)
+            cursor.execute(f"UPDATE {target}.vault SET {assignments} WHERE uuid = ?;", row + [entry_uuid])
+        else:
+            placeholders = ', '.join('?' for _ in self.COPY_COLUMNS)
+            cursor.execute(f"INSERT INTO {target}.vault ({columns}) VALUES ({placeholders});", row)
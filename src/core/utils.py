@@ -1,4 +1,5 @@
 import os
+import uuid
 
 def get_settings_path():
     """
@@ -14,3 +15,22 @@ def get_settings_path():
     if not os.path.exists(settings_directory):
         os.makedirs(settings_directory)                                         # Create the settings directory if it does not exist.
     return os.path.join(settings_directory, 'settings.json')                    # Return the path to the settings.json file.
+
+def get_installation_id():
+    """
+    Returns the id of this installation, kept in the 'Credentials Cacher' directory next to the settings file
+    and created on first use. It tells vault files copied to another machine apart from the original.
+
+    Returns:
+        str: A random hexadecimal id.
+    """
+    installation_path = os.path.join(os.path.dirname(get_settings_path()), 'installation_id')
+    if os.path.exists(installation_path):
+        with open(installation_path, 'r') as file:
+            installation_id = file.read().strip()
+        if installation_id:
+            return installation_id
+    installation_id = uuid.uuid4().hex
+    with open(installation_path, 'w') as file:
+        file.write(installation_id)
+    return installation_id
@@ -1,9 +1,8 @@
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QSpacerItem, QSizePolicy, QLabel, QLineEdit, QPushButton, QCheckBox, QMessageBox
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QSpacerItem, QSizePolicy, QLabel, QLineEdit, QPushButton, QCheckBox, QMessageBox, QProgressDialog, QApplication
 from PyQt5.QtCore import Qt
 from PyQt5.QtSvg import QSvgWidget
-import pickle
-from core.Hashing import Hashing
-from core.Encryption import Encryption
+from core.Credentials import Credentials
+from core.Key_Rotation import KeyRotation
 import os
 import json
 
@@ -25,7 +24,7 @@ class LoginWidget(QWidget):
         Args:
             on_show_other_frame (Callable): Function to switch to another part of the application UI.
             main_window (MainWindow): Reference to the main application window.
-            db (Database): The application's database connection. Not directly used in this widget.
+            db (Database): The application's database connection, whose data key is unlocked on login.
             parent (QWidget, optional): Parent widget. Defaults to None.
         """
         super().__init__(parent)
@@ -159,14 +158,44 @@ class LoginWidget(QWidget):
 
         if self.validate_login(username, password):
             self.main_window.resetAutoLockTimer()
-            global_salt = self.get_global_salt()
-            encryption_key = Encryption.derive_key(password.encode(), global_salt)
+            master_key = Credentials.derive_master_key(self.db, password)
+            try:
+                if self.db.key_rotation_pending():
+                    encryption_key = self.finish_key_rotation(master_key)
+                else:
+                    encryption_key = self.db.unwrap_data_key(master_key)
+            except ValueError:
+                QMessageBox.critical(self, "Error", "The vault could not be unlocked with this password.")
+                return
             self.main_window.set_encryption_key(encryption_key)
             self.main_window.stacked_widgets.setCurrentWidget(self.main_window.vault_widget)
             self.save_settings()
         else:
             QMessageBox.warning(self, "Login Failed", "The username or password is incorrect.")
 
+    def finish_key_rotation(self, master_key):
+        """
+        Finishes re-encrypting the vault under a new data key after the last attempt was interrupted, showing progress.
+
+        Args:
+            master_key (bytes): The key derived from the master password.
+
+        Returns:
+            bytes: The vault's new data key.
+        """
+        progressDialog = QProgressDialog("Finishing the vault re-encryption...", None, 0, 1000, self)
+        progressDialog.setWindowModality(Qt.WindowModal)
+        progressDialog.setMinimumDuration(500)
+
+        def on_progress(done, total):
+            progressDialog.setValue(int(done * 1000 / total))
+            QApplication.processEvents()
+
+        try:
+            return KeyRotation(self.db, master_key, progress_callback=on_progress).run()
+        finally:
+            progressDialog.close()
+
     def validate_login(self, username, password):
         """
         Checks the provided username and password against the stored credentials.
@@ -178,35 +207,15 @@ class LoginWidget(QWidget):
         Returns:
             bool: True if the credentials match, False otherwise.
         """
-        credentials_path = os.path.join(os.getenv('APPDATA'), 'Credentials Cacher', 'credentials.bin')
-
         try:
-            with open(credentials_path, 'rb') as file:
-                credentials = pickle.load(file)
-                return Hashing.verify_password(credentials['password'], password) and credentials['username'] == username
-        except FileNotFoundError:
-            QMessageBox.critical(self, "Error", "Credentials file not found.")
+            return Credentials.verify(self.db, username, password)
+        except ValueError as e:
+            QMessageBox.critical(self, "Error", str(e))
             return False
         except Exception as e:
             QMessageBox.critical(self, "Error", f"An error occurred: {e}")
             return False
 
-    def get_global_salt(self):
-        """
-        Retrieves the global salt used for encryption from the stored file.
-
-        Returns:
-            bytes: The global salt, or None if the file could not be found.
-        """
-        salt_path = os.path.join(os.getenv('APPDATA'), 'Credentials Cacher', 'global_salt.bin')
-
-        try:
-            with open(salt_path, 'rb') as salt_file:
-                return salt_file.read()
-        except FileNotFoundError:
-            QMessageBox.critical(self, "Error", "Global salt file not found.")
-            return None
-
     def reset_state(self):
         """
         Resets the input fields and checkboxes to their default state.
@@ -230,12 +239,9 @@ class LoginWidget(QWidget):
                 self.remember_me_checkbox.setChecked(remember_me)
                 
                 if remember_me:
-                    credentials_path = os.path.join(os.getenv('APPDATA'), 'Credentials Cacher', 'credentials.bin')
-                    with open(credentials_path, 'rb') as cred_file:
-                        credentials = pickle.load(cred_file)
-                        self.username_entry.setText(credentials.get('username', ''))
-                        # If you also want to autofill the password (not recommended for security reasons), you can do it here.
-        except FileNotFoundError:
+                    self.username_entry.setText(Credentials.load(self.db)['username'])
+                    # If you also want to autofill the password (not recommended for security reasons), you can do it here.
+        except (FileNotFoundError, ValueError):
             # Settings file doesn't exist; proceed with defaults.
             pass
         except json.JSONDecodeError:
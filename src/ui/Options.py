@@ -1,7 +1,8 @@
 from PyQt5.QtCore import Qt
-from PyQt5.QtWidgets import QDialog, QVBoxLayout, QCheckBox, QSlider, QLabel, QPushButton, QHBoxLayout
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QCheckBox, QSlider, QLabel, QPushButton, QHBoxLayout, QMessageBox
 import json
 from core.utils import get_settings_path
+from core.Autofill_Bridge import AutofillBridge
 import os
 
 class OptionsDialog(QDialog):
@@ -40,6 +41,9 @@ class OptionsDialog(QDialog):
         # Auto-Lock Timer Slider and Label
         self.setupAutoLockTimer()
 
+        # Browser Autofill Bridge Toggle and Pairing
+        self.setupAutofillBridge()
+
         # OK and Cancel Buttons
         self.setupDialogButtons()
 
@@ -59,6 +63,46 @@ class OptionsDialog(QDialog):
         self.autoLockLayout.addWidget(self.autoLockSlider)
         self.layout.addLayout(self.autoLockLayout)
         
+    def setupAutofillBridge(self):
+        """
+        Sets up the toggle for answering browser extensions and the buttons pairing and unpairing them.
+        """
+        self.autofillBridgeLayout = QHBoxLayout()
+        self.autofillBridgeCheckbox = QCheckBox("Enable Browser Autofill")
+        self.pairExtensionButton = QPushButton("Pair Browser Extension")
+        self.pairExtensionButton.clicked.connect(self.pairExtension)
+        self.unpairExtensionButton = QPushButton("Unpair Browser Extension")
+        self.unpairExtensionButton.setEnabled(AutofillBridge.is_paired(self.parent().db))
+        self.unpairExtensionButton.clicked.connect(self.unpairExtension)
+        self.autofillBridgeLayout.addWidget(self.autofillBridgeCheckbox)
+        self.autofillBridgeLayout.addWidget(self.pairExtensionButton)
+        self.autofillBridgeLayout.addWidget(self.unpairExtensionButton)
+        self.layout.addLayout(self.autofillBridgeLayout)
+
+    def pairExtension(self):
+        """
+        Creates a new pairing token and shows it, to be entered in the browser extension. Extensions paired
+        before stop being answered.
+        """
+        vaultWidget = self.parent()
+        token = AutofillBridge.pair(vaultWidget.db)
+        vaultWidget.mainWindow.startAutofillBridge()  # Restarted, to answer the new token only.
+        self.unpairExtensionButton.setEnabled(True)
+        message = QMessageBox(QMessageBox.Information, "Pair Browser Extension",
+                              f"Enter this token in the browser extension. It is shown only once.\n\n{token}", parent=self)
+        message.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        message.exec_()
+
+    def unpairExtension(self):
+        """
+        Forgets the pairing token, so that no browser extension is answered until one is paired again.
+        """
+        vaultWidget = self.parent()
+        AutofillBridge.unpair(vaultWidget.db)
+        vaultWidget.mainWindow.startAutofillBridge()  # Stopped, as nothing is paired any more.
+        self.unpairExtensionButton.setEnabled(False)
+        QMessageBox.information(self, "Unpair Browser Extension", "Browser extensions are no longer answered.")
+
     def setupDialogButtons(self):
         """
         Sets up OK and Cancel buttons for the dialog.
@@ -79,6 +123,7 @@ class OptionsDialog(QDialog):
                 self.darkModeToggle.setChecked(settings.get('dark_mode', False))
                 self.passwordVisibilityToggle.setChecked(settings.get('show_passwords', False))
                 self.autoLockEnabledCheckbox.setChecked(settings.get('auto_lock_enabled', True))
+                self.autofillBridgeCheckbox.setChecked(settings.get('autofill_bridge_enabled', False))
 
                 auto_lock_minutes = settings.get('auto_lock', 5)
                 slider_position = auto_lock_minutes // 5
@@ -138,6 +183,7 @@ class OptionsDialog(QDialog):
             'show_passwords': self.passwordVisibilityToggle.isChecked(),
             'auto_lock_enabled': self.autoLockEnabledCheckbox.isChecked(),
             'auto_lock': self.autoLockSlider.value() * 5,
+            'autofill_bridge_enabled': self.autofillBridgeCheckbox.isChecked(),
         })
         
         # Save the updated settings
@@ -3,6 +3,8 @@ from PyQt5.QtCore import Qt, pyqtSignal, QSize
 from PyQt5.QtGui import QPixmap, QCursor
 import os
 
+_pixmapCache = {}  # (icon file name, width, height) -> scaled QPixmap, shared by every entry row
+
 class PasswordEntryButton(QWidget):
     """
     Custom widget representing a password entry in the vault, providing options to display details, edit, delete, or toggle favourite status.
@@ -105,16 +107,17 @@ class PasswordEntryButton(QWidget):
         """
         Updates the visibility of icons based on selection state and applies custom styling.
 
-        Args:pass
+        The selected styling comes from the stylesheet's QPushButton:checked rule. Qt restyles a
+        pseudo-state change with a plain repaint, so no unpolish/polish pass is needed.
+
+        Args:
             isSelected (bool): Indicates if the entry is selected.
         """
         self.editIcon.setVisible(isSelected)
         self.deleteIcon.setVisible(isSelected)
         self.favouriteIcon.setVisible(isSelected)
         
-        self.button.setProperty('isSelected', isSelected)
-        self.button.style().unpolish(self.button)
-        self.button.style().polish(self.button)
+        self.button.setChecked(isSelected)
 
         
     def updateIcons(self, themeName):
@@ -137,13 +140,17 @@ class PasswordEntryButton(QWidget):
         iconSize = QSize(int(self.button.sizeHint().height() * scaleFactor),
                         int(self.button.sizeHint().height() * scaleFactor))
 
-        # Helper function to load an icon with logging for debugging.
+        # Helper function to load an icon with logging for debugging. Scaled icons are cached so that
+        # a theme change on a large vault does not reload and rescale the same files for every row.
         def loadIcon(iconName):
-            iconPath = os.path.join(resourcesPath, iconName)
-            pixmap = QPixmap(iconPath).scaled(iconSize, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            if pixmap.isNull():
-                print(f"Failed to load icon: {iconPath}")
-            return pixmap
+            cacheKey = (iconName, iconSize.width(), iconSize.height())
+            if cacheKey not in _pixmapCache:
+                iconPath = os.path.join(resourcesPath, iconName)
+                pixmap = QPixmap(iconPath).scaled(iconSize, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+                if pixmap.isNull():
+                    print(f"Failed to load icon: {iconPath}")
+                _pixmapCache[cacheKey] = pixmap
+            return _pixmapCache[cacheKey]
 
         # Update the edit icon.
         editIconName = 'edit.png' if themeName == 'light' else 'edit_white.png'
@@ -2,8 +2,7 @@ from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit
 from PyQt5.QtCore import Qt
 from PyQt5.QtSvg import QSvgWidget
 import re
-import pickle
-from core.Hashing import Hashing
+from core.Credentials import Credentials
 import os
 
 class RegistrationWidget(QWidget):
@@ -87,7 +86,7 @@ class RegistrationWidget(QWidget):
         right_column_layout.setAlignment(Qt.AlignTop)
         self.setup_form_fields(right_column_layout)
 
-        if os.path.exists(os.path.join(os.getenv('APPDATA'), 'Credentials Cacher', 'credentials.bin')):
+        if Credentials.exists(self.db):
             self.setup_return_to_login_button(right_column_layout)
         self.setup_register_button(right_column_layout)
 
@@ -180,8 +179,7 @@ class RegistrationWidget(QWidget):
 
         # Attempt to save credentials and notify the user
         try:
-            hashed_password = Hashing.hash_password(password)
-            self.save_credentials(username, hashed_password)
+            self.save_credentials(username, password)
             QMessageBox.information(self, "Registration Successful", "You have been successfully registered.")
             self.db.wipe_database()  # Cleanup database as needed
             self.main_window.show_login()  # Navigate back to the login screen
@@ -199,24 +197,15 @@ class RegistrationWidget(QWidget):
             return False
         return True
     
-    def save_credentials(self, username, hashed_password):
+    def save_credentials(self, username, password):
         """
-        Saves the registered user's credentials securely to a binary file.
+        Saves the registered user's credentials in the vault, with a salted verifier of the password.
 
         Args:
             username (str): The registered username.
-            hashed_password (str): The hashed password for the user.
+            password (str): The master password.
         """
-        app_data_path = os.getenv('APPDATA')
-        app_directory = os.path.join(app_data_path, 'Credentials Cacher')
-
-        if not os.path.exists(app_directory):
-            os.makedirs(app_directory)
-
-        credentials_path = os.path.join(app_directory, 'credentials.bin')
-        credentials = {'username': username, 'password': hashed_password}
-        with open(credentials_path, 'wb') as file:
-            pickle.dump(credentials, file)
+        Credentials.save(self.db, username, password)
 
     def resizeEvent(self, event):
         """
@@ -13,6 +13,9 @@ class ThemeManager(QObject):
 
     themeChanged = pyqtSignal(str)  # Signal emitting the new theme name
 
+    THEMES = ("light", "dark")
+    _stylesheetCache = {}  # Theme name -> stylesheet text, shared by every ThemeManager
+
     def __init__(self, application):
         """
         Initializes the ThemeManager with the application context to apply stylesheets.
@@ -23,8 +26,39 @@ class ThemeManager(QObject):
         super().__init__()
         self._application = application
         self._currentTheme = "light"  # Default to light theme
+        self._appliedTheme = None  # The theme whose stylesheet is currently set on the application
+        self.preloadThemes()
         self.loadAndApplyTheme()
 
+    @classmethod
+    def preloadThemes(cls):
+        """
+        Reads every theme's .qss file into memory once, so switching themes never touches the disk.
+        """
+        for themeName in cls.THEMES:
+            cls.stylesheetFor(themeName)
+
+    @classmethod
+    def stylesheetFor(cls, themeName):
+        """
+        Returns the stylesheet for a theme, reading it from disk only the first time it is requested.
+
+        Args:
+            themeName (str): The name of the theme ('light' or 'dark').
+
+        Returns:
+            str: The stylesheet text, or None if the theme file is missing.
+        """
+        if themeName not in cls._stylesheetCache:
+            base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))  # Navigate up to the project root directory
+            themePath = os.path.join(base_dir, f"resources/styles/{themeName}_theme.qss")
+            try:
+                with open(themePath, "r") as file:
+                    cls._stylesheetCache[themeName] = file.read()
+            except FileNotFoundError:
+                cls._stylesheetCache[themeName] = None
+        return cls._stylesheetCache[themeName]
+
     def loadAndApplyTheme(self):
         """
         Loads the theme setting from a settings file and applies the theme. Defaults to light theme if not specified.
@@ -61,13 +95,16 @@ class ThemeManager(QObject):
 
     def applyCurrentTheme(self):
         """
-        Applies the current theme by loading the corresponding .qss file and setting it as the application's stylesheet.
+        Applies the current theme's cached stylesheet to the application.
+
+        Setting a stylesheet makes Qt re-parse it and re-polish every widget, so this is skipped
+        when the current theme is already applied.
         """
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))  # Navigate up to the project root directory
-        themePath = os.path.join(base_dir, f"resources/styles/{self._currentTheme}_theme.qss")
-        try:
-            with open(themePath, "r") as file:
-                self._application.setStyleSheet(file.read())
-        except FileNotFoundError:
+        if self._appliedTheme == self._currentTheme:
+            return
+        stylesheet = self.stylesheetFor(self._currentTheme)
+        if stylesheet is None:
             # If the theme file is missing, do not apply any stylesheet
-            pass
+            return
+        self._application.setStyleSheet(stylesheet)
+        self._appliedTheme = self._currentTheme
@@ -1,11 +1,24 @@
 from PyQt5.QtWidgets import (
-    QWidget, QPushButton, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QScrollArea, QFormLayout, QSpacerItem, QSizePolicy, QStackedWidget, QTextEdit, QSlider, QCheckBox, QDialog, QMessageBox
+    QWidget, QPushButton, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QScrollArea, QFormLayout, QSpacerItem, QSizePolicy, QStackedWidget, QTextEdit, QSlider, QCheckBox, QDialog, QMessageBox,
+    QFileDialog, QProgressDialog, QApplication, QInputDialog, QComboBox, QListWidget, QListWidgetItem
 )
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QIntValidator  # Correct import for QIntValidator
 from .Password_Entry import PasswordEntryButton
 from core.Password_Generator import PasswordGenerator
+from core.Password_Strength import PasswordStrength
+from core.Breach_Check import BreachDatabase
+from core.Audit import VaultAudit
+from core.Attachments import AttachmentStore
+from core.Importer import PasswordImporter
+from core.Backup import VaultBackup
+from core.Sync import VaultSync
+from core.Credentials import Credentials
+from core.Database import Database
+from core.Search_Index import SearchIndex
+import os
 import json
+import logging
 from core.utils import get_settings_path
 from .Options import OptionsDialog
 from ui.ClickableLineEdit import ClickableLineEdit
@@ -21,6 +34,7 @@ class VaultWidget(QWidget):
     VAULT_VIEW_INDEX = 0
     ADD_PASSWORD_FORM_INDEX = 1
     PASSWORD_GENERATOR_FORM_INDEX = 2
+    SEARCH_LIMIT = 200  # Most search results listed
 
     def __init__(self, db, settings, themeManager, mainWindow, parent=None):
         """
@@ -42,6 +56,10 @@ class VaultWidget(QWidget):
         self.encryption_key = None  # Encryption key for encrypting/decrypting entries
         self.currentMode = 'all'  # Default mode for displaying entries
         self.current_edit_id = None  # Track the ID of the entry being edited, None for adding new
+        self.breachDatabase = None  # Local breach database, opened on first use
+        self.breachDatabaseError = None  # Why the breach database last failed to open, as the user was told
+        self.selectedEntryId = None  # Track the ID of the entry shown in the details column
+        self.searchIndex = None  # Search index over the decrypted entries, built on first search after unlocking
         self.initUI()
 
     def set_encryption_key(self, key):
@@ -51,6 +69,9 @@ class VaultWidget(QWidget):
         :param key: The encryption key used for decrypting password entries.
         """
         self.encryption_key = key
+        if self.searchIndex is not None:
+            self.searchIndex.clear()
+            self.searchIndex = None
         if key is not None:
             self.populate_vault()
 
@@ -163,6 +184,40 @@ class VaultWidget(QWidget):
         passwordGeneratorButton.clicked.connect(self.showPasswordGeneratorForm)
         self.leftColumnLayout.addWidget(passwordGeneratorButton)
 
+        # Button to import passwords exported from another password manager
+        importPasswordsButton = QPushButton("Import Passwords")
+        importPasswordsButton.clicked.connect(self.import_passwords)
+        self.leftColumnLayout.addWidget(importPasswordsButton)
+
+        # Buttons to write an encrypted backup of the vault and to restore one
+        exportBackupButton = QPushButton("Export Backup")
+        exportBackupButton.clicked.connect(self.export_backup)
+        self.leftColumnLayout.addWidget(exportBackupButton)
+
+        restoreBackupButton = QPushButton("Restore Backup")
+        restoreBackupButton.clicked.connect(self.restore_backup)
+        self.leftColumnLayout.addWidget(restoreBackupButton)
+
+        # Button to merge this vault with a copy of the vault file from another machine
+        syncVaultButton = QPushButton("Sync Vault File")
+        syncVaultButton.clicked.connect(self.sync_vault_file)
+        self.leftColumnLayout.addWidget(syncVaultButton)
+
+        # Button to look up every stored password in the local breach database
+        checkBreachesButton = QPushButton("Check Breaches")
+        checkBreachesButton.clicked.connect(self.check_vault_breaches)
+        self.leftColumnLayout.addWidget(checkBreachesButton)
+
+        # Button to report reused, weak, stale and breached passwords
+        auditButton = QPushButton("Security Audit")
+        auditButton.clicked.connect(self.run_security_audit)
+        self.leftColumnLayout.addWidget(auditButton)
+
+        # Button to change the master password, optionally re-encrypting the vault under a new key
+        changePasswordButton = QPushButton("Change Master Password")
+        changePasswordButton.clicked.connect(self.change_master_password)
+        self.leftColumnLayout.addWidget(changePasswordButton)
+
         self.leftColumnLayout.addSpacerItem(QSpacerItem(20, 40, QSizePolicy.Minimum, QSizePolicy.Expanding))
 
         # Button to add a new password entry
@@ -246,6 +301,18 @@ class VaultWidget(QWidget):
         self.rightColumnLayout.addLayout(passwordRowLayout)
         self.rightColumnLayout.addLayout(sitenameRowLayout)
         self.rightColumnLayout.addWidget(self.lastUpdatedLabel)
+
+        # Button to list the previous passwords of the selected entry
+        self.historyButton = QPushButton("Password History")
+        self.historyButton.setEnabled(False)
+        self.historyButton.clicked.connect(self.show_password_history)
+        self.rightColumnLayout.addWidget(self.historyButton)
+
+        # Button to manage the files attached to the selected entry
+        self.attachmentsButton = QPushButton("Attachments")
+        self.attachmentsButton.setEnabled(False)
+        self.attachmentsButton.clicked.connect(self.manage_attachments)
+        self.rightColumnLayout.addWidget(self.attachmentsButton)
         self.rightColumnLayout.addLayout(notesLayout)
 
     def setupNotesSection(self):
@@ -312,6 +379,9 @@ class VaultWidget(QWidget):
         formLayout.addRow("Website URL", self.website_url_entry)
         formLayout.addRow("Username", self.username_entry)
         formLayout.addRow("Password", self.password_entry)
+        self.passwordStrengthLabel = QLabel("")  # Live strength feedback for the password being typed
+        self.password_entry.textChanged.connect(lambda text: self.update_strength_label(self.passwordStrengthLabel, text))
+        formLayout.addRow("", self.passwordStrengthLabel)
         formLayout.addRow("Notes", self.notes_entry)
         formLayout.addRow(self.submit_button)
 
@@ -354,6 +424,22 @@ class VaultWidget(QWidget):
         self.generatedPasswordDisplay = QLineEdit()  # Display generated password
         self.generatedPasswordDisplay.setReadOnly(True)  # Make display read-only
         generatorLayout.addWidget(self.generatedPasswordDisplay)
+        self.generatedStrengthLabel = QLabel("")  # Strength of the generated password
+        generatorLayout.addWidget(self.generatedStrengthLabel)
+
+        # Choice between a character password and a diceware-style passphrase
+        generatorModeLayout = QHBoxLayout()
+        generatorModeLayout.addWidget(QLabel("Generate: "))
+        self.generatorModeComboBox = QComboBox()
+        self.generatorModeComboBox.addItems(["Password", "Passphrase"])
+        self.generatorModeComboBox.currentTextChanged.connect(self.update_generator_mode)
+        generatorModeLayout.addWidget(self.generatorModeComboBox)
+        generatorLayout.addLayout(generatorModeLayout)
+
+        # Options for character passwords, shown in password mode
+        self.passwordOptionsWidget = QWidget()
+        passwordOptionsLayout = QVBoxLayout(self.passwordOptionsWidget)
+        passwordOptionsLayout.setContentsMargins(0, 0, 0, 0)
 
         # Label and slider for password length
         passwordLengthLayout = QHBoxLayout()
@@ -366,15 +452,15 @@ class VaultWidget(QWidget):
         passwordLengthLayout.addWidget(passwordLengthLabel)
         passwordLengthLayout.addWidget(self.lengthSlider)
         passwordLengthLayout.addWidget(self.lengthSliderLabel)
-        generatorLayout.addLayout(passwordLengthLayout)
+        passwordOptionsLayout.addLayout(passwordLengthLayout)
 
         # Checkboxes for password criteria
         self.includeUppercaseCheckbox = QCheckBox("Include uppercase letters")
-        generatorLayout.addWidget(self.includeUppercaseCheckbox)
+        passwordOptionsLayout.addWidget(self.includeUppercaseCheckbox)
         self.includeSpecialCharsCheckbox = QCheckBox("Include special characters")
-        generatorLayout.addWidget(self.includeSpecialCharsCheckbox)
+        passwordOptionsLayout.addWidget(self.includeSpecialCharsCheckbox)
         self.includeNumbersCheckbox = QCheckBox("Include numbers")
-        generatorLayout.addWidget(self.includeNumbersCheckbox)
+        passwordOptionsLayout.addWidget(self.includeNumbersCheckbox)
         
         # Checkboxes are set to True by default
         self.includeUppercaseCheckbox.setChecked(True)
@@ -393,7 +479,39 @@ class VaultWidget(QWidget):
         numbersAndSpecialCharsLayout.addWidget(self.specialCharsCountEdit)
         numbersAndSpecialCharsLayout.addWidget(QLabel("Numbers amount:"))
         numbersAndSpecialCharsLayout.addWidget(self.numbersCountEdit)
-        generatorLayout.addLayout(numbersAndSpecialCharsLayout)
+        passwordOptionsLayout.addLayout(numbersAndSpecialCharsLayout)
+
+        generatorLayout.addWidget(self.passwordOptionsWidget)
+
+        # Options for passphrases, shown in passphrase mode
+        self.passphraseOptionsWidget = QWidget()
+        passphraseOptionsLayout = QVBoxLayout(self.passphraseOptionsWidget)
+        passphraseOptionsLayout.setContentsMargins(0, 0, 0, 0)
+        wordCountLayout = QHBoxLayout()
+        self.wordCountSliderLabel = QLabel("6")
+        self.wordCountSlider = QSlider(Qt.Horizontal)  # Slider to select the number of words
+        self.wordCountSlider.setMinimum(3)
+        self.wordCountSlider.setMaximum(12)
+        self.wordCountSlider.setValue(6)
+        self.wordCountSlider.valueChanged.connect(lambda value: self.wordCountSliderLabel.setText(str(value)))
+        wordCountLayout.addWidget(QLabel("Number of words: "))
+        wordCountLayout.addWidget(self.wordCountSlider)
+        wordCountLayout.addWidget(self.wordCountSliderLabel)
+        passphraseOptionsLayout.addLayout(wordCountLayout)
+
+        separatorAndCaseLayout = QHBoxLayout()
+        self.separatorEdit = QLineEdit()
+        self.separatorEdit.setText("-")
+        self.separatorEdit.setMaxLength(3)
+        self.capitalizationComboBox = QComboBox()
+        self.capitalizationComboBox.addItems(["lowercase", "Title Case", "UPPERCASE", "One word in UPPERCASE"])
+        separatorAndCaseLayout.addWidget(QLabel("Separator:"))
+        separatorAndCaseLayout.addWidget(self.separatorEdit)
+        separatorAndCaseLayout.addWidget(QLabel("Capitalization:"))
+        separatorAndCaseLayout.addWidget(self.capitalizationComboBox)
+        passphraseOptionsLayout.addLayout(separatorAndCaseLayout)
+        self.passphraseOptionsWidget.setVisible(False)
+        generatorLayout.addWidget(self.passphraseOptionsWidget)
 
         # Button to trigger password generation
         self.generateButton = QPushButton("Generate Password")
@@ -485,6 +603,16 @@ class VaultWidget(QWidget):
             QMessageBox.warning(self, "Missing Data", error_message)
             return  # Stop further processing
 
+        # Warn before saving a password that appears in the local breach database
+        breach_count = self.breach_count(password)
+        if breach_count:
+            answer = QMessageBox.question(
+                self, "Breached Password",
+                f"This password has appeared {breach_count:,} times in known data breaches. Save it anyway?",
+                QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if answer != QMessageBox.Yes:
+                return
+
         # Ensure that the encryption key is available before proceeding
         if self.encryption_key is not None:
             try:
@@ -513,6 +641,353 @@ class VaultWidget(QWidget):
 
 
 
+    def breach_database(self):
+        """
+        Returns the local breach database, opening it on first use.
+
+        Returns:
+            BreachDatabase: The breach database, or None if none has been installed or it cannot be opened. The
+                user is told when it cannot be opened, once per error.
+        """
+        if self.breachDatabase is None:
+            try:
+                self.breachDatabase = BreachDatabase.open_default()
+                self.breachDatabaseError = None
+            except ValueError as e:
+                if str(e) != self.breachDatabaseError:
+                    logging.warning(f"Breach database unavailable: {e}")
+                    self.breachDatabaseError = str(e)
+                    self.show_breach_database_error()
+        return self.breachDatabase
+
+    def show_breach_database_error(self):
+        """
+        Tells the user that the breach database could not be opened.
+        """
+        QMessageBox.warning(
+            self, "Breach Database Unavailable",
+            f"The breach database at {BreachDatabase.get_default_path()} could not be opened: {self.breachDatabaseError}\n\n"
+            f"Passwords are not checked against known breaches until it is replaced.")
+
+    def breach_count(self, password):
+        """
+        Looks up a password in the local breach database.
+
+        Args:
+            password (str): The password to check.
+
+        Returns:
+            int: The number of times the password was seen in breaches, or 0 if it was not or there is no breach database.
+        """
+        breach_database = self.breach_database()
+        return breach_database.count(password) if breach_database is not None else 0
+
+    def check_vault_breaches(self):
+        """
+        Checks every password in the vault against the local breach database and lists the entries whose
+        passwords were found.
+        """
+        self.mainWindow.resetAutoLockTimer()  # Reset the auto-lock timer with user interaction.
+        if self.encryption_key is None:
+            QMessageBox.warning(self, "Encryption Key Missing", "Encryption key is not available. Cannot check the vault.")
+            return
+        previous_error = self.breachDatabaseError
+        breach_database = self.breach_database()
+        if breach_database is None and self.breachDatabaseError is not None:
+            if self.breachDatabaseError == previous_error:
+                self.show_breach_database_error()  # Not shown by breach_database, as the user was told before.
+            return
+        if breach_database is None:
+            QMessageBox.information(
+                self, "No Breach Database",
+                f"No breach database was found. Convert a Have I Been Pwned SHA-1 dump with 'Cli.py breach-convert' "
+                f"and save it as:\n{BreachDatabase.get_default_path()}")
+            return
+
+        entries = list(self.db.iter_entries(self.encryption_key))
+        counts = breach_database.check_many(entry[4] for entry in entries)
+        breached = [f"{entry[1]} ({entry[3]}): seen {count:,} times" for entry, count in zip(entries, counts) if count]
+        if breached:
+            QMessageBox.warning(self, "Breached Passwords", f"{len(breached)} of {len(entries)} passwords appear in known breaches:\n\n" + "\n".join(breached))
+        else:
+            QMessageBox.information(self, "Breached Passwords", f"None of the {len(entries)} passwords appear in the breach database.")
+
+    def run_security_audit(self):
+        """
+        Audits the whole vault and shows a summary, with the affected entries listed in the details.
+        Entries unchanged since the last audit are not decrypted again.
+        """
+        self.mainWindow.resetAutoLockTimer()  # Reset the auto-lock timer with user interaction.
+        if self.encryption_key is None:
+            QMessageBox.warning(self, "Encryption Key Missing", "Encryption key is not available. Cannot audit the vault.")
+            return
+
+        progressDialog = QProgressDialog("Auditing passwords...", None, 0, 1000, self)
+        progressDialog.setWindowModality(Qt.WindowModal)
+        progressDialog.setMinimumDuration(500)
+
+        def on_progress(done, total):
+            progressDialog.setValue(int(done * 1000 / total))
+            self.mainWindow.resetAutoLockTimer()
+            QApplication.processEvents()
+
+        try:
+            report = VaultAudit(self.db, self.encryption_key).run(progress_callback=on_progress)
+        except Exception as e:
+            progressDialog.close()
+            QMessageBox.critical(self, "Audit Failed", f"Failed to audit the vault: {e}")
+            return
+        progressDialog.close()
+
+        # Only the flagged entries are decrypted to name them.
+        flagged_ids = {entry_id for group in report['reused'] for entry_id in group}
+        flagged_ids.update(item['id'] for key in ('weak', 'stale', 'breached') for item in report[key])
+        names = {entry[0]: f"{entry[1]} ({entry[3]})" for entry in self.db.fetch_entries_by_ids(sorted(flagged_ids), self.encryption_key)}
+
+        details = []
+        for group in report['reused']:
+            details.append("Same password: " + ", ".join(names[entry_id] for entry_id in group))
+        details.extend(f"Weak ({item['label']}): {names[item['id']]}" for item in report['weak'])
+        details.extend(f"Breached ({item['breach_count']:,} times): {names[item['id']]}" for item in report['breached'])
+        details.extend(f"Not changed since {item['updated_at'][:10]}: {names[item['id']]}" for item in report['stale'])
+
+        summary = (f"Audited {report['entries']} entries.\n\n"
+                   f"Reused passwords: {sum(len(group) for group in report['reused'])} entries in {len(report['reused'])} groups\n"
+                   f"Weak passwords: {len(report['weak'])}\n"
+                   f"Breached passwords: {len(report['breached'])}\n"
+                   f"Not changed for over a year: {len(report['stale'])}")
+        messageBox = QMessageBox(QMessageBox.Warning if details else QMessageBox.Information, "Security Audit", summary, QMessageBox.Ok, self)
+        if details:
+            messageBox.setDetailedText("\n".join(details))
+        messageBox.exec_()
+
+    def change_master_password(self):
+        """
+        Asks for the current and a new master password and changes it. The vault can also be re-encrypted
+        under a new data key, with progress shown; an interrupted re-encryption is finished at the next login.
+        """
+        self.mainWindow.resetAutoLockTimer()  # Reset the auto-lock timer with user interaction.
+        if self.encryption_key is None:
+            QMessageBox.warning(self, "Encryption Key Missing", "Encryption key is not available. Cannot change the master password.")
+            return
+
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Change Master Password")
+        layout = QFormLayout(dialog)
+        oldPasswordEntry, newPasswordEntry, confirmPasswordEntry = QLineEdit(), QLineEdit(), QLineEdit()
+        for label, entry in (("Current password:", oldPasswordEntry), ("New password:", newPasswordEntry),
+                             ("Confirm new password:", confirmPasswordEntry)):
+            entry.setEchoMode(QLineEdit.Password)
+            layout.addRow(label, entry)
+        rotateCheckbox = QCheckBox("Also re-encrypt every entry under a new data key")
+        layout.addRow(rotateCheckbox)
+        buttonLayout = QHBoxLayout()
+        for label, handler in (("Change", dialog.accept), ("Cancel", dialog.reject)):
+            button = QPushButton(label)
+            button.clicked.connect(handler)
+            buttonLayout.addWidget(button)
+        layout.addRow(buttonLayout)
+        if dialog.exec_() != QDialog.Accepted:
+            return
+
+        new_password = newPasswordEntry.text()
+        if new_password != confirmPasswordEntry.text():
+            QMessageBox.warning(self, "Change Master Password", "The new passwords do not match.")
+            return
+        if not self.mainWindow.registration_widget.validate_password(new_password):
+            QMessageBox.warning(self, "Change Master Password", "The new password does not meet the requirements.")
+            return
+
+        progressDialog = QProgressDialog("Re-encrypting the vault...", None, 0, 1000, self)
+        progressDialog.setWindowModality(Qt.WindowModal)
+        progressDialog.setMinimumDuration(500)
+
+        def on_progress(done, total):
+            progressDialog.setValue(int(done * 1000 / total))
+            self.mainWindow.resetAutoLockTimer()
+            QApplication.processEvents()
+
+        try:
+            username = Credentials.load(self.db)['username']
+            encryption_key = Credentials.change_password(self.db, username, oldPasswordEntry.text(), new_password,
+                                                         rotate_data_key=rotateCheckbox.isChecked(), progress_callback=on_progress)
+        except Exception as e:
+            progressDialog.close()
+            QMessageBox.critical(self, "Change Master Password", f"Failed to change the master password: {e}")
+            return
+        progressDialog.close()
+        self.mainWindow.set_encryption_key(encryption_key)
+        QMessageBox.information(self, "Change Master Password", "The master password has been changed.")
+
+    def import_passwords(self):
+        """
+        Imports entries from a CSV or Bitwarden JSON export chosen by the user, showing progress while
+        the file is streamed into the vault.
+        """
+        self.mainWindow.resetAutoLockTimer()  # Reset the auto-lock timer with user interaction.
+        if self.encryption_key is None:
+            QMessageBox.warning(self, "Encryption Key Missing", "Encryption key is not available. Cannot import entries.")
+            return
+
+        path, _ = QFileDialog.getOpenFileName(self, "Import Passwords", "", "Password exports (*.csv *.json)")
+        if not path:
+            return
+
+        progressDialog = QProgressDialog("Importing passwords...", None, 0, 1000, self)
+        progressDialog.setWindowModality(Qt.WindowModal)
+        progressDialog.setMinimumDuration(500)
+
+        def on_progress(rows, bytes_read, total_bytes):
+            # The dialog tracks bytes read, scaled to a fixed range so very large files do not overflow it.
+            progressDialog.setValue(int(bytes_read * 1000 / total_bytes) if total_bytes else 1000)
+            progressDialog.setLabelText(f"Importing passwords... {rows} rows processed")
+            self.mainWindow.resetAutoLockTimer()
+            QApplication.processEvents()
+
+        try:
+            importer = PasswordImporter(self.db, self.encryption_key, progress_callback=on_progress)
+            imported, skipped = importer.import_file(path)
+        except Exception as e:
+            progressDialog.close()
+            QMessageBox.critical(self, "Import Failed", f"Failed to import passwords: {e}")
+            self.populate_vault()
+            return
+
+        progressDialog.close()
+        self.populate_vault()
+        QMessageBox.information(self, "Import Complete", f"Imported {imported} entries. Skipped {skipped} rows without a username or password.")
+
+    def prompt_backup_password(self, confirm):
+        """
+        Asks the user for the password protecting a backup archive.
+
+        Args:
+            confirm (bool): Whether to ask for the password twice, as when creating a backup.
+
+        Returns:
+            str: The password, or None if the user cancelled or the passwords did not match.
+        """
+        password, ok = QInputDialog.getText(self, "Backup Password", "Backup password:", QLineEdit.Password)
+        if not ok or not password:
+            return None
+        if confirm:
+            confirmation, ok = QInputDialog.getText(self, "Backup Password", "Confirm backup password:", QLineEdit.Password)
+            if not ok:
+                return None
+            if confirmation != password:
+                QMessageBox.warning(self, "Backup Password", "The passwords do not match.")
+                return None
+        return password
+
+    def export_backup(self):
+        """
+        Writes every vault entry to an encrypted backup archive chosen by the user.
+        """
+        self.mainWindow.resetAutoLockTimer()  # Reset the auto-lock timer with user interaction.
+        if self.encryption_key is None:
+            QMessageBox.warning(self, "Encryption Key Missing", "Encryption key is not available. Cannot export the vault.")
+            return
+
+        path, _ = QFileDialog.getSaveFileName(self, "Export Backup", "vault_backup.ccbak", "Vault backups (*.ccbak)")
+        if not path:
+            return
+        password = self.prompt_backup_password(confirm=True)
+        if password is None:
+            return
+
+        try:
+            count = VaultBackup(self.db, self.encryption_key, progress_callback=self.on_backup_progress).export_vault(path, password)
+        except Exception as e:
+            QMessageBox.critical(self, "Export Failed", f"Failed to export the vault: {e}")
+            return
+        QMessageBox.information(self, "Export Complete", f"Exported {count} entries.")
+
+    def restore_backup(self):
+        """
+        Restores the entries of an encrypted backup archive chosen by the user, optionally replacing the current vault.
+        """
+        self.mainWindow.resetAutoLockTimer()  # Reset the auto-lock timer with user interaction.
+        if self.encryption_key is None:
+            QMessageBox.warning(self, "Encryption Key Missing", "Encryption key is not available. Cannot restore a backup.")
+            return
+
+        path, _ = QFileDialog.getOpenFileName(self, "Restore Backup", "", "Vault backups (*.ccbak)")
+        if not path:
+            return
+        password = self.prompt_backup_password(confirm=False)
+        if password is None:
+            return
+
+        answer = QMessageBox.question(
+            self, "Restore Backup",
+            "Replace the current vault with the backup?\n\nChoose No to add the backup's entries to the current vault.",
+            QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel, QMessageBox.No)
+        if answer == QMessageBox.Cancel:
+            return
+
+        try:
+            count = VaultBackup(self.db, self.encryption_key, progress_callback=self.on_backup_progress).restore_vault(
+                path, password, wipe_existing=answer == QMessageBox.Yes)
+        except Exception as e:
+            QMessageBox.critical(self, "Restore Failed", f"Failed to restore the backup: {e}")
+            return
+        self.populate_vault()
+        QMessageBox.information(self, "Restore Complete", f"Restored {count} entries.")
+
+    def sync_vault_file(self):
+        """
+        Merges the vault with another vault file chosen by the user, so that both hold the same entries.
+        Unless the other vault is a copy of this one, its master password is asked for.
+        """
+        self.mainWindow.resetAutoLockTimer()  # Reset the auto-lock timer with user interaction.
+        if self.encryption_key is None:
+            QMessageBox.warning(self, "Encryption Key Missing", "Encryption key is not available. Cannot sync the vault.")
+            return
+
+        path, _ = QFileDialog.getOpenFileName(self, "Sync Vault File", "", "Vault files (*.db)")
+        if not path:
+            return
+
+        # Copies of this vault share its wrapped data key. Any other vault is unlocked with its own master password.
+        remote_key = None
+        try:
+            remote_db = Database.inspect(path)  # Refuses a vault without a salt, which no password could unlock.
+            remote_db.upgrade()
+        except Exception as e:
+            QMessageBox.critical(self, "Sync Failed", f"Failed to open the vault file: {e}")
+            return
+        try:
+            remote_wrapped_key = remote_db.wrapped_data_key()
+            if remote_wrapped_key is None or remote_wrapped_key != self.db.wrapped_data_key():
+                password, ok = QInputDialog.getText(self, "Sync Vault File", "Master password of the other vault:", QLineEdit.Password)
+                if not ok or not password:
+                    return
+                try:
+                    remote_key = remote_db.unwrap_data_key(Credentials.derive_master_key(remote_db, password))
+                except ValueError:
+                    QMessageBox.warning(self, "Sync Failed", "The password does not unlock the other vault.")
+                    return
+        finally:
+            remote_db.close_connection()
+
+        try:
+            report = VaultSync(self.db, self.encryption_key, path, remote_key).sync()
+        except Exception as e:
+            QMessageBox.critical(self, "Sync Failed", f"Failed to sync with the vault file: {e}")
+            return
+        self.populate_vault()
+        QMessageBox.information(
+            self, "Sync Complete",
+            f"Received {report['pulled']} and sent {report['pushed']} entries.\n"
+            f"Deleted {report['deleted_local']} entries here and {report['deleted_remote']} in the other vault.\n"
+            f"Resolved {len(report['conflicts'])} conflicting edits in favour of this vault.")
+
+    def on_backup_progress(self, count):
+        """
+        Keeps the auto-lock timer from firing while a backup is written or restored.
+        """
+        self.mainWindow.resetAutoLockTimer()
+
     def clear_form_fields(self):
         """
         Clears all input fields in the add or edit password form. This method is typically
@@ -556,7 +1031,9 @@ class VaultWidget(QWidget):
             elif self.currentMode == 'alphabetical':
                 entries = sorted(self.db.fetch_all_entries(self.encryption_key), key=lambda x: x[1].lower())
             elif self.currentMode == 'lastUpdated':
-                entries = sorted(self.db.fetch_all_entries(self.encryption_key), key=lambda x: x[7], reverse=True)
+                # updated_at only has one-second resolution, so the revision breaks ties between recent edits.
+                revisions = self.db.fetch_entry_revisions()
+                entries = sorted(self.db.fetch_all_entries(self.encryption_key), key=lambda x: (x[8], revisions[x[0]][1]), reverse=True)
 
         # Display each entry as a button in the vault view.
         for entry in entries:
@@ -575,16 +1052,20 @@ class VaultWidget(QWidget):
 
     def search_vault(self):
         """
-        Performs a search operation in the vault. Filters entries by the search query provided
-        in the search input field and displays matching entries.
+        Performs a search operation in the vault. Displays the entries matching the search query provided
+        in the search input field by name, URL host or username, allowing for typos, best match first (see
+        SearchIndex). An empty query shows the vault in the current mode again.
 
         This method also resets the auto-lock timer with each search operation.
         """
         self.mainWindow.resetAutoLockTimer()
-        search_query = self.searchLineEdit.text().lower()
-        all_entries = self.db.fetch_all_entries(self.encryption_key)
-        filtered_entries = [entry for entry in all_entries if search_query in entry[1].lower()]
-        self.populate_vault(filtered_entries)
+        search_query = self.searchLineEdit.text()
+        if not search_query.strip():
+            self.populate_vault()
+            return
+        if self.searchIndex is None:
+            self.searchIndex = SearchIndex(self.db, self.encryption_key)
+        self.populate_vault(self.searchIndex.search(search_query, limit=self.SEARCH_LIMIT))
 
     def display_entry_details(self, entry_data, button):
         """
@@ -608,6 +1089,100 @@ class VaultWidget(QWidget):
         self.passwordLineEdit.setText(entry_data[4] if len(entry_data) > 4 else "")
         self.notesTextEdit.setText(entry_data[5] if len(entry_data) > 5 else "")
         self.lastUpdatedLabel.setText(f"Last Updated: {entry_data[8]}" if len(entry_data) > 8 else "")
+        self.selectedEntryId = entry_data[0]
+        self.historyButton.setEnabled(True)
+        self.attachmentsButton.setEnabled(True)
+
+    def show_password_history(self):
+        """
+        Lists the previous values of the selected entry's changed fields, newest first, so a rotated-away
+        password can be recovered.
+        """
+        self.mainWindow.resetAutoLockTimer()  # Reset the auto-lock timer with user interaction.
+        if self.selectedEntryId is None or self.encryption_key is None:
+            return
+        history = self.db.fetch_password_history(self.selectedEntryId, self.encryption_key)
+        if not history:
+            QMessageBox.information(self, "Password History", "This entry has no earlier versions.")
+            return
+
+        labels = {'website_name': "Name", 'website_url': "Website", 'username': "Username", 'password': "Password", 'notes': "Notes"}
+        lines = []
+        for version in history:
+            lines.append(f"Replaced {version['replaced_at']}:")
+            lines.extend(f"    {labels[field]}: {value}" for field, value in version.items() if field != 'replaced_at')
+        passwords = sum('password' in version for version in history)
+        messageBox = QMessageBox(QMessageBox.Information, "Password History",
+                                 f"{len(history)} earlier versions, {passwords} with a different password.", QMessageBox.Ok, self)
+        messageBox.setDetailedText("\n".join(lines))
+        messageBox.exec_()
+
+    def manage_attachments(self):
+        """
+        Opens a dialog listing the selected entry's attachments, with buttons to attach a file, save an
+        attachment to disk and remove one.
+        """
+        self.mainWindow.resetAutoLockTimer()  # Reset the auto-lock timer with user interaction.
+        if self.selectedEntryId is None or self.encryption_key is None:
+            return
+        store = AttachmentStore(self.db, self.encryption_key)
+        entry_id = self.selectedEntryId
+
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Attachments")
+        layout = QVBoxLayout(dialog)
+        attachmentList = QListWidget()
+        layout.addWidget(attachmentList)
+        buttonLayout = QHBoxLayout()
+        layout.addLayout(buttonLayout)
+
+        def refresh():
+            attachmentList.clear()
+            for attachment in store.list(entry_id):
+                item = QListWidgetItem(f"{attachment['name']} ({attachment['size']:,} bytes)")
+                item.setData(Qt.UserRole, attachment)
+                attachmentList.addItem(item)
+
+        def selected_attachment():
+            item = attachmentList.currentItem()
+            return item.data(Qt.UserRole) if item is not None else None
+
+        def attach():
+            self.mainWindow.resetAutoLockTimer()
+            path, _ = QFileDialog.getOpenFileName(dialog, "Attach File")
+            if path:
+                try:
+                    store.add(entry_id, path)
+                except (OSError, ValueError) as e:
+                    QMessageBox.critical(dialog, "Attach Failed", f"Failed to attach the file: {e}")
+                refresh()
+
+        def save():
+            self.mainWindow.resetAutoLockTimer()
+            attachment = selected_attachment()
+            if attachment is None:
+                return
+            path, _ = QFileDialog.getSaveFileName(dialog, "Save Attachment", attachment['name'])
+            if path:
+                try:
+                    store.save(attachment['id'], path)
+                except (OSError, ValueError) as e:
+                    QMessageBox.critical(dialog, "Save Failed", f"Failed to save the attachment: {e}")
+
+        def remove():
+            self.mainWindow.resetAutoLockTimer()
+            attachment = selected_attachment()
+            if attachment is not None and QMessageBox.question(
+                    dialog, "Remove Attachment", f"Remove {attachment['name']} from this entry?") == QMessageBox.Yes:
+                store.delete(attachment['id'])
+                refresh()
+
+        for label, handler in (("Attach File", attach), ("Save As", save), ("Remove", remove)):
+            button = QPushButton(label)
+            button.clicked.connect(handler)
+            buttonLayout.addWidget(button)
+        refresh()
+        dialog.exec_()
 
     def adjustButtonWidth(self):
         """
@@ -789,6 +1364,8 @@ class VaultWidget(QWidget):
         """
         self.settings = OptionsDialog.load_or_create_settings()  # Reload settings in case they were updated.
         self.applyPasswordVisibility()  # Apply password visibility settings.
+        self.mainWindow.settings.update(self.settings)
+        self.mainWindow.startAutofillBridge()  # Started, stopped or restarted to follow the autofill settings.
 
     def showAddPasswordForm(self):
         """
@@ -814,11 +1391,29 @@ class VaultWidget(QWidget):
         """
         self.generateButton.clicked.connect(self.generate_password_button_clicked)
         
+    def update_generator_mode(self, mode):
+        """
+        Shows the options for the selected generator mode.
+
+        Args:
+            mode (str): 'Password' or 'Passphrase'.
+        """
+        self.passwordOptionsWidget.setVisible(mode == "Password")
+        self.passphraseOptionsWidget.setVisible(mode == "Passphrase")
+        self.generateButton.setText(f"Generate {mode}")
+
     def generate_password_button_clicked(self):
         """
         Handles the "Generate Password" button click. Validates inputs, generates a password
         or displays an error message.
         """
+        self.mainWindow.resetAutoLockTimer()  # Reset the auto-lock timer with user interaction.
+        if self.generatorModeComboBox.currentText() == "Passphrase":
+            capitalization = ('lower', 'title', 'upper', 'one')[self.capitalizationComboBox.currentIndex()]
+            passphrase = PasswordGenerator.generate_passphrase(self.wordCountSlider.value(), self.separatorEdit.text(), capitalization)
+            self.displayPasswordOutput(passphrase, isError=False)
+            return
+
         # Assume you've gathered all the necessary inputs from the form here
         # For demonstration, these variables are placeholders
         length = self.lengthSlider.value()
@@ -852,4 +1447,22 @@ class VaultWidget(QWidget):
 
         # Apply the determined text color
         self.generatedPasswordDisplay.setStyleSheet(f"color: {textColor};")
-        self.generatedPasswordDisplay.setText(message)
\ No newline at end of file
+        self.generatedPasswordDisplay.setText(message)
+        self.update_strength_label(self.generatedStrengthLabel, "" if isError else message)
+
+    def update_strength_label(self, label, password):
+        """
+        Shows the estimated strength of a password in a label, or clears the label for an empty password.
+
+        Args:
+            label (QLabel): The label to update.
+            password (str): The password to score.
+        """
+        if not password:
+            label.setText("")
+            return
+        strength = PasswordStrength.estimate(password)
+        text = f"Strength: {strength['label']} (~{strength['entropy']:.0f} bits)"
+        if strength['warnings']:
+            text += f" - {', '.join(strength['warnings'])}"
+        label.setText(text)
\ No newline at end of file
@@ -1,10 +1,10 @@
-from PyQt5.QtWidgets import QMainWindow, QApplication, QStackedWidget
+from PyQt5.QtWidgets import QMainWindow, QApplication, QStackedWidget, QMessageBox
 from PyQt5.QtCore import QTimer
 from .Login import LoginWidget
 from .Vault_Window import VaultWidget
 from .Registration import RegistrationWidget
-import os
-import pickle
+from core.Credentials import Credentials
+from core.Autofill_Bridge import AutofillBridge
 
 class MainWindow(QMainWindow):
     """
@@ -15,6 +15,7 @@ class MainWindow(QMainWindow):
         settings: Application settings such as theme and auto-lock configurations.
         themeManager: Manages theme changes across the application.
         encryption_key: Key used for encrypting and decrypting the vault's content.
+        autofillBridge: The bridge answering browser extensions while the vault is unlocked, or None.
     """
     
     def __init__(self, db, settings, themeManager):
@@ -31,6 +32,7 @@ class MainWindow(QMainWindow):
         self.settings = settings
         self.themeManager = themeManager
         self.encryption_key = None
+        self.autofillBridge = None
         
         self.setupAutoLockTimer()
         self.initializeUI()
@@ -78,9 +80,8 @@ class MainWindow(QMainWindow):
         self.stacked_widgets.setCurrentWidget(next_widget)
 
     def check_credentials_exist(self):
-        """Checks if the credentials file exists and contains data."""
-        credentials_path = os.path.join(os.getenv('APPDATA'), 'Credentials Cacher', 'credentials.bin')
-        return os.path.exists(credentials_path) and os.path.getsize(credentials_path) > 0
+        """Checks if master credentials have been registered."""
+        return Credentials.exists(self.db)
 
     
     def set_encryption_key(self, key):
@@ -92,14 +93,38 @@ class MainWindow(QMainWindow):
         """
         self.encryption_key = key
         self.vault_widget.set_encryption_key(key)
+        self.startAutofillBridge()
 
     def clear_encryption_key(self):
         """
         Clears the current encryption key from the session and notifies the vault widget to do the same.
+        The autofill bridge is stopped first, so logging out and the auto-lock timer both shut it down.
         """
+        self.stopAutofillBridge()
         self.encryption_key = None
         self.vault_widget.set_encryption_key(None)
 
+    def startAutofillBridge(self):
+        """
+        Starts answering browser extensions, if the bridge is enabled in the settings and an extension has been paired.
+        """
+        self.stopAutofillBridge()
+        if self.encryption_key is None or not self.settings.get("autofill_bridge_enabled", False) or not AutofillBridge.is_paired(self.db):
+            return
+        bridge = AutofillBridge(self.db.db_path, self.encryption_key, self.settings.get("autofill_bridge_port", AutofillBridge.DEFAULT_PORT))
+        try:
+            bridge.start()
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Autofill Bridge", f"Browser extensions cannot be answered: {e}")
+            return
+        self.autofillBridge = bridge
+
+    def stopAutofillBridge(self):
+        """Stops answering browser extensions."""
+        if self.autofillBridge is not None:
+            self.autofillBridge.stop()
+            self.autofillBridge = None
+
     def closeEvent(self, event):
         """
         Handles the event triggered when the application window is closed. Ensures that the encryption key is cleared and the database connection is closed properly.
@@ -145,6 +170,7 @@ class MainWindow(QMainWindow):
             self.setAutoLockInterval(self.settings.get("auto_lock", 5))
         else:
             self.autoLockTimer.stop()
+        self.startAutofillBridge()
 
     def show_login(self):
         """
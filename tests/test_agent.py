@@ -0,0 +1,86 @@
+import asyncio
+import os
+import threading
+import time
+import pytest
+from src.core.Agent import VaultAgent, AgentClient
+from src.core.Database import Database
+from src.core.Encryption import Encryption
+from Crypto.Random import get_random_bytes
+
+@pytest.fixture(scope="module")
+def encryption_key():
+    return Encryption.derive_key("testpassword".encode(), get_random_bytes(16))
+
+@pytest.fixture
+def running_agent(tmp_path, encryption_key):
+    """Runs an agent in its own thread, which owns the database connection as it would in the launcher."""
+    db_path = str(tmp_path / "passwords.db")
+    socket_path = str(tmp_path / "agent.sock")
+    seed = Database(db_path)
+    seed.add_password_entry("Example", "https://www.example.com/login", "alice", "secret1", "note", encryption_key)
+    seed.add_password_entry("Example Mail", "https://mail.example.com", "alice", "secret2", "", encryption_key)
+    seed.add_password_entry("Other", "https://other.org", "bob", "secret3", "", encryption_key)
+    seed.close_connection()
+
+    def run():
+        db = Database(db_path)
+        agent = VaultAgent(db, encryption_key, socket_path, idle_timeout=60)
+        asyncio.run(agent.serve())
+        db.close_connection()
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while not os.path.exists(socket_path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    yield db_path, socket_path
+    if thread.is_alive():
+        with AgentClient(socket_path) as client:
+            client.request('lock')
+    thread.join(5)
+
+def test_lookup_search_and_fetch(running_agent):
+    _, socket_path = running_agent
+    with AgentClient(socket_path) as client:
+        assert client.request('ping') == 'pong'
+        found = client.request('lookup', url="https://login.mail.example.com/")
+        assert [entry['website_name'] for entry in found] == ["Example Mail", "Example"], "Closest domain first."
+        assert 'password' not in found[0]
+
+        assert [entry['username'] for entry in client.request('search', query="OTHER")] == ["bob"]
+        entry = client.request('fetch', uuid=found[1]['uuid'])
+        assert (entry['password'], entry['notes']) == ("secret1", "note")
+        with pytest.raises(ValueError):
+            client.request('fetch', id=9999)
+
+        with pytest.raises(ValueError):
+            client.request('search', query=5)
+        with pytest.raises(ValueError):
+            client.request('fetch', uuid=["not", "hashable"])
+        assert client.request('ping') == 'pong', "Malformed requests are answered without dropping the connection."
+
+def test_sees_changes_made_by_other_processes(running_agent, encryption_key):
+    db_path, socket_path = running_agent
+    writer = Database(db_path)
+    with AgentClient(socket_path) as client:
+        client.request('ping')
+        writer.add_password_entry("New", "https://new.net", "carol", "secret4", "", encryption_key)
+        other = next(entry for entry in writer.fetch_all_entries(encryption_key) if entry[1] == "Other")
+        writer.delete_password_entry(other[0])
+
+        assert [entry['username'] for entry in client.request('lookup', url="new.net")] == ["carol"]
+        assert client.request('lookup', url="other.org") == []
+    writer.close_connection()
+
+def test_lock_stops_the_agent(running_agent):
+    _, socket_path = running_agent
+    with AgentClient(socket_path) as client:
+        client.request('lock')
+    deadline = time.monotonic() + 5
+    while os.path.exists(socket_path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not os.path.exists(socket_path), "A locked agent should remove its socket."
+
+def test_idle_timeout_follows_auto_lock_settings():
+    assert VaultAgent.idle_timeout_from_settings({"auto_lock_enabled": True, "auto_lock": 10}) == 600
+    assert VaultAgent.idle_timeout_from_settings({"auto_lock_enabled": False, "auto_lock": 10}) is None
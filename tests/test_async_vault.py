@@ -0,0 +1,42 @@
+import asyncio
+import pytest
+from src.core.Async_Vault import AsyncVault
+from src.core.Encryption import Encryption
+from Crypto.Random import get_random_bytes
+
+@pytest.fixture(scope="module")
+def encryption_key():
+    return Encryption.derive_key("testpassword".encode(), get_random_bytes(16))
+
+def test_concurrent_callers(tmp_path, encryption_key):
+    async def scenario():
+        async with await AsyncVault.open(encryption_key, str(tmp_path / "passwords.db"), batch_size=7) as vault:
+            ids = await asyncio.gather(*(vault.add(f"Site {i}", f"https://site{i}.com", f"user{i}", f"pass{i}", "") for i in range(20)))
+            bulk_ids = await vault.add_many([{'website_name': f"Bulk {i}", 'username': "bulk", 'password': "pw"} for i in range(30)])
+            assert len(set(ids + bulk_ids)) == 50
+
+            await asyncio.gather(
+                vault.update(ids[0], "Renamed", "https://site0.com", "user0", "new-pass", ""),
+                vault.set_favourite(ids[1], True),
+                vault.delete_many(bulk_ids[:10]),
+            )
+            assert (await vault.fetch(ids[0]))[1:5] == ("Renamed", "https://site0.com", "user0", "new-pass")
+            assert [entry[0] for entry in await vault.fetch_favourites()] == [ids[1]]
+            assert await vault.fetch(bulk_ids[0]) is None
+            assert sorted(entry[0] for entry in await vault.fetch_many([ids[3], bulk_ids[0], ids[2]])) == sorted([ids[2], ids[3]])
+
+            streamed = [entry async for entry in vault]
+            assert [entry[0] for entry in streamed] == sorted(entry[0] for entry in await vault.fetch_all())
+            assert len(streamed) == 40
+            assert len(await vault.search("BULK")) == 20
+            assert len(await vault.search("site", limit=3)) == 3
+    asyncio.run(scenario())
+
+def test_invalid_bulk_add_adds_nothing(tmp_path, encryption_key):
+    async def scenario():
+        async with await AsyncVault.open(encryption_key, str(tmp_path / "passwords.db")) as vault:
+            with pytest.raises(ValueError):
+                await vault.add_many([{'website_name': "Site", 'username': "user", 'password': "pw"},
+                                      {'website_name': "Broken", 'username': None, 'password': "pw"}])
+            assert await vault.fetch_all() == []
+    asyncio.run(scenario())
@@ -0,0 +1,63 @@
+import io
+import os
+import pytest
+from src.core.Attachments import AttachmentStore
+from src.core.Database import Database
+from src.core.Encryption import Encryption
+
+@pytest.fixture
+def vault(tmp_path):
+    db = Database(str(tmp_path / "passwords.db"))
+    key = Encryption.derive_key("testpassword".encode(), b"0123456789abcdef")
+    db.add_password_entry("Server", "https://server.example", "root", "secret", "", key)
+    db.add_password_entry("Backup", "https://backup.example", "root", "secret", "", key)
+    yield db, key
+    db.close_connection()
+
+def chunk_count(db):
+    return db.connection.execute("SELECT COUNT(*) FROM chunks;").fetchone()[0]
+
+def test_round_trip_and_deduplication(vault, tmp_path):
+    db, key = vault
+    store = AttachmentStore(db, key, chunk_size=1000)
+    contents = os.urandom(2500)
+    source = tmp_path / "id_ed25519"
+    source.write_bytes(contents)
+
+    first = store.add(1, str(source))
+    second = store.add(2, io.BytesIO(contents), name="copy")
+    assert chunk_count(db) == 3, "Identical files should share their chunks."
+    assert [attachment['name'] for attachment in store.list(1)] == ["id_ed25519"]
+    assert store.list(2)[0]['size'] == 2500
+
+    output = tmp_path / "restored"
+    assert store.save(second, str(output)) == 2500
+    assert output.read_bytes() == contents
+    assert [len(chunk) for chunk in store.iter_chunks(first)] == [1000, 1000, 500]
+    stored = b''.join(data for data, in db.connection.execute("SELECT data FROM chunks;"))
+    assert contents[:100] not in stored
+
+    store.delete(first)
+    assert chunk_count(db) == 3
+    db.delete_password_entry(2)
+    assert chunk_count(db) == 0 and store.list(2) == []
+
+def test_tampering_is_detected(vault, tmp_path):
+    db, key = vault
+    store = AttachmentStore(db, key, chunk_size=4)
+    attachment_id = store.add(1, io.BytesIO(b"aaaabbbbcccc"), name="file")
+
+    # Reordering chunks is caught by the whole-file hash, and the output file is never written.
+    for old_position, new_position in ((0, 99), (1, 0), (99, 1)):
+        db.connection.execute("UPDATE attachment_chunks SET position = ? WHERE attachment_id = ? AND position = ?;",
+                              (new_position, attachment_id, old_position))
+    with pytest.raises(ValueError):
+        store.save(attachment_id, str(tmp_path / "out"))
+    assert not (tmp_path / "out").exists()
+
+    # A chunk stored under another chunk's address fails authentication.
+    db.connection.execute("UPDATE chunks SET data = (SELECT data FROM chunks ORDER BY hash LIMIT 1) WHERE hash = (SELECT MAX(hash) FROM chunks);")
+    with pytest.raises(ValueError):
+        store.read(attachment_id)
+    with pytest.raises(ValueError):
+        AttachmentStore(db, key).add(99, io.BytesIO(b"data"), name="orphan")
@@ -0,0 +1,53 @@
+import hashlib
+from src.core.Audit import VaultAudit
+from src.core.Breach_Check import BreachDatabase
+from src.core.Database import Database
+from src.core.Encryption import Encryption
+
+def make_vault(tmp_path):
+    db = Database(str(tmp_path / "passwords.db"))
+    key = Encryption.derive_key("testpassword".encode(), b"0123456789abcdef")
+    passwords = ["password", "Tr1cky-Unique-Passphrase!", "password", "zX9#qL2$vN7@", "zX9#qL2$vN7@"]
+    db.add_password_entries([{'website_name': f"Site {index}", 'website_url': "", 'username': "alice", 'password': password, 'notes': ""}
+                             for index, password in enumerate(passwords)], key)
+    return db, key
+
+def test_audit_report_and_incremental_refresh(tmp_path):
+    db, key = make_vault(tmp_path)
+    db.connection.execute("UPDATE vault SET updated_at = '2015-01-01 00:00:00' WHERE id = 2;")
+    db.connection.commit()
+    dump = tmp_path / "pwned.txt"
+    dump.write_text(hashlib.sha1(b"password").hexdigest() + ":1000\n", encoding='ascii')
+    BreachDatabase.convert_hibp(str(dump), str(tmp_path / "breached.bin"))
+    audit = VaultAudit(db, key, breach_path=str(tmp_path / "breached.bin"), workers=2, batch_size=2)
+
+    report = audit.run()
+
+    assert report['entries'] == 5 and report['audited'] == 5
+    assert report['reused'] == [[1, 3], [4, 5]]
+    assert [item['id'] for item in report['weak']] == [1, 3]
+    assert [item['id'] for item in report['stale']] == [2]
+    assert report['breached'] == [{'id': 1, 'breach_count': 1000}, {'id': 3, 'breach_count': 1000}]
+    stored = db.connection.execute("SELECT password_hash FROM audit_cache;").fetchall()
+    assert all(b"password" not in password_hash for password_hash, in stored)
+
+    # Only changed entries are audited again; deleted entries drop out of the report.
+    assert audit.run()['audited'] == 0
+    db.update_password_entry(3, "Site 2", "", "alice", "zX9#qL2$vN7@", "", key)
+    db.delete_password_entry(1)
+    report = audit.run()
+    assert report['audited'] == 1
+    assert report['reused'] == [[3, 4, 5]]
+    assert report['weak'] == [] and report['breached'] == []
+
+def test_cache_is_dropped_for_another_key(tmp_path):
+    db, key = make_vault(tmp_path)
+    VaultAudit(db, key, breach_path=None, workers=1).run()
+    other_key = Encryption.derive_key("other".encode(), b"0123456789abcdef")
+    db.connection.execute("DELETE FROM vault;")
+    db.connection.commit()
+    db.add_password_entries([{'website_name': "Site", 'website_url': "", 'username': "bob", 'password': "password", 'notes': ""}], other_key)
+
+    report = VaultAudit(db, other_key, breach_path=None, workers=1).run()
+
+    assert report['audited'] == 1 and report['entries'] == 1
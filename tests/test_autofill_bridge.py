@@ -0,0 +1,128 @@
+import http.client
+import json
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from src.core.Autofill_Bridge import AutofillBridge
+from src.core.Database import Database
+from src.core.Domain_Index import DomainIndex
+from src.core.Encryption import Encryption
+
+@pytest.fixture
+def bridge(tmp_path):
+    """Runs a bridge on a free port over a vault with a paired extension, yielding it and the pairing token."""
+    db_path = str(tmp_path / "passwords.db")
+    db = Database(db_path)
+    key = db.unwrap_data_key(Encryption.derive_key(b"master", db.global_salt()))
+    db.add_password_entries([
+        {'website_name': "Example", 'website_url': "https://www.example.com/login", 'username': "alice", 'password': "secret1"},
+        {'website_name': "Example Mail", 'website_url': "https://mail.example.com", 'username': "alice", 'password': "secret2"},
+        {'website_name': "Legacy", 'website_url': "http://legacy.example.com", 'username': "bob", 'password': "secret3"},
+        {'website_name': "Other", 'website_url': "https://other.org", 'username': "carol", 'password': "secret4"},
+    ], key)
+    token = AutofillBridge.pair(db)
+    bridge = AutofillBridge(db_path, key, port=0)
+    bridge.start()
+    yield bridge, token, db, key
+    bridge.stop()
+    db.close_connection()
+
+def request(connection, path, token=None, headers=None):
+    headers = dict(headers or {})
+    if token is not None:
+        headers['Authorization'] = f"Bearer {token}"
+    connection.request('GET', path, headers=headers)
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+def test_answers_paired_extensions_only(bridge):
+    bridge, token, _, _ = bridge
+    connection = http.client.HTTPConnection(AutofillBridge.HOST, bridge.port, timeout=5)
+    assert request(connection, "/ping", token) == (200, {'ok': True, 'result': 'pong'})
+    status, reply = request(connection, "/credentials?origin=https://mail.example.com", token)
+    assert status == 200, "The connection is kept alive between requests."
+    assert [(entry['website_name'], entry['password']) for entry in reply['result']] == [
+        ("Example Mail", "secret2"), ("Example", "secret1"), ("Legacy", "secret3")]
+    status, reply = request(connection, "/credentials?origin=http://legacy.example.com", token)
+    assert [entry['website_name'] for entry in reply['result']] == ["Legacy"], "Secure entries are not given to http origins."
+
+    assert request(connection, "/credentials?origin=https://example.com", "wrong")[0] == 401
+    assert request(connection, "/credentials?origin=https://example.com")[0] == 401
+    assert request(connection, "/credentials?origin=ftp://example.com", token)[0] == 400
+    assert request(connection, "/credentials", token)[0] == 400
+    assert request(connection, "/ping", token, {'Host': f"attacker.example:{bridge.port}"})[0] == 403
+    connection.close()
+
+def test_serves_concurrent_requests_and_follows_the_vault(bridge):
+    bridge, token, db, key = bridge
+    db.add_password_entry("Other Admin", "https://admin.other.org", "dave", "secret5", "", key)
+
+    def fetch_names(origin):
+        connection = http.client.HTTPConnection(AutofillBridge.HOST, bridge.port, timeout=5)
+        try:
+            return [entry['website_name'] for entry in request(connection, f"/credentials?origin={origin}", token)[1]['result']]
+        finally:
+            connection.close()
+
+    origins = ["https://other.org", "https://admin.other.org/login"] * 20
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(fetch_names, origins))
+    assert results[0] == ["Other", "Other Admin"]
+    assert results[1] == ["Other Admin", "Other"]
+    assert results == [results[0], results[1]] * 20
+
+def test_stop_and_pairing(bridge):
+    bridge, token, db, key = bridge
+    port = bridge.port
+    open_connection = http.client.HTTPConnection(AutofillBridge.HOST, port, timeout=5)
+    assert request(open_connection, "/ping", token)[0] == 200
+    AutofillBridge.pair(db)
+    bridge.stop()
+    assert not bridge.running and bridge.encryption_key is None
+    with pytest.raises((ConnectionError, http.client.HTTPException)):
+        request(open_connection, "/ping", token)
+    with pytest.raises(OSError):
+        http.client.HTTPConnection(AutofillBridge.HOST, port, timeout=5).connect()
+
+    restarted = AutofillBridge(db.db_path, key, port=0)
+    restarted.start()
+    connection = http.client.HTTPConnection(AutofillBridge.HOST, restarted.port, timeout=5)
+    assert request(connection, "/ping", token)[0] == 401, "Pairing again replaces the earlier token."
+    connection.close()
+    restarted.stop()
+
+    AutofillBridge.unpair(db)
+    assert not AutofillBridge.is_paired(db)
+    with pytest.raises(ValueError):
+        AutofillBridge(db.db_path, key, port=0).start()
+
+def test_slow_and_failing_lookups_do_not_hold_up_others(bridge, monkeypatch):
+    bridge, token, _, _ = bridge
+    released = threading.Event()
+    find_entries = DomainIndex.find_entries
+
+    def patched_find_entries(index, url):
+        if "slow.example" in url:
+            released.wait(5)
+        if "locked.example" in url:
+            raise sqlite3.OperationalError("database is locked")
+        return find_entries(index, url)
+    monkeypatch.setattr(DomainIndex, 'find_entries', patched_find_entries)
+
+    def fetch(origin):
+        connection = http.client.HTTPConnection(AutofillBridge.HOST, bridge.port, timeout=5)
+        try:
+            return request(connection, f"/credentials?origin={origin}", token)
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        slow = executor.submit(fetch, "https://slow.example")
+        assert fetch("https://other.org")[1]['result'][0]['website_name'] == "Other"
+        assert not slow.done()
+        status, reply = fetch("https://locked.example")
+        assert status == 503 and not reply['ok']
+        assert fetch("https://other.org")[0] == 200, "The bridge keeps answering after a failed lookup."
+        released.set()
+        assert slow.result() == (200, {'ok': True, 'result': []})
@@ -0,0 +1,212 @@
+import io
+import os
+import pytest
+from src.core.Attachments import AttachmentStore
+from src.core.Backup import VaultBackup, IncrementalBackup
+from src.core.Database import Database
+from src.core.Encryption import Encryption
+from Crypto.Random import get_random_bytes
+
+@pytest.fixture
+def db(tmp_path):
+    test_db = Database(str(tmp_path / "passwords.db"))
+    yield test_db
+    test_db.close_connection()
+
+@pytest.fixture(scope="module")
+def encryption_key():
+    return Encryption.derive_key("testpassword".encode(), get_random_bytes(16))
+
+def add_entries(db, encryption_key, count):
+    db.add_password_entries(
+        ({'website_name': f"Site {i}", 'website_url': f"https://site{i}.com", 'username': f"user{i}",
+          'password': f"pass{i}", 'notes': "note " * (i % 50), 'favourite': i % 3 == 0} for i in range(count)),
+        encryption_key)
+
+def test_export_and_restore_round_trip(db, encryption_key, tmp_path, monkeypatch):
+    monkeypatch.setattr(VaultBackup, "CHUNK_SIZE", 1024)  # Spread the entries over many frames.
+    add_entries(db, encryption_key, 300)
+    original = db.fetch_all_entries(encryption_key)
+    path = str(tmp_path / "vault.ccbak")
+
+    progress = []
+    exported = VaultBackup(db, encryption_key, batch_size=50, progress_callback=progress.append).export_vault(path, "backup-password")
+    assert exported == 300 and progress[-1] == 300
+
+    db.wipe_database()
+    restored = VaultBackup(db, encryption_key, batch_size=50).restore_vault(path, "backup-password", wipe_existing=True)
+
+    assert restored == 300
+    assert db.fetch_all_entries(encryption_key) == original, "Restored entries should match the exported ones, ids included."
+
+def test_restore_alongside_existing_entries(db, encryption_key, tmp_path):
+    add_entries(db, encryption_key, 5)
+    path = str(tmp_path / "vault.ccbak")
+    VaultBackup(db, encryption_key).export_vault(path, "backup-password")
+
+    VaultBackup(db, encryption_key).restore_vault(path, "backup-password")
+
+    assert len(db.fetch_all_entries(encryption_key)) == 10
+
+def versions(db):
+    return db.connection.execute("SELECT uuid, version_vector FROM vault ORDER BY uuid;").fetchall()
+
+def test_restores_keep_entry_identity(db, encryption_key, tmp_path):
+    add_entries(db, encryption_key, 5)
+    db.update_password_entry(1, "Site 0", "https://site0.com", "user0", "changed", "", encryption_key)
+    original = versions(db)
+    path = str(tmp_path / "vault.ccbak")
+    VaultBackup(db, encryption_key, batch_size=2).export_vault(path, "backup-password")
+
+    VaultBackup(db, encryption_key).restore_vault(path, "backup-password", wipe_existing=True)
+    assert versions(db) == original
+    assert db.connection.execute("SELECT COUNT(*) FROM vault_tombstones;").fetchone()[0] == 0, "Restored entries are not left deleted for sync."
+
+    VaultBackup(db, encryption_key).restore_vault(path, "backup-password")
+    assert set(original) < set(versions(db)) and len(versions(db)) == 10, "Copies added alongside the originals get new uuids."
+
+    fresh = Database(str(tmp_path / "fresh.db"))
+    VaultBackup(fresh, encryption_key).restore_vault(path, "backup-password")
+    assert versions(fresh) == original
+    fresh.close_connection()
+
+    backups = IncrementalBackup(db, encryption_key, str(tmp_path / "chain"), "backup-password")
+    backups.backup()
+    db.update_password_entry(2, "Site 1", "https://site1.com", "user1", "changed", "", encryption_key)
+    backups.backup()
+    expected = versions(db)
+    backups.restore()
+    assert versions(db) == expected
+
+def test_wrong_password_is_rejected(db, encryption_key, tmp_path):
+    add_entries(db, encryption_key, 5)
+    path = str(tmp_path / "vault.ccbak")
+    VaultBackup(db, encryption_key).export_vault(path, "backup-password")
+
+    with pytest.raises(ValueError):
+        VaultBackup(db, encryption_key).restore_vault(path, "wrong-password", wipe_existing=True)
+    assert len(db.fetch_all_entries(encryption_key)) == 5, "A failed restore should leave the vault untouched."
+
+def test_tampered_and_truncated_archives_are_rejected(db, encryption_key, tmp_path, monkeypatch):
+    monkeypatch.setattr(VaultBackup, "CHUNK_SIZE", 256)
+    add_entries(db, encryption_key, 20)
+    path = str(tmp_path / "vault.ccbak")
+    VaultBackup(db, encryption_key).export_vault(path, "backup-password")
+    with open(path, 'rb') as file:
+        data = file.read()
+
+    tampered = bytearray(data)
+    tampered[100] ^= 0x01
+    truncated = data[:len(data) - 300]
+    for index, corrupted in enumerate((bytes(tampered), truncated)):
+        corrupted_path = str(tmp_path / f"corrupted{index}.ccbak")
+        with open(corrupted_path, 'wb') as file:
+            file.write(corrupted)
+        with pytest.raises(ValueError):
+            list(VaultBackup.read_archive(corrupted_path, "backup-password"))
+
+def test_failed_export_leaves_no_partial_file(tmp_path):
+    path = str(tmp_path / "vault.ccbak")
+
+    def failing_records():
+        yield {'website_name': "Site"}
+        raise RuntimeError("interrupted")
+
+    with pytest.raises(RuntimeError):
+        VaultBackup.write_archive(path, "backup-password", failing_records())
+    assert not os.listdir(tmp_path)
+
+def test_change_log_records_every_mutation(db, encryption_key):
+    start_seq = db.current_change_seq()
+    db.add_password_entry("Site", "https://site.com", "user", "pass", "notes", encryption_key)
+    entry_id = db.fetch_all_entries(encryption_key)[-1][0]
+    db.update_password_entry(entry_id, "Site 2", "https://site.com", "user", "pass", "notes", encryption_key)
+    db.toggle_favourite_status(entry_id, True)
+    db.toggle_favourite_status(entry_id, True)  # Not a flip, so not logged.
+    db.delete_password_entry(entry_id)
+
+    cursor = db.connection.cursor()
+    cursor.execute("SELECT seq, entry_id, operation FROM vault_changes WHERE seq > ? ORDER BY seq;", (start_seq,))
+    changes = cursor.fetchall()
+    assert [change[2] for change in changes] == ['insert', 'update', 'favourite', 'delete']
+    assert all(change[1] == entry_id for change in changes)
+    assert [change[0] for change in changes] == sorted(change[0] for change in changes)
+    assert db.current_change_seq() == changes[-1][0]
+
+def test_incremental_backup_chain_and_compaction(db, encryption_key, tmp_path):
+    add_entries(db, encryption_key, 50)
+    backup = IncrementalBackup(db, encryption_key, str(tmp_path / "snapshots"), "backup-password")
+
+    base_path = backup.backup()
+    assert os.path.basename(base_path).startswith("base-")
+    assert backup.backup() is None, "Nothing changed, so no snapshot should be written."
+
+    entries = db.fetch_all_entries(encryption_key)
+    db.update_password_entry(entries[0][0], "Renamed", "https://renamed.com", "user0", "new-pass", "", encryption_key)
+    db.delete_password_entry(entries[1][0])
+    first_delta = backup.backup()
+    db.add_password_entry("Added", "https://added.com", "added", "added-pass", "", encryption_key)
+    db.toggle_favourite_status(entries[2][0], not entries[2][6])
+    second_delta = backup.backup()
+
+    assert os.path.basename(first_delta).startswith("delta-") and os.path.basename(second_delta).startswith("delta-")
+    delta_records = [record for record in VaultBackup.read_archive(first_delta, "backup-password") if 'snapshot' not in record]
+    assert len([record for record in delta_records if 'history' not in record]) == 2, "A delta should only hold the changed entries."
+    assert [record['history']['password'] for record in delta_records if 'history' in record] == ["pass0"]
+
+    expected = db.fetch_all_entries(encryption_key)
+    db.wipe_database()
+    assert backup.restore() == len(expected)
+    assert db.fetch_all_entries(encryption_key) == expected
+
+    compacted = backup.compact()
+    assert sorted(os.listdir(backup.directory)) == [os.path.basename(compacted)]
+    db.wipe_database()
+    backup.restore()
+    assert db.fetch_all_entries(encryption_key) == expected
+
+def attachments_and_history(db, encryption_key):
+    store = AttachmentStore(db, encryption_key)
+    return [(entry[1], [(attachment['name'], store.read(attachment['id'])) for attachment in store.list(entry[0])],
+             db.fetch_password_history(entry[0], encryption_key)) for entry in sorted(db.fetch_all_entries(encryption_key))]
+
+def test_restores_keep_attachments_and_history(db, encryption_key, tmp_path):
+    add_entries(db, encryption_key, 3)
+    store = AttachmentStore(db, encryption_key, chunk_size=1000)
+    store.add(1, io.BytesIO(os.urandom(2500)), "key.pem")
+    store.add(3, io.BytesIO(b""), "empty.txt")
+    db.update_password_entry(1, "Site 0", "https://site0.com", "user0", "changed", "", encryption_key)
+    expected = attachments_and_history(db, encryption_key)
+    assert expected[0][1] and expected[0][2], "The vault has an attachment and history to lose."
+
+    path = str(tmp_path / "vault.ccbak")
+    VaultBackup(db, encryption_key).export_vault(path, "backup-password")
+    VaultBackup(db, encryption_key).restore_vault(path, "backup-password", wipe_existing=True)
+    assert attachments_and_history(db, encryption_key) == expected
+
+    backups = IncrementalBackup(db, encryption_key, str(tmp_path / "chain"), "backup-password")
+    backups.backup()
+    store.add(2, io.BytesIO(b"later"), "later.txt")
+    store.delete(store.list(3)[0]['id'])
+    db.update_password_entry(3, "Site 2", "https://site2.com", "user2", "changed", "", encryption_key)
+    backups.backup()
+    expected = attachments_and_history(db, encryption_key)
+    assert backups.restore() == 3 and attachments_and_history(db, encryption_key) == expected
+    backups.compact()
+    assert backups.restore() == 3 and attachments_and_history(db, encryption_key) == expected
+
+    fresh = Database(str(tmp_path / "fresh.db"))
+    VaultBackup(fresh, encryption_key).restore_vault(path, "backup-password")
+    assert [attachments for _, attachments, _ in attachments_and_history(fresh, encryption_key)][0][0][0] == "key.pem"
+    fresh.close_connection()
+
+def test_entries_only_archives_do_not_replace_attachments(db, encryption_key, tmp_path):
+    add_entries(db, encryption_key, 2)
+    AttachmentStore(db, encryption_key).add(1, io.BytesIO(b"secret"), "note.txt")
+    path = str(tmp_path / "old.ccbak")
+    VaultBackup.write_archive(path, "backup-password", VaultBackup.iter_records(db, encryption_key), VaultBackup.ENTRIES_ONLY_VERSION)
+
+    with pytest.raises(ValueError):
+        VaultBackup(db, encryption_key).restore_vault(path, "backup-password", wipe_existing=True)
+    assert len(AttachmentStore(db, encryption_key).list(1)) == 1
+    assert VaultBackup(db, encryption_key).restore_vault(path, "backup-password") == 2, "Restoring alongside is still allowed."
@@ -0,0 +1,66 @@
+import hashlib
+import pytest
+from src.core.Breach_Check import BreachDatabase
+
+def sha1_hex(password):
+    return hashlib.sha1(password.encode('utf-8')).hexdigest().upper()
+
+@pytest.fixture
+def hibp_dump(tmp_path):
+    """A small dump in no particular order, with one hash listed twice."""
+    lines = [f"{sha1_hex(f'password{index}')}:{index + 1}" for index in range(50)]
+    lines.reverse()
+    lines.append(f"{sha1_hex('password7')}:100")
+    lines.append("")
+    path = tmp_path / "pwned.txt"
+    path.write_text("\r\n".join(lines), encoding='ascii')
+    return path
+
+def test_convert_unsorted_dump_and_look_up(hibp_dump, tmp_path, monkeypatch):
+    monkeypatch.setattr(BreachDatabase, 'SORT_CHUNK_RECORDS', 8)  # Force several sorted runs to be merged
+    output = tmp_path / "breached.bin"
+
+    assert BreachDatabase.convert_hibp(str(hibp_dump), str(output)) == 50
+
+    with BreachDatabase(str(output)) as breaches:
+        assert breaches.record_count == 50
+        assert breaches.count("password0") == 1
+        assert breaches.count("password49") == 50
+        assert breaches.count("password7") == 108
+        assert breaches.count("not breached") == 0
+        assert breaches.check_many(["password3", "unique", "password3"]) == [4, 0, 4]
+
+def test_truncated_digests(hibp_dump, tmp_path):
+    output = tmp_path / "breached.bin"
+    BreachDatabase.convert_hibp(str(hibp_dump), str(output), digest_size=8)
+
+    with BreachDatabase(str(output)) as breaches:
+        assert breaches.digest_size == 8
+        assert breaches.count("password12") == 13
+        assert breaches.count("not breached") == 0
+    assert output.stat().st_size == BreachDatabase.HEADER.size + 50 * 12
+
+def test_invalid_input(tmp_path):
+    dump = tmp_path / "pwned.txt"
+    dump.write_text(f"{sha1_hex('one')}:1\nnot-a-hash:2\n", encoding='ascii')
+    output = tmp_path / "breached.bin"
+    with pytest.raises(ValueError, match="Line 2"):
+        BreachDatabase.convert_hibp(str(dump), str(output))
+    assert not output.exists()
+
+    output.write_bytes(b"not a breach database")
+    with pytest.raises(ValueError):
+        BreachDatabase(str(output))
+
+def test_failed_conversion_leaves_no_files(hibp_dump, tmp_path, monkeypatch):
+    output = tmp_path / "breached.bin"
+    output.write_bytes(b"previous")
+
+    def fail_midway(*streams):
+        yield next(iter(streams[0]))
+        raise OSError("No space left on device")
+    monkeypatch.setattr("src.core.Breach_Check.heapq.merge", fail_midway)
+    with pytest.raises(OSError):
+        BreachDatabase.convert_hibp(str(hibp_dump), str(output))
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["breached.bin", "pwned.txt"]
+    assert output.read_bytes() == b"previous"
@@ -0,0 +1,111 @@
+import json
+import os
+import pickle
+import subprocess
+import sys
+import pytest
+from src.core.Hashing import Hashing
+
+CLI_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'Cli.py')
+# Runs the script given as its first argument, exiting with status 3 if PyQt5 has been imported by the end.
+NO_PYQT_LAUNCHER = """
+import atexit, os, runpy, sys
+atexit.register(lambda: 'PyQt5' in sys.modules and (sys.stdout.flush(), os._exit(3)))
+sys.argv = sys.argv[1:]
+sys.path.insert(0, os.path.dirname(sys.argv[0]))
+runpy.run_path(sys.argv[0], run_name='__main__')
+"""
+
+@pytest.fixture
+def app_data(tmp_path):
+    """A fresh application directory with registered master credentials."""
+    directory = tmp_path / "Credentials Cacher"
+    directory.mkdir()
+    with open(directory / "credentials.bin", 'wb') as file:
+        pickle.dump({'username': "alice", 'password': Hashing.hash_password("master")}, file)
+    return tmp_path
+
+def run_cli(app_data, *arguments, stdin="", password="master", launcher=None):
+    environment = dict(os.environ, APPDATA=str(app_data), CREDENTIALS_CACHER_USERNAME="alice", CREDENTIALS_CACHER_PASSWORD=password)
+    command = [sys.executable, CLI_PATH] if launcher is None else [sys.executable, "-c", launcher, CLI_PATH]
+    return subprocess.run(command + list(arguments), input=stdin, capture_output=True, text=True,
+                          env=environment, cwd=str(app_data), timeout=60)
+
+def test_batch_round_trip_without_pyqt(app_data):
+    requests = [
+        {'op': 'add', 'website_name': "Example", 'website_url': "https://example.com", 'username': "alice", 'password': "secret"},
+        {'op': 'add', 'website_name': "Generated", 'username': "bob", 'generate': {'length': 20}},
+        {'op': 'search', 'query': "gen"},
+        {'op': 'update', 'id': 1, 'password': "changed"},
+        {'op': 'get', 'id': 1},
+        {'op': 'lookup', 'url': "https://www.example.com/login"},
+        {'op': 'delete', 'id': 2},
+        {'op': 'get', 'id': 2},
+    ]
+    stdin = "\n".join(json.dumps(request) for request in requests) + "\nnot json\n"
+
+    result = run_cli(app_data, "batch", stdin=stdin, launcher=NO_PYQT_LAUNCHER)
+
+    replies = [json.loads(line) for line in result.stdout.splitlines()]
+    assert len(replies) == len(requests) + 1
+    assert replies[0] == {'ok': True, 'result': {'id': 1}}
+    assert len(replies[1]['result']['password']) == 20
+    assert [entry['username'] for entry in replies[2]['result']] == ["bob"]
+    assert replies[4]['result']['password'] == "changed"
+    assert [entry['id'] for entry in replies[5]['result']] == [1]
+    assert not replies[7]['ok'] and not replies[8]['ok']
+    assert result.returncode == 1, "Failed requests should be reflected in the exit status, and PyQt5 never imported."
+
+def test_invalid_adds_fail_alone(app_data):
+    requests = [
+        {'op': 'add', 'website_name': "Valid", 'username': "alice", 'password': "secret"},
+        {'op': 'add', 'website_name': "Defaults", 'username': "bob", 'generate': True},
+        {'op': 'add', 'website_name': "Bad options", 'username': "carol", 'generate': [16]},
+        {'op': 'add', 'website_name': "No password", 'username': "dave"},
+        {'op': 'add', 'website_name': 42, 'username': "erin", 'password': "secret"},
+        {'op': 'add', 'id': "one", 'website_name': "Text id", 'username': "frank", 'password': "secret"},
+        {'op': 'add', 'website_name': "Also valid", 'username': "grace", 'password': "secret"},
+        {'op': 'update', 'id': 1, 'generate': "long"},
+        {'op': 'search', 'query': "valid"},
+    ]
+    result = run_cli(app_data, "batch", stdin="\n".join(json.dumps(request) for request in requests) + "\n")
+
+    replies = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [reply['ok'] for reply in replies] == [True, True, False, False, False, False, True, False, True]
+    assert len(replies[1]['result']['password']) == 12
+    assert sorted(entry['website_name'] for entry in replies[8]['result']) == ["Also valid", "Valid"]
+    assert result.returncode == 1
+
+def test_add_export_and_generate(app_data):
+    assert run_cli(app_data, "add", "Mail", "carol", "--url", "mail.example.org", stdin="hunter2\n").returncode == 0
+
+    exported = run_cli(app_data, "export")
+    records = [json.loads(line) for line in exported.stdout.splitlines()]
+    assert [(record['website_name'], record['password']) for record in records] == [("Mail", "hunter2")]
+
+    generated = run_cli(app_data, "generate", "--count", "3", "--length", "16").stdout.split()
+    assert len(generated) == 3 and all(len(password) == 16 for password in generated)
+
+def test_wrong_password_is_rejected(app_data):
+    result = run_cli(app_data, "export", password="wrong")
+    assert result.returncode != 0 and "incorrect" in result.stderr
+
+def test_incremental_backup_compact_and_restore(app_data, monkeypatch):
+    monkeypatch.setenv("CREDENTIALS_CACHER_BACKUP_PASSWORD", "backup-password")
+    snapshots = str(app_data / "snapshots")
+    run_cli(app_data, "add", "First", "alice", stdin="one\n")
+    base = json.loads(run_cli(app_data, "backup", "--incremental", snapshots).stdout)['snapshot']
+    run_cli(app_data, "add", "Second", "bob", stdin="two\n")
+    delta = json.loads(run_cli(app_data, "backup", "--incremental", snapshots).stdout)['snapshot']
+    assert os.path.basename(base).startswith("base-") and os.path.basename(delta).startswith("delta-")
+    assert json.loads(run_cli(app_data, "backup", "--incremental", snapshots).stdout) == {'snapshot': None}
+
+    compacted = json.loads(run_cli(app_data, "compact", snapshots).stdout)['base']
+    assert sorted(os.listdir(snapshots)) == [os.path.basename(compacted)]
+
+    run_cli(app_data, "delete", "1")
+    run_cli(app_data, "add", "Third", "carol", stdin="three\n")
+    assert json.loads(run_cli(app_data, "restore", "--incremental", snapshots).stdout) == {'restored': 2}
+    records = [json.loads(line) for line in run_cli(app_data, "export").stdout.splitlines()]
+    assert sorted((record['website_name'], record['password']) for record in records) == [("First", "one"), ("Second", "two")]
+    assert run_cli(app_data, "compact", str(app_data / "missing")).returncode == 1
@@ -0,0 +1,70 @@
+import base64
+import json
+import os
+import pickle
+import pytest
+from src.core.Credentials import Credentials
+from src.core.Database import Database
+from src.core.Hashing import Hashing
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path / "passwords.db"))
+    yield db
+    db.close_connection()
+
+def test_record_round_trip(db):
+    assert not Credentials.exists(db)
+    with pytest.raises(ValueError):
+        Credentials.load(db)
+    Credentials.save(db, "alice", "master")
+    record = Credentials.load(db)
+    assert record['version'] == Credentials.VERSION and record['kdf'] == Credentials.KDF
+    assert Credentials.verify(db, "alice", "master")
+    assert not Credentials.verify(db, "alice", "wrong")
+    assert not Credentials.verify(db, "bob", "master")
+
+    # Each record carries its own parameters, so older ones keep verifying after the defaults change.
+    record['kdf'] = dict(record['kdf'], iterations=1000)
+    verifier = Credentials._derive_verifier("master", base64.b64decode(record['salt']), record['kdf'])
+    record['verifier'] = base64.b64encode(verifier).decode()
+    db.connection.execute("UPDATE meta SET value = ? WHERE key = 'credentials';", (json.dumps(record),))
+    assert Credentials.verify(db, "alice", "master")
+
+def test_files_are_moved_into_the_vault(tmp_path):
+    with open(tmp_path / "global_salt.bin", 'wb') as salt_file:
+        salt_file.write(b"0123456789abcdef")
+    with open(tmp_path / "credentials.bin", 'wb') as file:
+        pickle.dump({'username': "alice", 'password': Hashing.hash_password("master")}, file)
+    db = Database(str(tmp_path / "passwords.db"))
+    assert db.global_salt() == b"0123456789abcdef"
+    assert Credentials.exists(db) and Credentials.verify(db, "alice", "master")
+    assert not (tmp_path / "credentials.bin").exists() and (tmp_path / "credentials.bin.migrated").exists()
+    db.close_connection()
+
+    # The vault file alone now carries everything needed to log in.
+    os.remove(tmp_path / "global_salt.bin")
+    db = Database(str(tmp_path / "passwords.db"))
+    assert db.global_salt() == b"0123456789abcdef" and Credentials.verify(db, "alice", "master")
+    db.close_connection()
+
+def test_pickles_naming_code_are_refused(db, tmp_path):
+    with open(tmp_path / "credentials.bin", 'wb') as file:
+        pickle.dump({'username': "alice", 'password': os.system}, file)
+    with pytest.raises(ValueError):
+        Credentials.load(db)
+    assert (tmp_path / "credentials.bin").exists()
+
+def test_other_vaults_do_not_take_the_legacy_files(tmp_path):
+    with open(tmp_path / "credentials.bin", 'wb') as file:
+        pickle.dump({'username': "alice", 'password': Hashing.hash_password("master")}, file)
+    other = Database(str(tmp_path / "other.db"))
+    assert not Credentials.exists(other)
+    with pytest.raises(ValueError):
+        Credentials.load(other)
+    other.close_connection()
+    assert (tmp_path / "credentials.bin").exists()
+
+    db = Database(str(tmp_path / "passwords.db"))
+    assert Credentials.verify(db, "alice", "master"), "The files stay for the vault they belong to."
+    db.close_connection()
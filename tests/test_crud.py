@@ -151,4 +151,79 @@ class TestDatabaseCRUD:
         with pytest.raises(ValueError):
             db.add_password_entry("Website", "https://example.com", "user", None, "Notes", encryption_key)  # 'password' is None, correctly triggering ValueError
 
-            
\ No newline at end of file
+            
+    def test_revisions_and_updated_at_track_changes(self, tmp_path, encryption_key):
+        db = Database(str(tmp_path / "passwords.db"))
+        db.add_password_entry("First", "https://first.com", "user", "pass", "", encryption_key)
+        db.add_password_entry("Second", "https://second.com", "user", "pass", "", encryption_key)
+        first_id, second_id = sorted(db.fetch_entry_revisions())
+        db.connection.execute("UPDATE vault SET updated_at = '2000-01-01 00:00:00';")
+        db.connection.commit()
+        start = db.current_revision()
+
+        db.update_password_entry(first_id, "First", "https://first.com", "user", "new-pass", "", encryption_key)
+        db.toggle_favourite_status(second_id, True)
+        db.toggle_favourite_status(second_id, True)  # No change, so no new revision.
+
+        changed = db.fetch_entry_revisions(start)
+        assert sorted(changed) == [first_id, second_id]
+        assert changed[second_id][1] == db.current_revision() == start + 2
+        assert all(entry[8] != '2000-01-01 00:00:00' for entry in db.fetch_all_entries(encryption_key)), "Changes should refresh updated_at."
+        assert all(len(entry_uuid) == 32 for entry_uuid, _ in changed.values())
+
+        db.delete_password_entry(first_id)
+        assert db.current_revision() == start + 3
+        db.close_connection()
+
+    def test_password_history_keeps_changed_fields(self, tmp_path, encryption_key):
+        db = Database(str(tmp_path / "passwords.db"))
+        db.add_password_entry("Site", "https://site.com", "user", "first", "", encryption_key)
+        entry_id = db.fetch_all_entries(encryption_key)[0][0]
+        db.set_history_retention(2, None)
+
+        db.update_password_entry(entry_id, "Site", "https://site.com", "user", "second", "", encryption_key)
+        db.update_password_entry(entry_id, "Site", "https://site.com", "user", "second", "", encryption_key)  # No change, nothing recorded.
+        db.update_password_entry(entry_id, "Renamed", "https://site.com", "user", "third", "", encryption_key)
+        db.update_password_entry(entry_id, "Renamed", "https://site.com", "user", "fourth", "", encryption_key)
+
+        history = db.fetch_password_history(entry_id, encryption_key)
+        assert [{key: value for key, value in version.items() if key != 'replaced_at'} for version in history] == [
+            {'password': "third"}, {'website_name': "Site", 'password': "second"}]
+        stored = db.connection.execute("SELECT username, notes FROM password_history;").fetchall()
+        assert stored == [(None, None), (None, None)], "Unchanged fields should not be stored."
+
+        db.connection.execute("UPDATE password_history SET replaced_at = '2000-01-01 00:00:00';")
+        db.set_history_retention(1, 30)
+        assert db.fetch_password_history(entry_id, encryption_key) == []
+        assert db.history_retention() == (1, 30)
+        db.delete_password_entry(entry_id)
+        assert db.connection.execute("SELECT COUNT(*) FROM password_history;").fetchone()[0] == 0
+        db.close_connection()
+
+    def test_data_key_is_wrapped_by_the_master_key(self, tmp_path, encryption_key):
+        new_vault = Database(str(tmp_path / "new.db"))
+        data_key = new_vault.unwrap_data_key(encryption_key)
+        assert data_key != encryption_key and len(data_key) == 32, "A new vault should get a random data key."
+        new_vault.add_password_entry("Site", "https://site.com", "user", "pass", "", data_key)
+        assert new_vault.connection.execute("SELECT key_version FROM vault;").fetchone()[0] == Database.KEY_VERSION
+
+        # Changing the master key rewraps the data key; entries are left as they are.
+        new_master_key = generate_test_key()
+        encrypted_before = new_vault.connection.execute("SELECT password FROM vault;").fetchall()
+        new_vault.rewrap_data_key(encryption_key, new_master_key)
+        assert new_vault.unwrap_data_key(new_master_key) == data_key
+        assert new_vault.connection.execute("SELECT password FROM vault;").fetchall() == encrypted_before
+        with pytest.raises(ValueError):
+            new_vault.unwrap_data_key(encryption_key)
+        new_vault.close_connection()
+
+        # A vault written before data keys keeps using the master key, once that key is shown to decrypt it.
+        legacy_vault = Database(str(tmp_path / "legacy.db"))
+        legacy_vault.connection.execute("INSERT INTO vault (website_name, username, password) VALUES (?, ?, ?);",
+                                        [Encryption.encrypt_data(value, encryption_key) for value in ("Old", "user", "pass")])
+        with pytest.raises(ValueError):
+            legacy_vault.unwrap_data_key(new_master_key)
+        assert legacy_vault.wrapped_data_key() is None
+        assert legacy_vault.unwrap_data_key(encryption_key) == encryption_key
+        assert legacy_vault.fetch_all_entries(encryption_key)[0][1:5] == ("Old", None, "user", "pass")
+        legacy_vault.close_connection()
@@ -0,0 +1,62 @@
+import pytest
+from src.core.Database import Database
+from src.core.Domain_Index import DomainIndex
+from src.core.Encryption import Encryption
+from src.core.Key_Rotation import KeyRotation
+from Crypto.Random import get_random_bytes
+
+@pytest.fixture
+def vault(tmp_path):
+    db = Database(str(tmp_path / "passwords.db"))
+    master_key = Encryption.derive_key(b"master", db.global_salt())
+    key = db.unwrap_data_key(master_key)
+    yield db, master_key, key
+    db.close_connection()
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://login.example.co.uk/x", ('https', "login.example.co.uk", "example.co.uk")),
+    ("WWW.Example.COM.", ('https', "example.com", "example.com")),
+    ("http://alice.github.io/page", ('http', "alice.github.io", "alice.github.io")),
+    ("a.b.kawasaki.jp", ('https', "a.b.kawasaki.jp", "a.b.kawasaki.jp")),
+    ("foo.city.kawasaki.jp", ('https', "foo.city.kawasaki.jp", "city.kawasaki.jp")),
+    ("http://192.168.0.1:8080/", ('http', "192.168.0.1", "192.168.0.1")),
+    ("https://bücher.example/", ('https', "xn--bcher-kva.example", "xn--bcher-kva.example")),
+])
+def test_normalize_url(url, expected):
+    assert tuple(DomainIndex.normalize_url(url)) == expected
+
+def test_lookup_follows_the_vault(vault):
+    db, _, key = vault
+    db.add_password_entries([
+        {'website_name': "Example", 'website_url': "https://example.co.uk", 'username': "alice", 'password': "1"},
+        {'website_name': "Login", 'website_url': "login.example.co.uk", 'username': "alice", 'password': "2"},
+        {'website_name': "Other", 'website_url': "https://other.co.uk", 'username': "bob", 'password': "3"},
+        {'website_name': "No URL", 'website_url': "", 'username': "carol", 'password': "4"},
+    ], key)
+    index = DomainIndex(db, key)
+    assert index.lookup("https://www.example.co.uk/path") == [1, 2]
+    assert [entry[1] for _, entry in index.find_entries("https://login.example.co.uk/x")] == ["Login", "Example"]
+    with pytest.raises(ValueError):
+        index.lookup("")
+
+    db.update_password_entry(3, "Other", "https://sub.example.co.uk", "bob", "3", "", key)
+    db.delete_password_entry(1)
+    assert index.lookup("example.co.uk") == [2, 3]
+    assert index.lookup("other.co.uk") == []
+    stored = [row[0] for row in db.connection.execute("SELECT domain_key FROM vault;")]
+    assert not any(b"example" in domain_key for domain_key in stored), "Only keyed hashes of domains are stored."
+
+def test_missing_keys_are_filled_in_and_rotated(vault):
+    db, master_key, key = vault
+    db.add_password_entries([{'website_name': f"Site {number}", 'website_url': f"https://site{number % 2}.org",
+                              'username': "user", 'password': "pass"} for number in range(6)], key)
+    db.connection.execute("UPDATE vault SET domain_key = NULL;")  # As written before the index existed.
+    db.connection.commit()
+    assert DomainIndex(db, key).lookup("site1.org") == [2, 4, 6]
+    assert db.connection.execute("SELECT COUNT(*) FROM vault WHERE domain_key IS NULL;").fetchone()[0] == 0
+
+    rotation = KeyRotation(db, master_key, workers=1, batch_size=2)
+    rotation.start()
+    new_key = rotation.run()
+    assert DomainIndex(db, new_key).lookup("site0.org") == [1, 3, 5]
+    assert DomainIndex(db, get_random_bytes(32)).lookup("site0.org") == []
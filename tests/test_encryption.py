@@ -64,3 +64,12 @@ def test_encryption_with_empty_data():
     # If your application logic requires this, you need to implement this behavior in your Encryption.encrypt_data method.
     encrypted_data_json = Encryption.encrypt_data("", key)
     assert encrypted_data_json is not None, "Encryption should handle empty data properly"
+
+def test_binary_encryption_with_associated_data():
+    key = Encryption.derive_subkey(get_random_bytes(32), b"test purpose")
+    assert len(key) == 32
+
+    encrypted = Encryption.encrypt_bytes(b"\x00binary\xff", key, b"address")
+    assert Encryption.decrypt_bytes(encrypted, key, b"address") == b"\x00binary\xff"
+    with pytest.raises(ValueError):
+        Encryption.decrypt_bytes(encrypted, key, b"other address")
@@ -0,0 +1,83 @@
+import json
+import pytest
+from src.core.Database import Database
+from src.core.Encryption import Encryption
+from src.core.Importer import PasswordImporter
+from Crypto.Random import get_random_bytes
+
+@pytest.fixture
+def db(tmp_path):
+    test_db = Database(str(tmp_path / "passwords.db"))
+    yield test_db
+    test_db.close_connection()
+
+@pytest.fixture(scope="module")
+def encryption_key():
+    return Encryption.derive_key("testpassword".encode(), get_random_bytes(16))
+
+def test_bulk_add_is_transactional(db, encryption_key):
+    entries = [
+        {'website_name': "Site", 'username': "user", 'password': "pass"},
+        {'website_name': "Broken", 'username': None, 'password': "pass"},
+    ]
+    with pytest.raises(ValueError):
+        db.add_password_entries(entries, encryption_key)
+    assert db.fetch_all_entries(encryption_key) == [], "No entries should be added when one is invalid."
+
+def test_import_chrome_style_csv(db, encryption_key, tmp_path):
+    path = tmp_path / "chrome.csv"
+    path.write_text(
+        "name,url,username,password,note\n"
+        "Example,https://example.com/login,alice,secret1,\"multi\nline note\"\n"
+        ",https://no-name.example.org/,bob,secret2,\n"
+        "Missing Password,https://example.net,carol,,\n",
+        encoding="utf-8",
+    )
+    progress = []
+    importer = PasswordImporter(db, encryption_key, batch_size=1, progress_callback=lambda *args: progress.append(args))
+
+    imported, skipped = importer.import_file(str(path))
+
+    assert (imported, skipped) == (2, 1)
+    entries = {entry[3]: entry for entry in db.fetch_all_entries(encryption_key)}
+    assert entries["alice"][1] == "Example" and entries["alice"][5] == "multi\nline note"
+    assert entries["bob"][1] == "no-name.example.org", "A missing name should fall back to the URL host."
+    assert progress[-1][0] == 3 and progress[-1][1] == progress[-1][2], "Final progress should cover the whole file."
+
+def test_import_csv_with_explicit_mapping(db, encryption_key, tmp_path):
+    path = tmp_path / "custom.csv"
+    path.write_text("Service,Login,Secret\nMail,dave,hunter2\n", encoding="utf-8")
+    importer = PasswordImporter(db, encryption_key)
+
+    imported, _ = importer.import_csv(str(path), {'website_name': "Service", 'username': "Login", 'password': "Secret"})
+
+    assert imported == 1
+    assert db.fetch_all_entries(encryption_key)[0][1:5] == ("Mail", "", "dave", "hunter2")
+
+def test_import_bitwarden_json_streams_items(db, encryption_key, tmp_path, monkeypatch):
+    export = {
+        "encrypted": False,
+        "folders": [{"id": "1", "name": "items"}],
+        "items": [
+            {"type": 1, "name": f"Site {i}", "notes": None, "favorite": i == 0,
+             "login": {"username": f"user{i}", "password": f"pass{i}", "uris": [{"uri": f"https://site{i}.com"}]}}
+            for i in range(50)
+        ] + [{"type": 2, "name": "Secure note", "notes": "not a login"}],
+    }
+    path = tmp_path / "bitwarden.json"
+    path.write_text(json.dumps(export, indent=2), encoding="utf-8")
+    # Small chunks force items to straddle chunk boundaries.
+    monkeypatch.setattr(PasswordImporter, "JSON_CHUNK_SIZE", 64)
+
+    imported, skipped = PasswordImporter(db, encryption_key, batch_size=7).import_file(str(path))
+
+    assert (imported, skipped) == (50, 1)
+    entries = sorted(db.fetch_all_entries(encryption_key), key=lambda entry: entry[0])
+    assert entries[0][1:5] == ("Site 0", "https://site0.com", "user0", "pass0")
+    assert entries[0][6] is True and entries[1][6] is False
+
+def test_malformed_json_raises(db, encryption_key, tmp_path):
+    path = tmp_path / "broken.json"
+    path.write_text('{"items": [{"type": 1, "name": "x"', encoding="utf-8")
+    with pytest.raises(ValueError):
+        PasswordImporter(db, encryption_key).import_file(str(path))
@@ -0,0 +1,64 @@
+import io
+import pytest
+from src.core.Attachments import AttachmentStore
+from src.core.Credentials import Credentials
+from src.core.Database import Database
+from src.core.Key_Rotation import KeyRotation
+
+@pytest.fixture
+def vault(tmp_path):
+    db = Database(str(tmp_path / "passwords.db"))
+    master_key = Credentials.derive_master_key(db, "master")
+    key = db.unwrap_data_key(master_key)
+    db.add_password_entries([
+        {'website_name': f"Site {number}", 'website_url': f"https://{number}.example", 'username': "user",
+         'password': f"secret {number}", 'notes': ""} for number in range(25)], key)
+    db.update_password_entry(1, "Site 0", "https://0.example", "user", "changed", "", key)
+    yield db, master_key, key
+    db.close_connection()
+
+def snapshot(db):
+    return db.connection.execute(
+        "SELECT id, revision, updated_at, version_vector FROM vault ORDER BY id;").fetchall()
+
+def test_interrupted_rotation_resumes(vault):
+    db, master_key, key = vault
+    attachment_id = AttachmentStore(db, key, chunk_size=4).add(2, io.BytesIO(b"aaaabbbbcccc"), name="file")
+    before = snapshot(db)
+    changes = db.current_change_seq()
+
+    def interrupt(done, total):
+        if done >= 10:
+            raise KeyboardInterrupt
+    rotation = KeyRotation(db, master_key, workers=1, batch_size=5, progress_callback=interrupt)
+    rotation.start()
+    with pytest.raises(KeyboardInterrupt):
+        rotation.run()
+    assert db.key_rotation_pending()
+    with pytest.raises(ValueError):
+        db.unwrap_data_key(master_key)
+
+    new_key = KeyRotation(db, master_key, workers=1, batch_size=5).run()
+    assert not db.key_rotation_pending() and new_key != key
+    assert db.unwrap_data_key(master_key) == new_key
+    assert [entry[4] for entry in db.fetch_entries_by_ids([1, 2], new_key)] == ["changed", "secret 1"]
+    assert db.fetch_password_history(1, new_key)[0]['password'] == "secret 0"
+    assert AttachmentStore(db, new_key).read(attachment_id) == b"aaaabbbbcccc"
+    assert AttachmentStore(db, new_key).list(2)[0]['name'] == "file"
+    assert snapshot(db) == before and db.current_change_seq() == changes
+    with pytest.raises(ValueError):
+        db.fetch_entries_by_ids([1], key)
+
+def test_change_password(vault):
+    db, master_key, key = vault
+    Credentials.save(db, "alice", "master")
+
+    with pytest.raises(ValueError):
+        Credentials.change_password(db, "alice", "wrong", "new master")
+    assert Credentials.change_password(db, "alice", "master", "new master") == key
+    assert Credentials.unlock(db, "alice", "new master") == key
+
+    rotated_key = Credentials.change_password(db, "alice", "new master", "third master", rotate_data_key=True, workers=1)
+    assert rotated_key != key
+    assert Credentials.unlock(db, "alice", "third master") == rotated_key
+    assert not Credentials.verify(db, "alice", "new master")
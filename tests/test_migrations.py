@@ -0,0 +1,70 @@
+import sqlite3
+import pytest
+from src.core import Migrations as migrations_module
+from src.core.Database import Database
+from src.core.Encryption import Encryption
+from src.core.Migrations import Migrations
+
+def create_legacy_vault(path, entries):
+    """Writes a vault as the first versions did: just the vault table, at user_version 0."""
+    key = Encryption.derive_key(b"master", b"0123456789abcdef")
+    connection = sqlite3.connect(path)
+    connection.execute("""
+        CREATE TABLE vault (id INTEGER PRIMARY KEY, website_name TEXT NOT NULL, website_url TEXT, username TEXT NOT NULL,
+            password TEXT NOT NULL, notes TEXT, favourite INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);""")
+    connection.executemany("INSERT INTO vault (website_name, website_url, username, password, notes) VALUES (?, ?, ?, ?, ?);", [
+        tuple(Encryption.encrypt_data(field, key) for field in (f"Site {number}", "", "user", "secret", ""))
+        for number in range(entries)])
+    connection.commit()
+    connection.close()
+    return key
+
+def test_new_vault_is_at_latest_version(tmp_path):
+    db = Database(str(tmp_path / "passwords.db"))
+    assert Migrations.schema_version(db.connection) == Migrations.latest_version()
+    assert db.connection.execute("SELECT 1 FROM meta WHERE key = 'schema_version';").fetchone() is None
+    assert Migrations.upgrade(db.connection) == 0
+    db.close_connection()
+
+def test_legacy_vault_is_upgraded_in_batches(tmp_path, monkeypatch):
+    path = str(tmp_path / "passwords.db")
+    key = create_legacy_vault(path, 5)
+    monkeypatch.setattr(migrations_module, "BATCH_SIZE", 2)
+    reports = []
+    db = Database(path, progress_callback=lambda description, done, total: reports.append((done, total)))
+    assert reports == [(2, 5), (4, 5), (5, 5)]
+    assert Migrations.schema_version(db.connection) == Migrations.latest_version()
+    assert db.connection.execute("SELECT COUNT(DISTINCT uuid) FROM vault;").fetchone()[0] == 5
+    assert db.fetch_entries_by_ids([3], key)[0][1] == "Site 2"
+    db.update_password_entry(3, "Site 2", "", "user", "changed", "", key)
+    assert db.fetch_password_history(3, key)[0]['password'] == "secret"
+    db.close_connection()
+
+def test_failed_migration_is_rolled_back(tmp_path, monkeypatch):
+    db = Database(str(tmp_path / "passwords.db"))
+    version = Migrations.latest_version()
+    monkeypatch.setattr(Migrations, "_migrations", list(Migrations._migrations))
+
+    @Migrations.register(version + 1, "Fail halfway")
+    def fail(connection, progress):
+        connection.execute("CREATE TABLE half_done (id INTEGER);")
+        connection.execute("DELETE FROM vault;")
+        raise RuntimeError("interrupted")
+
+    with pytest.raises(ValueError):
+        Migrations.register(version + 3, "Skips a version")
+    with pytest.raises(RuntimeError):
+        Migrations.upgrade(db.connection)
+    assert Migrations.schema_version(db.connection) == version
+    assert db.connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'half_done';").fetchone() is None
+    db.close_connection()
+
+def test_newer_vault_is_refused(tmp_path):
+    path = str(tmp_path / "passwords.db")
+    Database(path).close_connection()
+    connection = sqlite3.connect(path)
+    connection.execute(f"PRAGMA user_version = {Migrations.latest_version() + 1};")
+    connection.close()
+    with pytest.raises(ValueError):
+        Database(path)
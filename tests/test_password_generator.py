@@ -1,4 +1,4 @@
-from src.core.Password_Generator import PasswordGenerator  # Adjust the import according to your project structure
+from src.core.Password_Generator import PasswordGenerator, Wordlist  # Adjust the import according to your project structure
 import random
 import pytest
 
@@ -41,3 +41,55 @@ class TestPasswordGenerator:
         passwords = {PasswordGenerator.generate_password() for _ in range(10000)}
         assert len(passwords) == 10000, "Generated passwords are not unique"
 
+
+    def test_batch_meets_constraints(self):
+        """Test that batch generation applies the same character-class rules to every password."""
+        passwords = PasswordGenerator.generate_passwords(2000, length=16, num_digits=3, num_specials=1)
+        assert len(set(passwords)) == 2000
+        for password in passwords:
+            assert len(password) == 16
+            assert sum(char.isdigit() for char in password) == 3 and len({char for char in password if char.isdigit()}) == 3
+            assert sum(char in PasswordGenerator.SPECIALS for char in password) == 1
+            assert sum(char.isupper() for char in password) == 1
+
+    def test_streaming_and_options(self):
+        """Test the streaming API and the uppercase and length options."""
+        stream = PasswordGenerator.iter_passwords(length=5, include_uppercase=False, num_digits=2, num_specials=2)
+        for _ in range(500):
+            password = next(stream)
+            assert len(password) == 5 and not any(char.isupper() for char in password)
+            assert any(char.islower() for char in password)
+        with pytest.raises(ValueError):
+            PasswordGenerator.generate_password(num_digits=11)
+        with pytest.raises(ValueError):
+            PasswordGenerator.iter_passwords(num_specials=-1)  # Before any password is asked for.
+
+    def test_characters_are_unbiased(self):
+        """Test that every lowercase letter appears with roughly equal frequency."""
+        counts = {}
+        for password in PasswordGenerator.generate_passwords(2000, length=100, include_uppercase=False, num_digits=0, num_specials=0):
+            for char in password:
+                counts[char] = counts.get(char, 0) + 1
+        expected = 200000 / 26
+        assert len(counts) == 26
+        assert all(abs(count - expected) < expected * 0.05 for count in counts.values())
+
+    def test_passphrase_options(self):
+        """Test passphrase word count, separator and capitalization against the bundled wordlist."""
+        words = {Wordlist.default()[index] for index in range(len(Wordlist.default()))}
+        assert len(words) == 7776
+        passphrase = PasswordGenerator.generate_passphrase(5, separator=".")
+        assert len(passphrase.split(".")) == 5 and all(word in words for word in passphrase.split("."))
+        title = PasswordGenerator.generate_passphrase(4, separator=" ", capitalization="title").split(" ")
+        assert all(word[0].isupper() and word.lower() in words for word in title)
+        assert sum(word.isupper() for word in PasswordGenerator.generate_passphrase(6, capitalization="one").split("-")) >= 1
+        with pytest.raises(ValueError):
+            PasswordGenerator.generate_passphrase(0)
+
+    def test_custom_wordlist(self, tmp_path):
+        """Test that plain and diceware-style wordlists are indexed line by line."""
+        path = tmp_path / "words.txt"
+        path.write_text("11111\talpha\n\nbeta\n11113\tgamma", encoding="utf-8")
+        wordlist = Wordlist(str(path))
+        assert [wordlist[index] for index in range(len(wordlist))] == ["alpha", "beta", "gamma"]
+        assert set(PasswordGenerator.generate_passphrase(30, wordlist=wordlist).split("-")) <= {"alpha", "beta", "gamma"}
@@ -0,0 +1,34 @@
+from src.core.Password_Strength import PasswordStrength
+from src.core.Password_Generator import PasswordGenerator
+
+def test_weak_patterns_are_detected():
+    assert PasswordStrength.estimate("password")['score'] == 0
+    assert 'common password' in PasswordStrength.estimate("P@ssw0rd")['warnings'], "Leetspeak should not hide a common password."
+    assert 'sequence' in PasswordStrength.estimate("abcdefgh9876")['warnings']
+    assert 'repeated characters' in PasswordStrength.estimate("zzzzzzzzzzzz")['warnings']
+    assert PasswordStrength.estimate("Zz9!kq")['score'] <= 1, "Very short passwords should never rate well."
+    assert PasswordStrength.estimate("")['score'] == 0
+
+def test_generated_secrets_score_highly():
+    assert PasswordStrength.estimate(PasswordGenerator.generate_password(20))['score'] == 4
+    assert PasswordStrength.estimate(PasswordGenerator.generate_passphrase(6))['score'] >= 3
+    assert PasswordStrength.estimate("correcthorsebatterystaple")['entropy'] < PasswordStrength.estimate("x7#Qv9!mLp2@Rz4$Wn8&")['entropy']
+
+def test_batch_matches_single_estimates():
+    passwords = ["password", "sG%1lbafpzeh", "password", "ilovemonkey2024!"]
+    results = PasswordStrength.estimate_many(passwords)
+    assert results == [PasswordStrength.estimate(password) for password in passwords]
+    assert results[0] is results[2], "Duplicates should be scored once."
+
+def test_long_repeated_passwords_are_weak():
+    for password in ("x" * 200, "password" * 10, "abcd" * 40):
+        assert PasswordStrength.estimate(password)['score'] == 0, password
+    assert 'repeated characters' in PasswordStrength.estimate("x" * 200)['warnings']
+    repeated = PasswordStrength.estimate("Tr0ub4dor&" * 12)
+    assert 'repeated pattern' in repeated['warnings']
+    assert repeated['entropy'] < PasswordStrength.estimate("Tr0ub4dor&")['entropy'] + 4, "Repeating a password adds little."
+    # Patterns past the first window are still found.
+    prefix = PasswordGenerator.generate_password(64)
+    assert PasswordStrength.estimate(prefix + "a" * 100)['entropy'] < PasswordStrength.estimate(prefix)['entropy'] + 30
+    assert 'sequence' in PasswordStrength.estimate(PasswordGenerator.generate_password(70) + "abcdefghijklmnop")['warnings']
+    assert PasswordStrength.estimate(PasswordGenerator.generate_password(150))['score'] == 4
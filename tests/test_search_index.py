@@ -0,0 +1,60 @@
+import pytest
+from src.core.Database import Database
+from src.core.Encryption import Encryption
+from src.core.Search_Index import SearchIndex
+
+@pytest.fixture
+def vault(tmp_path):
+    db = Database(str(tmp_path / "passwords.db"))
+    key = db.unwrap_data_key(Encryption.derive_key(b"master", db.global_salt()))
+    db.add_password_entries([
+        {'website_name': "Mail", 'website_url': "https://example.com", 'username': "bankroll", 'password': "pass"},
+        {'website_name': "Bank", 'website_url': "https://online.bank.example", 'username': "alice", 'password': "pass"},
+        {'website_name': "Online Banking", 'website_url': "", 'username': "alice", 'password': "pass"},
+        {'website_name': "Shop", 'website_url': "https://www.bankshop.org/login", 'username': "bob", 'password': "pass"},
+        {'website_name': "Acrobat Cloud", 'website_url': "https://acrobat.example", 'username': "carol", 'password': "pass"},
+        {'website_name': "Unrelated", 'website_url': "https://other.org", 'username': "dave", 'password': "pass"},
+    ], key)
+    db.connection.execute("UPDATE vault SET updated_at = '2000-01-01 00:00:00';")
+    db.connection.commit()
+    yield db, key
+    db.close_connection()
+
+def names(entries):
+    return [entry[1] for entry in entries]
+
+def test_ranks_by_field_and_match(vault):
+    db, key = vault
+    index = SearchIndex(db, key)
+    # A whole name beats a name prefix, which beats a host word, which beats a username.
+    assert names(index.search("bank")) == ["Bank", "Online Banking", "Shop", "Mail"]
+    assert names(index.search("BANK", limit=2)) == ["Bank", "Online Banking"]
+    assert names(index.search("alice online")) == ["Online Banking", "Bank"], "Every term has to match."
+    assert names(index.search("kroll")) == ["Mail"], "Substrings match too."
+    assert index.search("zzz") == [] and index.search("  ") == []
+
+def test_tolerates_typos(vault):
+    db, key = vault
+    index = SearchIndex(db, key)
+    assert names(index.search("acorbat")) == ["Acrobat Cloud"]
+    assert names(index.search("acrobta")) == ["Acrobat Cloud"]
+    assert names(index.search("unrelatde")) == ["Unrelated"]
+    assert index.search("acr0bxt") == []
+    assert SearchIndex.prefix_distance("exmaple", "examples", 1) == 1
+    assert SearchIndex.prefix_distance("kitten", "sitting", 1) == 2
+
+def test_boosts_and_follows_the_vault(vault):
+    db, key = vault
+    index = SearchIndex(db, key)
+    assert names(index.search("alice")) == ["Bank", "Online Banking"]
+    db.toggle_favourite_status(3, True)
+    assert names(index.search("alice")) == ["Online Banking", "Bank"]
+    db.toggle_favourite_status(3, False)
+    db.update_password_entry(2, "Bank", "https://online.bank.example", "alice", "new", "", key)  # Recently updated.
+    assert names(index.search("alice")) == ["Bank", "Online Banking"]
+
+    db.update_password_entry(1, "Webmail", "https://example.com", "carol", "", "", key)
+    db.delete_password_entry(4)
+    assert names(index.search("bank")) == ["Bank", "Online Banking"]
+    assert names(index.search("webmail")) == ["Webmail"]
+    assert names(index.search("carol")) == ["Webmail", "Acrobat Cloud"]
@@ -0,0 +1,56 @@
+import json
+import sys
+from src.core.Startup_Profiler import StartupProfiler, PROFILE_ENV_VAR
+
+def test_disabled_by_default(monkeypatch):
+    monkeypatch.delenv(PROFILE_ENV_VAR, raising=False)
+    argv = ["Main.py"]
+    profiler = StartupProfiler.from_environment(argv)
+    assert not profiler.enabled
+    with profiler.phase("db_init"):
+        pass
+    assert profiler.phases == [], "A disabled profiler should not record phases."
+    assert profiler.write_report() is None
+
+def test_flag_enables_and_is_stripped(monkeypatch, tmp_path):
+    monkeypatch.delenv(PROFILE_ENV_VAR, raising=False)
+    report_path = str(tmp_path / "report.json")
+    argv = ["Main.py", f"--profile-startup={report_path}", "-style", "fusion"]
+    profiler = StartupProfiler.from_environment(argv)
+    assert profiler.enabled
+    assert profiler.report_path == report_path
+    assert argv == ["Main.py", "-style", "fusion"], "The profiling flag should not be passed on to Qt."
+
+def test_environment_variable_enables(monkeypatch):
+    monkeypatch.setenv(PROFILE_ENV_VAR, "1")
+    profiler = StartupProfiler.from_environment(["Main.py"])
+    assert profiler.enabled
+    assert profiler.report_path is None
+
+def test_records_imports_and_phases(tmp_path, monkeypatch):
+    (tmp_path / "profiled_outer.py").write_text("import profiled_inner\n")
+    (tmp_path / "profiled_inner.py").write_text("VALUE = sum(range(1000))\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    profiler = StartupProfiler(enabled=True, report_path=str(tmp_path / "report.json"))
+    profiler.install_import_hook()
+    try:
+        import profiled_outer  # noqa: F401
+    finally:
+        profiler.remove_import_hook()
+        sys.modules.pop("profiled_outer", None)
+        sys.modules.pop("profiled_inner", None)
+
+    with profiler.phase("window_construction"):
+        pass
+    profiler.mark("first_show")
+    report_path = profiler.write_report()
+
+    with open(report_path) as file:
+        report = json.load(file)
+
+    imports = {entry["module"]: entry for entry in report["imports"]}
+    assert imports["profiled_outer"]["depth"] == 0
+    assert imports["profiled_inner"]["depth"] == 1
+    assert imports["profiled_outer"]["cumulative_seconds"] >= imports["profiled_inner"]["cumulative_seconds"]
+    assert [phase["name"] for phase in report["phases"]] == ["window_construction", "first_show"]
@@ -0,0 +1,202 @@
+import json
+import os
+import shutil
+import pytest
+from src.core.Database import Database
+from src.core.Domain_Index import DomainIndex
+from src.core.Encryption import Encryption
+from src.core.Sync import VaultSync
+from Crypto.Random import get_random_bytes
+
+@pytest.fixture(scope="module")
+def encryption_key():
+    return Encryption.derive_key("testpassword".encode(), get_random_bytes(16))
+
+@pytest.fixture
+def vaults(tmp_path):
+    os.makedirs(tmp_path / "laptop")
+    os.makedirs(tmp_path / "desktop")
+    local = Database(str(tmp_path / "laptop" / "passwords.db"))
+    remote = Database(str(tmp_path / "desktop" / "passwords.db"))
+    yield local, remote
+    local.close_connection()
+    remote.close_connection()
+
+def contents(db, encryption_key):
+    cursor = db.connection.cursor()
+    cursor.execute("SELECT id, uuid FROM vault;")
+    uuids = dict(cursor.fetchall())
+    return sorted((uuids[entry[0]],) + entry[1:7] for entry in db.fetch_all_entries(encryption_key))
+
+def test_new_entries_flow_both_ways(vaults, encryption_key):
+    local, remote = vaults
+    local.add_password_entry("Local Site", "https://local.com", "alice", "pass1", "", encryption_key)
+    remote.add_password_entry("Remote Site", "https://remote.com", "bob", "pass2", "", encryption_key)
+
+    report = VaultSync(local, encryption_key, remote.db_path).sync()
+
+    assert (report['pulled'], report['pushed'], report['conflicts']) == (1, 1, [])
+    assert contents(local, encryption_key) == contents(remote, encryption_key)
+    assert len(contents(local, encryption_key)) == 2
+    assert VaultSync(local, encryption_key, remote.db_path).sync() == {
+        'pulled': 0, 'pushed': 0, 'deleted_local': 0, 'deleted_remote': 0, 'conflicts': []}
+
+def test_edits_and_deletes_propagate(vaults, encryption_key):
+    local, remote = vaults
+    for i in range(3):
+        local.add_password_entry(f"Site {i}", f"https://site{i}.com", f"user{i}", f"pass{i}", "", encryption_key)
+    VaultSync(local, encryption_key, remote.db_path).sync()
+
+    remote_entries = sorted(remote.fetch_all_entries(encryption_key), key=lambda entry: entry[1])
+    remote.update_password_entry(remote_entries[0][0], "Site 0 renamed", "https://site0.com", "user0", "new-pass", "", encryption_key)
+    remote.toggle_favourite_status(remote_entries[1][0], True)
+    local_entries = sorted(local.fetch_all_entries(encryption_key), key=lambda entry: entry[1])
+    local.delete_password_entry(local_entries[2][0])
+
+    report = VaultSync(local, encryption_key, remote.db_path).sync()
+
+    assert (report['pulled'], report['deleted_remote'], report['conflicts']) == (2, 1, [])
+    assert contents(local, encryption_key) == contents(remote, encryption_key)
+    names = {entry[1]: entry for entry in local.fetch_all_entries(encryption_key)}
+    assert set(names) == {"Site 0 renamed", "Site 1"}
+    assert names["Site 0 renamed"][4] == "new-pass" and names["Site 1"][6] is True
+
+def test_concurrent_edits_are_reported(vaults, encryption_key):
+    local, remote = vaults
+    local.add_password_entry("Shared", "https://shared.com", "user", "original", "", encryption_key)
+    VaultSync(local, encryption_key, remote.db_path).sync()
+
+    local.update_password_entry(local.fetch_all_entries(encryption_key)[0][0], "Shared", "https://shared.com", "user", "laptop-edit", "", encryption_key)
+    remote.update_password_entry(remote.fetch_all_entries(encryption_key)[0][0], "Shared", "https://shared.com", "user", "desktop-edit", "", encryption_key)
+
+    report = VaultSync(local, encryption_key, remote.db_path, prefer='remote').sync()
+
+    assert len(report['conflicts']) == 1 and report['conflicts'][0]['kept'] == 'remote'
+    assert local.fetch_all_entries(encryption_key)[0][4] == "desktop-edit"
+    assert contents(local, encryption_key) == contents(remote, encryption_key)
+    assert VaultSync(local, encryption_key, remote.db_path).sync()['conflicts'] == [], "A resolved conflict should stay resolved."
+
+def test_copied_legacy_vault_keeps_entry_identity(tmp_path, encryption_key):
+    os.makedirs(tmp_path / "laptop")
+    os.makedirs(tmp_path / "desktop")
+    local = Database(str(tmp_path / "laptop" / "passwords.db"))
+    # Simulate a vault written before uuids and entry subkeys existed.
+    local.connection.execute("INSERT INTO vault (website_name, website_url, username, password, notes) VALUES (?, ?, ?, ?, ?);",
+                             [Encryption.encrypt_data(value, encryption_key) for value in ("Legacy", "https://legacy.com", "user", "pass", "")])
+    local.connection.execute("UPDATE vault SET uuid = NULL, version_vector = '{}';")
+    local.connection.commit()
+    local.close_connection()
+    shutil.copy(tmp_path / "laptop" / "passwords.db", tmp_path / "desktop" / "passwords.db")
+
+    local = Database(str(tmp_path / "laptop" / "passwords.db"))
+    remote = Database(str(tmp_path / "desktop" / "passwords.db"))
+    report = VaultSync(local, encryption_key, remote.db_path).sync()
+
+    assert (report['pulled'], report['pushed'], report['conflicts']) == (0, 0, [])
+    assert len(local.fetch_all_entries(encryption_key)) == 1, "Copies of a legacy entry should not be duplicated."
+    local.close_connection()
+    remote.close_connection()
+
+def test_edits_to_a_copied_vault_conflict(tmp_path, encryption_key):
+    os.makedirs(tmp_path / "laptop")
+    os.makedirs(tmp_path / "desktop")
+    local = Database(str(tmp_path / "laptop" / "passwords.db"))
+    local.add_password_entry("Shared", "https://shared.com", "user", "original", "", encryption_key)
+    local.close_connection()
+    shutil.copy(tmp_path / "laptop" / "passwords.db", tmp_path / "desktop" / "passwords.db")
+
+    local = Database(str(tmp_path / "laptop" / "passwords.db"))
+    remote = Database(str(tmp_path / "desktop" / "passwords.db"))
+    assert local.replica_id() != remote.replica_id(), "A copied file should take a replica id of its own."
+    local.update_password_entry(1, "Shared", "https://shared.com", "user", "laptop", "", encryption_key)
+    remote.update_password_entry(1, "Shared", "https://shared.com", "user", "desktop", "", encryption_key)
+
+    report = VaultSync(local, encryption_key, remote.db_path).sync()
+    assert [conflict['kept'] for conflict in report['conflicts']] == ['local']
+    assert remote.fetch_all_entries(encryption_key)[0][4] == "laptop"
+    local.close_connection()
+    remote.close_connection()
+
+def test_equal_versions_with_different_content_conflict(vaults, encryption_key):
+    local, remote = vaults
+    local.add_password_entry("Shared", "https://shared.com", "user", "original", "", encryption_key)
+    VaultSync(local, encryption_key, remote.db_path).sync()
+    # As two copies sharing a replica id would write it: the same version vector over different passwords.
+    remote.update_password_entry(1, "Shared", "https://shared.com", "user", "desktop", "", encryption_key)
+    local.connection.execute("ATTACH DATABASE ? AS other;", (remote.db_path,))
+    local.connection.execute("UPDATE vault SET version_vector = (SELECT version_vector FROM other.vault WHERE uuid = vault.uuid);")
+    local.connection.commit()
+    local.connection.execute("DETACH DATABASE other;")
+
+    report = VaultSync(local, encryption_key, remote.db_path, prefer='remote').sync()
+    assert [conflict['kept'] for conflict in report['conflicts']] == ['remote']
+    assert contents(local, encryption_key) == contents(remote, encryption_key)
+
+def test_equal_versions_written_differently_do_not_conflict(vaults, encryption_key):
+    local, remote = vaults
+    local.add_password_entry("Shared", "https://shared.com", "user", "original", "", encryption_key)
+    VaultSync(local, encryption_key, remote.db_path).sync()
+    vector = json.loads(local.connection.execute("SELECT version_vector FROM vault;").fetchone()[0])
+    local.connection.execute("UPDATE vault SET version_vector = ?;", (json.dumps(vector, indent=1),))
+    local.connection.commit()
+
+    report = VaultSync(local, encryption_key, remote.db_path).sync()
+    assert (report['pulled'], report['pushed'], report['conflicts']) == (0, 0, [])
+
+    local.update_password_entry(1, "Shared", "https://shared.com", "user", "laptop", "", encryption_key)
+    remote.update_password_entry(1, "Shared", "https://shared.com", "user", "desktop", "", encryption_key)
+    assert len(VaultSync(local, encryption_key, remote.db_path).sync()['conflicts']) == 1
+    merged = local.connection.execute("SELECT version_vector FROM vault;").fetchone()[0]
+    assert merged == VaultSync.encode_version(json.loads(merged)) and ' ' not in merged
+
+def test_different_keys_are_reencrypted(vaults, encryption_key):
+    local, remote = vaults
+    remote_key = Encryption.derive_key("otherpassword".encode(), get_random_bytes(16))
+    remote.add_password_entry("Remote Site", "https://remote.com", "bob", "pass2", "notes", remote_key)
+
+    VaultSync(local, encryption_key, remote.db_path, remote_encryption_key=remote_key).sync()
+
+    assert local.fetch_all_entries(encryption_key)[0][1:6] == ("Remote Site", "https://remote.com", "bob", "pass2", "notes")
+
+def test_domain_keys_follow_each_vaults_data_key(vaults, encryption_key):
+    local, remote = vaults
+    remote_key = Encryption.derive_key("otherpassword".encode(), get_random_bytes(16))
+    local.add_password_entry("Local Site", "https://www.local.com", "alice", "pass1", "", encryption_key)
+    remote.add_password_entry("Remote Site", "https://remote.com", "bob", "pass2", "", remote_key)
+    local.connection.execute("UPDATE vault SET domain_key = ?;", (DomainIndex.domain_key(DomainIndex.derive_index_key(encryption_key), "https://local.com"),))
+    local.connection.commit()
+
+    VaultSync(local, encryption_key, remote.db_path, remote_encryption_key=remote_key).sync()
+
+    for db, key in ((local, encryption_key), (remote, remote_key)):
+        index_key = DomainIndex.derive_index_key(key)
+        rows = db.connection.execute("SELECT domain_key FROM vault ORDER BY website_name;").fetchall()
+        assert {row[0] for row in rows} == {DomainIndex.domain_key(index_key, "https://local.com"), DomainIndex.domain_key(index_key, "https://remote.com")}
+        assert len(DomainIndex(db, key).lookup("https://remote.com/login")) == 1
+
+    shared = Database(str(os.path.join(os.path.dirname(remote.db_path), "shared.db")))
+    VaultSync(local, encryption_key, shared.db_path).sync()
+    assert (shared.connection.execute("SELECT uuid, domain_key FROM vault ORDER BY uuid;").fetchall()
+            == local.connection.execute("SELECT uuid, domain_key FROM vault ORDER BY uuid;").fetchall()), "Vaults sharing a data key copy domain keys as they are."
+    shared.close_connection()
+
+def test_remote_without_a_salt_is_refused_and_left_alone(vaults, encryption_key):
+    local, remote = vaults
+    remote.add_password_entry("Remote Site", "https://remote.com", "bob", "pass2", "", encryption_key)
+    remote.connection.execute("DELETE FROM meta WHERE key = 'global_salt';")  # As if copied without its global_salt.bin.
+    remote.connection.commit()
+    with open(remote.db_path, 'rb') as file:
+        before = file.read()
+
+    with pytest.raises(ValueError):
+        VaultSync(local, encryption_key, remote.db_path).sync()
+    with pytest.raises(ValueError):
+        Database.inspect(str(os.path.join(os.path.dirname(remote.db_path), "missing.db")))
+    with open(remote.db_path, 'rb') as file:
+        assert file.read() == before, "Nothing is written into a vault that cannot be unlocked."
+
+    with open(remote.salt_path, 'wb') as file:
+        file.write(get_random_bytes(16))
+    replica_id = remote.replica_id()
+    assert VaultSync(local, encryption_key, remote.db_path).sync()['pulled'] == 1, "A salt kept next to the vault will do."
+    assert remote.replica_id() == replica_id, "The other vault keeps its replica id."